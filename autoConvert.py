@@ -5,12 +5,16 @@
 # --------------------------------------------------------
 
 
-from os import stat, sys
-from os.path import join, dirname, realpath
+from multiprocessing import Process
+from os import stat, sys, listdir
+from os.path import join, dirname, realpath, getmtime
+from re import search
 file_dir = dirname(realpath(__file__))
 sys.path.append(join(file_dir, 'src'))
 from utils import *
 from converter import Converter
+from conversion import ConversionScheduler
+from file_watcher import get_watcher
 from run import Run
 
 
@@ -30,6 +34,11 @@ class AutoConvert:
         self.EndRun = max(self.RunInfos) if end_run is None else int(end_run)
         self.Converter.set_run(self.FirstRun)
 
+        # Raw files
+        self.StableTime = self.Run.MainConfig.getfloat('CONVERSION', 'stable time') if self.Run.MainConfig.has_option('CONVERSION', 'stable time') else 10
+        self.RawFiles = {}  # run -> time of the last change, closed after writing
+        self.Done = set()
+
     def load_last_converted(self):
         if not file_exists(self.LastConvertedFile):
             return self.RunInfos.keys()[0]
@@ -45,6 +54,41 @@ class AutoConvert:
     def load_run_infos(self):
         return OrderedDict(sorted((int(key), value) for key, value in self.Converter.Run.load_run_info_file().iteritems()))
 
+    def reload_run_infos(self):
+        try:
+            self.RunInfos = self.load_run_infos()
+        except ValueError:  # the run log is just being written, it is reloaded with the next change
+            pass
+
+    def load_raw_files(self):
+        """ the raw files which exist before watching count as changed at their modification time """
+        files = [join(self.Converter.RawFileDir, name) for name in listdir(self.Converter.RawFileDir)]
+        return {get_run_number(f): [getmtime(f), False] for f in files if get_run_number(f) is not None}
+
+    def update_raw_file(self, path, event):
+        run = get_run_number(path)
+        if run is not None and run >= self.FirstRun:
+            self.RawFiles[run] = [time(), event == 'closed']
+
+    def is_finished(self, run):
+        """ a raw file is complete if the DAQ closed it or if it did not change for [StableTime] seconds """
+        last_change, closed = self.RawFiles[run]
+        return closed or time() - last_change > self.StableTime
+
+    def get_next_run(self):
+        """ :returns the first run with a complete raw file which is in the run log and not converted yet """
+        for run in sorted(self.RawFiles):
+            if run < self.FirstRun or run in self.Done or run not in self.RunInfos or not self.is_finished(run):
+                continue
+            self.Converter.set_run(run)
+            if file_exists(self.Run.RootFilePath) or self.RunInfos[run]['runtype'] in ['test', 'crap', 'schrott']:
+                self.Done.add(run)
+                continue
+            return run
+
+    def convert(self, run):
+        Run(run, self.Converter.Run.TCString)
+
     def convert_run(self, run):
 
         self.Converter.set_run(run)
@@ -66,30 +110,43 @@ class AutoConvert:
         self.save_last_converted(run)
 
     def auto_convert(self):
-        """Sequential conversion with check if the file is currently written. For usage during beam tests."""
-        for run in self.RunInfos:
-            if run >= self.FirstRun:
-                self.convert_run(run)
-            # wait until a new run was added to the run log
-            t = time()
-            while run == max(self.RunInfos):
-                info('waiting for new run ... {} since {}'.format(run + 1, get_running_time(t)), next_line=False)
-                self.RunInfos = self.load_run_infos()
-                sleep(1)
+        """Sequential conversion for usage during beam tests. The raw file directory and the run log are watched for changes (with inotify if available)
+        and a run is converted in a separate process as soon as its raw file is complete."""
+        watcher = get_watcher([self.Converter.RawFileDir, dirname(self.Run.RunInfoFile)])
+        self.RawFiles = self.load_raw_files()
+        process, run, t = None, None, time()
+        while True:
+            for path, event in watcher.get_events(timeout=1):
+                if realpath(path) == realpath(self.Run.RunInfoFile):
+                    self.reload_run_infos()
+                else:
+                    self.update_raw_file(path, event)
+            if process is not None and not process.is_alive():
+                process.join()
+                if process.exitcode:
+                    warning('conversion of run {} failed with exit code {}'.format(run, process.exitcode))
+                else:
+                    self.save_last_converted(run)
+                self.Done.add(run)
+                process, t = None, time()
+            if process is None:
+                run = self.get_next_run()
+                if run is None:
+                    info('waiting for new run ... since {}'.format(get_running_time(t)), next_line=False)
+                    continue
+                print
+                process = Process(target=self.convert, args=(run,))
+                process.start()
 
     def multi(self):
-        """parallel conversion"""
-        n_cpus = cpu_count()
-        self.Converter.Run.info('We got {0} CPUs\n'.format(n_cpus))
-        self.Converter.Run.info('Creating pool with {0} processes\n'.format(n_cpus))
+        """parallel conversion, the stages of different runs are executed at the same time and interrupted conversions are resumed"""
         self.Converter.Run.info('End conversion at run {}'.format(self.EndRun))
-
-        pool = Pool(n_cpus)
-
-        runs = [run for run in self.RunInfos if self.FirstRun <= run <= self.EndRun]
-        results = [pool.apply_async(self, [run]) for run in runs]
-        for res in results:
-            print res.get(timeout=2 * 24 * 60 * 60)
+        runs = [run for run in self.RunInfos if self.FirstRun <= run <= self.EndRun and self.RunInfos[run]['runtype'] not in ['test', 'crap', 'schrott']]
+        converted = ConversionScheduler(runs, self.Run.TCString, self.Run.Verbose).run()
+        missing = [run for run in runs if run not in converted]
+        done = [run for run in converted if not missing or run < missing[0]]
+        if done:
+            self.save_last_converted(done[-1])
 
     def run(self):
         self.multi() if self.Multi else self.auto_convert()
@@ -98,6 +155,11 @@ class AutoConvert:
         return self.convert_run(run)
 
 
+def get_run_number(file_path):
+    match = search(r'run(\d+)\.raw$', file_path)
+    return int(match.group(1)) if match else None
+
+
 def file_is_beeing_written(file_path):
     size1 = stat(file_path)
     sleep(4)
@@ -5,9 +5,8 @@
 # --------------------------------------------------------
 
 from collections import OrderedDict
-from numpy import corrcoef, arange
+from numpy import corrcoef, arange, zeros, array, cumsum, concatenate, sqrt, errstate, searchsorted, flatnonzero, argsort, minimum
 from ROOT import TProfile
-from copy import deepcopy
 
 
 class Correlation(object):
@@ -21,9 +20,8 @@ class Correlation(object):
         self.MaxBuckets = 4  # we need to start at five buckets
 
         self.Offsets = sorted(arange(-n_offsets, n_offsets + 1), key=abs)
-        self.Events = {off: [] for off in self.Offsets}
-        self.TelRow = {off: [] for off in self.Offsets}
-        self.DUTRow = {off: [] for off in self.Offsets}
+        self.Buffers = {off: RowBuffer() for off in self.Offsets}
+        self.DUTEvents, self.DUTRows = None, None
 
     def __call__(self, *args, **kwargs):
         return self.get(*args, **kwargs)
@@ -32,7 +30,18 @@ class Correlation(object):
         self.BinSize = int(value)
 
     def get_events(self, offset=0):
-        return len(self.Events[offset])
+        return len(self.Buffers[offset])
+
+    def get_event_numbers(self, offset=0):
+        return self.Buffers[offset].events
+
+    def load_dut_rows(self):
+        """ sorted arrays of the events with a single DUT hit and their rows for the vectorised filling """
+        if self.DUTEvents is None:
+            events = array(self.Alignment.DUTRow.keys(), 'i8')
+            order = argsort(events)
+            self.DUTEvents, self.DUTRows = events[order], array(self.Alignment.DUTRow.values(), 'd')[order]
+        return self.DUTEvents, self.DUTRows
 
     def fill(self, event, offset=0, tel_row=None, dia_row=None):
         # change the event number of the diamond row by the current offset
@@ -41,48 +50,46 @@ class Correlation(object):
         for off in self.Offsets:
             this_ev = dia_event + off
             if tel_row is not None and dia_row is not None:
-                self.TelRow[off].append(tel_row)
-                self.DUTRow[off].append(dia_row)
-                self.Events[off].append(event)
+                self.Buffers[off].append(event, tel_row, dia_row)
             elif this_ev in self.Alignment.DUTRow:
-                self.TelRow[off].append(self.Alignment.TelRow[event])
-                self.DUTRow[off].append(self.Alignment.DUTRow[this_ev])
-                self.Events[off].append(event)
-        self.NBuckets = len(self.Events[0]) / self.BinSize
+                self.Buffers[off].append(event, self.Alignment.TelRow[event], self.Alignment.DUTRow[this_ev])
+        self.NBuckets = self.get_events() / self.BinSize
 
     def fill_n(self, events, offset=0, tel_row=None, dia_row=None):
-        for event in events:
-            self.fill(event, offset, tel_row, dia_row)
+        """ same as fill for every event, but with one array operation per offset """
+        events = array(events, 'i8')
+        if tel_row is not None and dia_row is not None:
+            for off in self.Offsets:
+                self.Buffers[off].extend(events, zeros(events.size) + tel_row, zeros(events.size) + dia_row)
+        elif events.size:
+            dut_events, dut_rows = self.load_dut_rows()
+            tel_rows = array([self.Alignment.TelRow[ev] for ev in events], 'd')
+            for off in self.Offsets:
+                i = minimum(searchsorted(dut_events, events + offset + off), dut_events.size - 1) if dut_events.size else zeros(events.size, 'i8')
+                found = flatnonzero(dut_events[i] == events + offset + off) if dut_events.size else i[:0]
+                self.Buffers[off].extend(events[found], tel_rows[found], dut_rows[i[found]])
+        self.NBuckets = self.get_events() / self.BinSize
 
     def del_first_bucket(self):
         for off in self.Offsets:
-            while self.get_events(off) >= (self.NBuckets - 1) * self.BinSize:
-                del self.Events[off][0]
-                del self.TelRow[off][0]
-                del self.DUTRow[off][0]
+            self.Buffers[off].drop_first(self.get_events(off) - max(0, (self.NBuckets - 1) * self.BinSize - 1))
         self.decrement_buckets()
 
     def reset_except_last(self, n):
-        while len(self.Events[0]) >= self.BinSize * n:
+        while self.get_events() >= self.BinSize * n:
             self.del_first_bucket()
 
     def reshuffle(self, offset, n=2):
-        tmp_ev = deepcopy(self.Events)
-        tmp_tr = deepcopy(self.TelRow)
-        tmp_dr = deepcopy(self.DUTRow)
+        last = {off: buf.get_last(n * self.BinSize) for off, buf in self.Buffers.iteritems()}
         self.reset_except_last(2)
         # only keep the last n
         for off in self.Offsets:
             if off + offset in self.Offsets:
-                self.Events[off] = tmp_ev[off + offset][(-n * self.BinSize):]
-                self.TelRow[off] = tmp_tr[off + offset][(-n * self.BinSize):]
-                self.DUTRow[off] = tmp_dr[off + offset][(-n * self.BinSize):]
+                self.Buffers[off].set(*last[off + offset])
 
     def delete_events(self, start, stop):
         for off in self.Offsets:
-            del self.Events[off][start:stop]
-            del self.TelRow[off][start:stop]
-            del self.DUTRow[off][start:stop]
+            self.Buffers[off].delete(start, stop)
 
     def reset(self):
         while self.get_events() >= self.BinSize * self.BucketWindow:
@@ -103,10 +110,11 @@ class Correlation(object):
 
     def get(self, offset=0, start_bucket=0, evt_offset=0, bucket_division=1., debug=False):
         s = int(start_bucket * self.BinSize + evt_offset)
-        e = int(s + self.BinSize / bucket_division) if bucket_division else len(self.Events[offset])  # go one bucket further by default
-        corr = correlate(self.TelRow[offset][s:e], self.DUTRow[offset][s:e])
+        e = int(s + self.BinSize / bucket_division) if bucket_division else self.get_events(offset)  # go one bucket further by default
+        corr = self.Buffers[offset].correlate(s, e)
         if debug:
-            print start_bucket, len(self.Events[offset]), self.Events[offset][s], self.Events[offset][e if e < len(self.Events[offset]) else -1], corr
+            events = self.get_event_numbers(offset)
+            print start_bucket, events.size, events[s], events[e if e < events.size else -1], corr
         return corr
 
     def get_all(self):
@@ -144,19 +152,15 @@ class Correlation(object):
     def get_shifted(self):
         """ get all the correlations for zero offset shifting through three buckets and the respective last events of the buckets"""
         n = self.BinSize
-        correlations = {self.Events[0][-n * 3 + k]: self.get(0, start_bucket=-4, evt_offset=k) for k in xrange(2 * n)}
+        correlations = {self.get_event_numbers(0)[-n * 3 + k]: self.get(0, start_bucket=-4, evt_offset=k) for k in xrange(2 * n)}
         return OrderedDict(sorted(correlations.iteritems()))
 
     def get_sliding(self, offset=0):
         """ get all the correlations for zero offset sliding through all buckets and the respective last events of the buckets"""
-        correlations = {}
-        for k in xrange(self.NBuckets * self.BinSize):  # try one bucket too much since not every list hast the same amount of entries
-            try:
-                ev = self.Events[offset][k + self.BinSize - 1]
-                correlations[ev] = self.get(offset=offset, evt_offset=k)
-            except IndexError:
-                pass
-        return OrderedDict(sorted(correlations.iteritems()))
+        buf = self.Buffers[offset]
+        n = max(0, min(self.NBuckets * self.BinSize, len(buf) - self.BinSize + 1))  # try one bucket too much since not every list hast the same amount of entries
+        correlations = buf.correlate_sliding(self.BinSize)[:n]
+        return OrderedDict(sorted(zip(buf.events[self.BinSize - 1:self.BinSize - 1 + n].tolist(), correlations.tolist())))
 
     def get_all_sliding(self):
         return {off: self.get_sliding(off) for off in self.Offsets}
@@ -164,9 +168,9 @@ class Correlation(object):
     def get_shifted_long(self, last_offset):
         """ get all the correlations for zero offset shifting through three buckets """
         n = self.BinSize
-        correlations = {self.Events[0][-n * 2 + k]: self.get(0, start_bucket=-3, evt_offset=k) for k in xrange(n)}
+        correlations = {self.get_event_numbers(0)[-n * 2 + k]: self.get(0, start_bucket=-3, evt_offset=k) for k in xrange(n)}
         for k in xrange(n):
-            correlations[self.Events[last_offset][-n * 3 + k]] = self.get(last_offset, start_bucket=-4, evt_offset=k)
+            correlations[self.get_event_numbers(last_offset)[-n * 3 + k]] = self.get(last_offset, start_bucket=-4, evt_offset=k)
         return OrderedDict(sorted(correlations.iteritems()))
 
     def get_off_all(self):
@@ -180,17 +184,18 @@ class Correlation(object):
         self.set_bucket_size(old_size / 2)
         n = self.BinSize
         for offset in self.Offsets:
-            start_event = next(ev for ev in self.Events[offset] if ev >= off_event)
-            evt_offset = self.Events[offset].index(start_event)
+            events = self.get_event_numbers(offset)
+            evt_offset = flatnonzero(events >= off_event)[0]
+            start_event = events[evt_offset]
             print offset, start_event, evt_offset
-            correlations = {self.Events[offset][(b + 1) * n - 1]: self.get(offset=offset, start_bucket=b, evt_offset=evt_offset) for b in xrange((self.get_events() - evt_offset) / n)}
+            correlations = {events[(b + 1) * n - 1]: self.get(offset=offset, start_bucket=b, evt_offset=evt_offset) for b in xrange((self.get_events() - evt_offset) / n)}
             dic[offset] = OrderedDict(sorted(correlations.iteritems()))
         self.set_bucket_size(old_size)
         return dic
 
     def get_all_zero(self):
         # all correlations for the zero offset
-        return [self.get(0, start_bucket=j) for j in xrange(len(self.TelRow[0]) / self.BinSize)]
+        return self.Buffers[0].correlate_sliding(self.BinSize)[::self.BinSize].tolist()
 
     def get_detailed(self, division=5):
         n = self.BinSize
@@ -200,3 +205,93 @@ class Correlation(object):
 
 def correlate(l1, l2):
     return corrcoef(l1, l2)[0][1]
+
+
+def pearson(n, sx, sy, sxy, sxx, syy):
+    """ :returns the correlation coefficient from the sums of x, y, xy, x^2 and y^2 of [n] values """
+    with errstate(divide='ignore', invalid='ignore'):
+        return (n * sxy - sx * sy) / sqrt((n * sxx - sx ** 2) * (n * syy - sy ** 2))
+
+
+class RowBuffer(object):
+    """ Growing numpy buffer of the events and the telescope and DUT rows of one offset. Values are only removed from the front (by moving the start)
+        or in rare bulk deletions. The prefix sums of x, y, xy, x^2 and y^2 provide the correlation of every window in O(1). """
+
+    def __init__(self, size=1024):
+        self.Events = zeros(size, 'i8')
+        self.Values = zeros((2, size))
+        self.Sums = zeros((5, size + 1))  # sums of all values before index i
+        self.Start, self.End = 0, 0
+
+    def __len__(self):
+        return self.End - self.Start
+
+    @property
+    def events(self):
+        return self.Events[self.Start:self.End]
+
+    @property
+    def x(self):
+        return self.Values[0, self.Start:self.End]
+
+    @property
+    def y(self):
+        return self.Values[1, self.Start:self.End]
+
+    def reserve(self, n):
+        """ make space for [n] more values: first reuse the space of the removed values, then double the size """
+        if self.End + n <= self.Events.size:
+            return
+        size = self.Events.size
+        while len(self) + n > size:
+            size *= 2
+        events, values, sums = self.events.copy(), self.Values[:, self.Start:self.End].copy(), self.Sums[:, self.Start:self.End + 1] - self.Sums[:, [self.Start]]
+        if size != self.Events.size:
+            self.Events, self.Values, self.Sums = zeros(size, 'i8'), zeros((2, size)), zeros((5, size + 1))
+        self.Start, self.End = 0, events.size
+        self.Events[:self.End], self.Values[:, :self.End], self.Sums[:, :self.End + 1] = events, values, sums
+
+    def append(self, event, x, y):
+        self.reserve(1)
+        i = self.End
+        self.Events[i] = event
+        self.Values[:, i] = x, y
+        self.Sums[:, i + 1] = self.Sums[:, i] + (x, y, x * y, x * x, y * y)
+        self.End += 1
+
+    def extend(self, events, x, y):
+        self.reserve(events.size)
+        i, j = self.End, self.End + events.size
+        self.Events[i:j] = events
+        self.Values[:, i:j] = x, y
+        self.Sums[:, i + 1:j + 1] = self.Sums[:, [i]] + cumsum([x, y, x * y, x * x, y * y], axis=1)
+        self.End = j
+
+    def set(self, events, x, y):
+        self.Start, self.End = 0, 0
+        self.extend(events, x, y)
+
+    def get_last(self, n):
+        return self.events[-n:].copy(), self.x[-n:].copy(), self.y[-n:].copy()
+
+    def drop_first(self, n):
+        self.Start += min(max(0, n), len(self))
+
+    def delete(self, start, stop):
+        """ removes the values in [start:stop] like del on a list """
+        start, stop, step = slice(start, stop).indices(len(self))
+        keep = concatenate([arange(start), arange(max(start, stop), len(self))]).astype('i8')
+        self.set(self.events[keep], self.x[keep], self.y[keep])
+
+    def correlate(self, start, stop):
+        """ :returns the correlation of the values in [start:stop] with the slicing rules of lists """
+        start, stop, step = slice(start, stop).indices(len(self))
+        stop = max(start, stop)
+        return pearson(stop - start, *(self.Sums[:, self.Start + stop] - self.Sums[:, self.Start + start]))
+
+    def correlate_sliding(self, window):
+        """ :returns the correlations in all windows [i:i + window] """
+        if window <= 0 or len(self) < window:
+            return zeros(0)
+        sums = self.Sums[:, self.Start:self.End + 1]
+        return pearson(window, *(sums[:, window:] - sums[:, :-window]))
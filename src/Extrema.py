@@ -1,8 +1,55 @@
-from numpy import zeros, array
+from numpy import zeros, array, pad, where
+from scipy.ndimage import maximum_filter, minimum_filter
 from ROOT import TH2F, TCanvas, TExec
 
 __author__ = 'micha'
 
+# direction (col, row) of the end bin of the line scans, the start bin is in the opposite direction
+LINES = {'horizontal': (1, 0), 'vertical': (0, 1), 'swne': (1, 1), 'nwse': (1, -1)}
+
+
+# ==============================================
+# ARRAY FUNCTIONS
+# ==============================================
+# all functions take a single map [col, row] or a stack of maps [..., col, row] with one threshold per map
+def get_bin_contents(h):
+    """ :returns the contents of all bins of the 2D histogram [h] including under- and overflow as array [col, row] """
+    return array([[h.GetBinContent(col, row) for row in xrange(h.GetNbinsY() + 2)] for col in xrange(h.GetNbinsX() + 2)], 'd')
+
+
+def shift(values, col, row):
+    """ :returns the values of the bins at [col] and [row] relative to each bin, the border bins are repeated outside like in TH2::GetBinContent """
+    padded = pad(values, [(0, 0)] * (values.ndim - 2) + [(1, 1), (1, 1)], 'edge')
+    return padded[..., 1 + col:1 + col + values.shape[-2], 1 + row:1 + row + values.shape[-1]]
+
+
+def get_votes(values, is_max, is_min, max_thresh, min_thresh):
+    max_thresh, min_thresh = (array(t, 'd')[..., None, None] for t in [max_thresh, min_thresh])
+    is_max &= values > max_thresh
+    return {'max': is_max.astype('i4'), 'min': (~is_max & is_min & (values < min_thresh)).astype('i4')}
+
+
+def get_line_votes(values, max_thresh, min_thresh, mode='horizontal'):
+    """ :returns the local maxima above [max_thresh] and minima below [min_thresh] along the lines [mode] """
+    start, end = shift(values, *[-i for i in LINES[mode]]), shift(values, *LINES[mode])
+    return get_votes(values, (start <= values) & (values >= end), (start >= values) & (values <= end), max_thresh, min_thresh)
+
+
+def get_square_votes(values, max_thresh, min_thresh, size=1):
+    """ :returns the maxima above [max_thresh] and minima below [min_thresh] of the squares with [size] bins around every bin without the border bins """
+    s = [1] * (values.ndim - 2) + [2 * size + 1] * 2
+    votes = get_votes(values, maximum_filter(values, s, mode='nearest') == values, minimum_filter(values, s, mode='nearest') == values, max_thresh, min_thresh)
+    for v in votes.itervalues():
+        v[..., [0, -1], :] = 0
+        v[..., :, [0, -1]] = 0
+    return votes
+
+
+def get_region_votes(values, max_thresholds, min_thresholds):
+    """ :returns the number of [max_thresholds] below and [min_thresholds] above the content of every bin, the thresholds have the shape [..., n] """
+    values = values[..., None]
+    return {'max': (values > array(max_thresholds, 'd')[..., None, None, :]).sum(-1), 'min': (values < array(min_thresholds, 'd')[..., None, None, :]).sum(-1)}
+
 
 # ==============================================
 # MAIN CLASS
@@ -13,6 +60,7 @@ class Extrema2D:
         self.SignalHisto = signal_histo
         self.MeanHisto = mean_histo
         self.Thresholds = self.find_thresholds()
+        self.Values = get_bin_contents(self.SignalHisto)
         # attributes
         self.rows = self.SignalHisto.GetNbinsY() + 2
         self.cols = self.SignalHisto.GetNbinsX() + 2
@@ -31,41 +79,20 @@ class Extrema2D:
         dic['max'] = thresh[(-nq / 2):]
         return dic
 
+    def line_scan(self, mode):
+        self.add_votes(get_line_votes(self.Values, self.Thresholds['max'][0], self.Thresholds['min'][-1], mode))
+
     def horizontal_scan(self):
-        for row in xrange(self.rows):
-            for col in xrange(self.cols):
-                self.__add_local_extrema(col, row, mode='horizontal')
+        self.line_scan('horizontal')
 
     def vertical_scan(self):
-        for col in xrange(self.cols):
-            for row in xrange(self.rows):
-                self.__add_local_extrema(col, row, mode='vertical')
+        self.line_scan('vertical')
 
     def sw_ne_scan(self):
-        rows = [row for row in xrange(self.rows - 2, 0, -1)]
-        cols = [0] * (self.rows - 2)
-        rows += [0] * (self.cols - 1)
-        cols += [col for col in xrange(self.cols - 1)]
-        for row, col in zip(rows, cols):
-            while row < self.rows and col < self.cols:
-                self.__add_local_extrema(col, row, mode='swne')
-                row += 1
-                col += 1
+        self.line_scan('swne')
 
     def nw_se_scan(self):
-        rows = [row for row in xrange(1, self.rows - 1)]
-        cols = [0] * (self.rows - 2)
-        print len(rows), len(cols)
-        rows += [self.rows - 1] * (self.cols - 1)
-        cols += [col for col in xrange(self.cols - 1)]
-        print len(rows), len(cols)
-        for row, col in zip(rows, cols):
-            while row >= 0 and col < self.cols:
-                print col, row,
-                self.__add_local_extrema(col, row, mode='nwse')
-                row -= 1
-                col += 1
-            print
+        self.line_scan('nwse')
 
     def make_all_line_scans(self):
         self.horizontal_scan()
@@ -75,52 +102,19 @@ class Extrema2D:
         self.show_voting_histos()
 
     def region_scan(self):
-        for col in xrange(self.cols):
-            for row in xrange(self.rows):
-                for threshold in self.Thresholds['max']:
-                    if self.SignalHisto.GetBinContent(col, row) > threshold:
-                        old_content = self.VotingHistos['max'].GetBinContent(col, row)
-                        self.VotingHistos['max'].SetBinContent(col, row, old_content + 1)
-                for threshold in self.Thresholds['min']:
-                    if self.SignalHisto.GetBinContent(col, row) < threshold:
-                        old_content = self.VotingHistos['min'].GetBinContent(col, row)
-                        self.VotingHistos['min'].SetBinContent(col, row, old_content + 1)
+        self.add_votes(get_region_votes(self.Values, self.Thresholds['max'], self.Thresholds['min']))
 
     def square_scan(self, size=1, histo=None):
         fill_histos = self.VotingHistos if histo is None else histo
-        rows = [i for i in xrange(-size, size + 1)] * (2 * size + 1)
-        cols = sorted(rows)
-        for col in xrange(1, self.cols - 1):
-            for row in xrange(1, self.rows - 1):
-                square = [self.SignalHisto.GetBinContent(col + x, row + y) for x, y in zip(cols, rows)]
-                if max(square) == self.SignalHisto.GetBinContent(col, row) and max(square) > self.Thresholds['max'][0]:
-                    old_content = fill_histos['max'].GetBinContent(col, row)
-                    fill_histos['max'].SetBinContent(col, row, old_content + 1)
-                elif min(square) == self.SignalHisto.GetBinContent(col, row) and min(square) < self.Thresholds['min'][-1]:
-                    old_content = fill_histos['min'].GetBinContent(col, row)
-                    fill_histos['min'].SetBinContent(col, row, old_content + 1)
+        self.add_votes(get_square_votes(self.Values, self.Thresholds['max'][0], self.Thresholds['min'][-1], size), fill_histos)
         self.VotingHistos = fill_histos
 
-    def __add_local_extrema(self, col, row, mode):
-        if mode == 'horizontal':
-            cols, rows = [col - 1, col, col + 1], [row] * 3
-        elif mode == 'vertical':
-            cols, rows = [col] * 3, [row - 1, row, row + 1]
-        elif mode == 'swne':
-            cols, rows = [col - 1, col, col + 1], [row - 1, row, row + 1]
-        else:
-            cols, rows = [col - 1, col, col + 1], [row + 1, row, row - 1]
-
-        start = self.SignalHisto.GetBinContent(cols[0], rows[0])
-        center = self.SignalHisto.GetBinContent(cols[1], rows[1])
-        end = self.SignalHisto.GetBinContent(cols[2], rows[2])
-        print start, center, end
-        if start <= center >= end and center > self.Thresholds['max'][0]:
-            old_content = self.VotingHistos['max'].GetBinContent(col, row)
-            self.VotingHistos['max'].SetBinContent(col, row, old_content + 1)
-        elif start >= center <= end and center < self.Thresholds['min'][-1]:
-            old_content = self.VotingHistos['min'].GetBinContent(col, row)
-            self.VotingHistos['min'].SetBinContent(col, row, old_content + 1)
+    def add_votes(self, votes, histos=None):
+        """ adds the [votes] of the bins to the voting histograms """
+        histos = self.VotingHistos if histos is None else histos
+        for name, v in votes.iteritems():
+            for col, row in zip(*where(v)):
+                histos[name].SetBinContent(int(col), int(row), histos[name].GetBinContent(int(col), int(row)) + v[col, row])
 
     def create_voting_histo(self):
         axes = [self.SignalHisto.GetXaxis(), self.SignalHisto.GetYaxis()]
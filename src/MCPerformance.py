@@ -8,8 +8,10 @@ from ROOT import TFile, TTree
 import os
 import shutil
 import gc
+import numpy as np
 from array import array
 from datetime import datetime
+from multiprocessing import Pool, cpu_count
 '''
 To improve:
     import config file
@@ -18,6 +20,47 @@ To improve:
     include in framework ?
 '''
 
+def AnalyseToy(args):
+    '''
+    Simulates and analyses one toy run in a worker process
+    :param args: signal height, repetition, seed of the toy and the settings (hits, binning, minimum statistics, quantiles, verbose)
+    :return: height, repetition, npeaks, ninjas, ghosts, number of minima, rec_sa_quantiles, rec_sa_minmax
+    '''
+    height, repetition, seed, (hits_per_height, binning, minimum_statistics, min_percent, max_percent, verbose) = args
+    print "\n{0}th repetition with Signal height set to: {1}\n".format(repetition, height)
+    run_object = MCRun(validate=False,verbose=verbose,run_number=364)
+    run_object.MCAttributes['PeakHeight'] = height
+    run_object.MCAttributes['Seed'] = seed
+    run_object.MCAttributes['MCRunPath'] += '{0}/'.format(seed) # one directory per toy for the parallel runs
+    run_object.SetNumberOfHits(hits_per_height)
+    newAnalysis = Analysis(run_object, verbose=verbose)
+    newAnalysis.FindMaxima(binning=binning, minimum_bincontent=minimum_statistics)
+    newAnalysis.FindMinima(binning=binning, minimum_bincontent=minimum_statistics)
+    npeaks = newAnalysis.ExtremeAnalysis.ExtremaResults['TrueNPeaks']
+    ninjas = newAnalysis.ExtremeAnalysis.ExtremaResults['Ninjas']
+    ghosts = newAnalysis.ExtremeAnalysis.ExtremaResults['Ghosts']
+    maxima = newAnalysis.ExtremeAnalysis.ExtremaResults['FoundMaxima']
+    minima = newAnalysis.ExtremeAnalysis.ExtremaResults['FoundMinima']
+    # Reconstruct Signal Amplitude:
+    if len(maxima)*len(minima)>0:
+        maxbin = newAnalysis.ExtremeAnalysis.Pad.GetBinByCoordinates(*(maxima[0]))
+        maxbin.FitLandau()
+        minbin = newAnalysis.ExtremeAnalysis.Pad.GetBinByCoordinates(*(minima[0]))
+        minbin.FitLandau()
+        rec_sa_minmax = maxbin.Fit['MPV']/minbin.Fit['MPV']-1.
+    else:
+        rec_sa_minmax = -99
+    q = array('d', [1.*min_percent/100., 1.*max_percent/100.])
+    y = array('d', [0,0])
+    newAnalysis.ExtremeAnalysis.CreateMeanSignalHistogram()
+    newAnalysis.ExtremeAnalysis.MeanSignalHisto.GetQuantiles(2, y, q)
+    rec_sa_quantiles = y[1]/y[0]-1.
+    del newAnalysis
+    del run_object
+    gc.collect()
+    return height, repetition, npeaks, ninjas, ghosts, len(minima), rec_sa_quantiles, rec_sa_minmax
+
+
 class MCPerformance(Elementary):
 
     def __init__(self, verbose = False):
@@ -29,8 +72,15 @@ class MCPerformance(Elementary):
         self.binning = 100
         self.minimum_statistics = 100
         self.extremaconfiguration = "1.04 / 55 / 0.97 / 45"
-
-    def DoSignalHeightScan(self, heights=None, hits_per_height=300000):
+        self.n_workers = cpu_count() # number of parallel toys
+
+    def DoSignalHeightScan(self, heights=None, hits_per_height=300000, seed=None):
+        '''
+        Simulates and analyses [self.tries] toys for every signal height in [self.n_workers] parallel processes
+        :param heights: signal heights
+        :param hits_per_height: number of hits of every toy
+        :param seed: seed to draw the independent seeds of the toys
+        '''
         gc.disable()
         starttime = datetime.today()
 
@@ -78,47 +128,29 @@ class MCPerformance(Elementary):
         infofile.write("Quantiles:                                "+str(self.min_percent)+"/"+str(self.max_percent)+"\n")
         infofile.write("Binning:                                  "+str(self.binning)+"\n")
         infofile.write("Minimum Statistics:                       "+str(self.minimum_statistics)+"\n")
-        infofile.write("Extrema Configuration:                    "+self.extremaconfiguration)
+        infofile.write("Extrema Configuration:                    "+self.extremaconfiguration+"\n")
+        infofile.write("Seed:                                     "+str(seed))
 
         success_prob = []
         ghost_prob = []
         cycle_nr = 0
         cycles = self.tries*len(heights)
+        random = np.random.RandomState(seed)
+        seeds = np.zeros(0, 'i8')
+        while seeds.size < cycles: # independent seeds without duplicates, keeping the order of drawing
+            seeds = np.concatenate([seeds, random.randint(2**31, size=cycles - seeds.size)])
+            seeds = seeds[np.sort(np.unique(seeds, return_index=True)[1])]
+        settings = (hits_per_height, self.binning, self.minimum_statistics, self.min_percent, self.max_percent, self.verbose)
+        toys = [(height, repetition, int(seeds[i*self.tries+repetition]), settings) for i, height in enumerate(heights) for repetition in xrange(self.tries)]
+        pool = Pool(self.n_workers)
+        results = pool.imap(AnalyseToy, toys) # in order of the toys
         for height in heights: # add more statistics for each height, not just one try..
             fails = 0
             tot_ghosts = 0
             peaks_generated = 0
             for repetition in xrange(self.tries):
                 cycle_nr += 1
-                print "\n{0}th repetition with Signal height set to: {1}\n".format(repetition, height)
-                run_object = MCRun(validate=False,verbose=self.verbose,run_number=364)
-                run_object.MCAttributes['PeakHeight'] = height
-                run_object.SetNumberOfHits(hits_per_height)
-                print "newAnalysis = Analysis(run_object)"
-                newAnalysis = Analysis(run_object, verbose=self.verbose)
-                print "newAnalysis.FindMaxima()"
-                newAnalysis.FindMaxima(binning=self.binning, minimum_bincontent=self.minimum_statistics)
-                print "newAnalysis.FindMinima()"
-                newAnalysis.FindMinima(binning=self.binning, minimum_bincontent=self.minimum_statistics)
-                npeaks = newAnalysis.ExtremeAnalysis.ExtremaResults['TrueNPeaks']
-                ninjas = newAnalysis.ExtremeAnalysis.ExtremaResults['Ninjas']
-                ghosts = newAnalysis.ExtremeAnalysis.ExtremaResults['Ghosts']
-                maxima = newAnalysis.ExtremeAnalysis.ExtremaResults['FoundMaxima']
-                minima = newAnalysis.ExtremeAnalysis.ExtremaResults['FoundMinima']
-                # Reconstruct Signal Amplitude:
-                if len(maxima)*len(minima)>0:
-                    maxbin = newAnalysis.ExtremeAnalysis.Pad.GetBinByCoordinates(*(maxima[0]))
-                    maxbin.FitLandau()
-                    minbin = newAnalysis.ExtremeAnalysis.Pad.GetBinByCoordinates(*(minima[0]))
-                    minbin.FitLandau()
-                    rec_sa_minmax = maxbin.Fit['MPV']/minbin.Fit['MPV']-1.
-                else:
-                    rec_sa_minmax = -99
-                q = array('d', [1.*self.min_percent/100., 1.*self.max_percent/100.])
-                y = array('d', [0,0])
-                newAnalysis.ExtremeAnalysis.CreateMeanSignalHistogram()
-                newAnalysis.ExtremeAnalysis.MeanSignalHisto.GetQuantiles(2, y, q)
-                rec_sa_quantiles = y[1]/y[0]-1.
+                height, repetition, npeaks, ninjas, ghosts, minimas, rec_sa_quantiles, rec_sa_minmax = results.next()
 
                 # Fill ROOT file:
                 RealSignalAmplitude[0] = height
@@ -126,7 +158,7 @@ class MCPerformance(Elementary):
                 TrueNPeaks[0]          = npeaks
                 Ninjas[0]              = ninjas
                 Ghosts[0]              = ghosts
-                Minimas[0]             = len(minima)
+                Minimas[0]             = minimas
                 RecSA_Quantiles[0]     = rec_sa_quantiles
                 RecSA_MinMax[0]        = rec_sa_minmax
                 LogTree.Fill()
@@ -135,9 +167,6 @@ class MCPerformance(Elementary):
                 peaks_generated += npeaks
                 fails += ninjas
                 tot_ghosts += ghosts
-                # self.AddAnalysis(newAnalysis)
-                del newAnalysis
-                del run_object
                 elapsed_time = datetime.today() - starttime
                 estimated_time = elapsed_time/cycle_nr*cycles
                 remaining_time = estimated_time-elapsed_time
@@ -146,6 +175,8 @@ class MCPerformance(Elementary):
             ghost = 4.*ghosts/self.tries
             success_prob.append(success)
             ghost_prob.append(ghost)
+        pool.close()
+        pool.join()
 
         print "Write ROOT-file"
         rootfile.Write()
@@ -1,12 +1,35 @@
 from RunClass import Run
-from ROOT import TFile, TMath, gRandom, TCanvas, TTree, TF2, Double, gPad, gStyle
-from array import array
+from ROOT import TFile, TMath, gRandom, TCanvas, TTree, TF2, gPad, gStyle, std
 from datetime import datetime
+from StringIO import StringIO
+from fit import random_landau
 import os
 import types as t
 import numpy as np
 import ConfigParser
 
+
+def SampleBinnedMap(contents, x_edges, y_edges, n, random):
+    '''
+    Draws random positions from a binned 2d map like TH2::GetRandom2: the bins are
+    chosen by inverse-CDF sampling of the bin contents and the positions are uniform
+    within the bins
+    :param contents: array of the bin contents [x, y]
+    :param x_edges: bin edges in x
+    :param y_edges: bin edges in y
+    :param n: number of positions
+    :param random: numpy RandomState
+    :return: x and y arrays
+    '''
+    cdf = np.cumsum(contents.ravel())
+    ix, iy = np.unravel_index(np.searchsorted(cdf, random.uniform(0, cdf[-1], n), 'right'), contents.shape)
+    return [edges[i] + (edges[i + 1] - edges[i]) * random.uniform(size=n) for edges, i in [(x_edges, ix), (y_edges, iy)]]
+
+
+def Gaus(x, mean, sigma):
+    return np.exp(-.5 * ((x - mean) / sigma) ** 2)
+
+
 class MCRun(Run):
 
     def __init__(self, validate = True, run_number = None, verbose=False):
@@ -28,7 +51,8 @@ class MCRun(Run):
             'integral50_max': 500,
             'MCRunPath': 'runs/MC/MC_{0}/', # {0}: placeholder for run number
             'DrawRealDistribution': False,
-            'Save': True
+            'Save': True,
+            'Seed': None
         }
         self.NumberOfHits = 300000
         self.IsMonteCarlo = True
@@ -142,12 +166,12 @@ class MCRun(Run):
         else:
             print '\n'
 
-    def Simulate(self, save=None, draw=None):
+    def Simulate(self, save=None, draw=None, seed=None):
         '''
-
+        Generates all hits at once as numpy arrays and writes them to the track_info tree in bulk
         :param save: if True: saves the root file as well as the true signal distribution
         :param draw: if True draws the signal distribution
-        :param ask:
+        :param seed: seed of the random numbers, default: MCAttributes['Seed'] or the time of the day
         :return:
         '''
 
@@ -169,12 +193,13 @@ class MCRun(Run):
             assert(type(save) == t.BooleanType), "save argument has to be of type boolean"
             self.MCAttributes['Save'] = save
 
-        def ManualHitDistribution(x, par):
+        def ManualHitDistribution(x, y, par):
             '''
             Probability density function for hit distribution based on
             6 2d gaussian in a rectangular pattern. The PDF is NOT
             normalized to 1
-            :param x: array, x[0]: x position, x[1]: y position
+            :param x: array of the x positions
+            :param y: array of the y positions
             :param par: parameter array;
             :return:
             '''
@@ -182,7 +207,7 @@ class MCRun(Run):
             norm = 1.
             sigma = 0.04
             for i in xrange(len(par)/2):
-                result += norm*TMath.Gaus(x[0], par[2*i], sigma)*TMath.Gaus(x[1], par[2*i+1], sigma)
+                result += norm*Gaus(x, par[2*i], sigma)*Gaus(y, par[2*i+1], sigma)
             return result
 
         def CreateRandomPeaksConfig(xmin, xmax, ymin, ymax, bkg = 120, peak_height = 0.5, npeaks = NPeaks):
@@ -312,10 +337,23 @@ class MCRun(Run):
                 result += norm*TMath.Gaus(x[0], par[3+4*i], par[5+4*i])*TMath.Gaus(x[1], par[4+4*i], par[6+4*i])
             return result
 
-        # Set seed for random number generator:
-        today = datetime.today()
-        seed = int((today-datetime(today.year, today.month, today.day , 0, 0, 0, 0)).total_seconds() % 1800 *1e6)
+        def SignalShapeArray(x, y, par):
+            '''
+            SignalShape for arrays of the x and y positions
+            '''
+            norm = par[1]*par[2] if par[1] != 0 else 1
+            result = np.full(x.size, par[1], dtype='d')
+            for i in xrange(int(par[0])):
+                result += norm*Gaus(x, par[3+4*i], par[5+4*i])*Gaus(y, par[4+4*i], par[6+4*i])
+            return result
+
+        # Set seed for random number generators:
+        seed = self.MCAttributes['Seed'] if seed is None else seed
+        if seed is None:
+            today = datetime.today()
+            seed = int((today-datetime(today.year, today.month, today.day , 0, 0, 0, 0)).total_seconds() % 1800 *1e6)
         gRandom.SetSeed(seed)
+        random = np.random.RandomState(seed)
 
         # create track_info ROOT file
         if not os.path.exists(MCRunPath):
@@ -323,27 +361,12 @@ class MCRun(Run):
         if self.MCAttributes['Save']:
             file = TFile(MCRunPath+'track_info.root','RECREATE')
         self.track_info = TTree('track_info', 'MC track_info')
-        track_x = array('f',[0])
-        track_y = array('f',[0])
-        integral50 = array('f',[0])
-        calibflag = array('i',[0])
-        calib_offset = array('i',[0])
-        time_stamp = array('f', [0])
-        self.track_info.Branch('track_x', track_x, 'track_x/F')
-        self.track_info.Branch('track_y', track_y, 'track_y/F')
-        self.track_info.Branch('integral50', integral50, 'integral50/F')
-        self.track_info.Branch('calibflag', calibflag, 'calibflag/I')
-        self.track_info.Branch('calib_offset', calib_offset, 'calib_offset/I')
-        self.track_info.Branch('time_stamp', time_stamp, 'time_stamp/F')
 
 
         # Create Manual Hit Distribution:
         if self.MCAttributes['HitDistributionMode'] == 'Manual':
             dx = 0.08
             dy = 0.07
-            f_lateral = TF2('f_lateral', ManualHitDistribution, xmin, xmax, ymin, ymax, 12)
-            f_lateral.SetNpx(80)
-            f_lateral.SetNpy(80)
             # 6 gaus centers:
             par = np.array([center_x-dx/2.,     # x1
                             center_y+dy,        # y1
@@ -358,9 +381,6 @@ class MCRun(Run):
                             center_x+dx/2.,     # x6
                             center_y-dy         # y6
                             ])
-            f_lateral.SetParameters(par)
-        a = Double()
-        b = Double()
 
         # Generate Signal Distribution:
         if self.MCAttributes['SignalMode'] == 'Landau':
@@ -385,51 +405,66 @@ class MCRun(Run):
         else:
             answer = 'yes'
 
-        # Set the Hit distribution for Manual or Import
+        # Set the binned Hit distribution for Manual (80 x 80 bins) or Import
         if self.MCAttributes['HitDistributionMode'] == 'Manual':
-            HitsTemplate = f_lateral
+            x_edges, y_edges = np.linspace(xmin, xmax, 81), np.linspace(ymin, ymax, 81)
+            x_centers, y_centers = np.meshgrid((x_edges[1:]+x_edges[:-1])/2., (y_edges[1:]+y_edges[:-1])/2., indexing='ij')
+            HitsMap = ManualHitDistribution(x_centers, y_centers, par), x_edges, y_edges
         elif self.MCAttributes['HitDistributionMode'] == 'Import':
-            HitsTemplate = self.counthisto
+            h = self.counthisto
+            x_axis, y_axis = h.GetXaxis(), h.GetYaxis()
+            HitsMap = (np.array([[h.GetBinContent(i, j) for j in xrange(1, h.GetNbinsY()+1)] for i in xrange(1, h.GetNbinsX()+1)]),
+                       np.array([x_axis.GetBinLowEdge(i) for i in xrange(1, h.GetNbinsX()+2)]), np.array([y_axis.GetBinLowEdge(i) for i in xrange(1, h.GetNbinsY()+2)]))
+
+        def GenerateHits(n):
+            '''
+            :return: x, y and integral50 of the hits out of [n] tries which fulfill the requirements
+            '''
+            # Get x and y
+            if self.MCAttributes['HitDistributionMode'] == 'Uniform':
+                x, y = random.uniform(xmin, xmax, n), random.uniform(ymin, ymax, n)
+            else:
+                x, y = [random.normal(v, self.MCAttributes['TrackResolution']) for v in SampleBinnedMap(n=n, random=random, *HitsMap)]
+            # Get Signal at x and y
+            signal = SignalShapeArray(x, y, self.SignalParameters)
+            if self.MCAttributes['SignalMode'] == 'Landau':
+                signal = random_landau(signal, sigma, n, random)
+            else:
+                signal = random.normal(signal, abs(0.6*signal-33))
+            x, y, signal = [v.astype('f4') for v in [x, y, signal]]
+            # check if found values fulfill requirements
+            accepted = (xmin < x) & (x < xmax) & (ymin < y) & (y < ymax) & (signal < integral50_max)
+            return x[accepted], y[accepted], signal[accepted]
 
         mc_start_timestamp = 42. # arbitrary timestamp for the first MC event
         MCEventDeltaTime = 30.*60./300000. # 1800s/300000Hits = 0.006s/Hit
-        tmp_time = mc_start_timestamp
         # Generate Toy Data:
         if answer == 'yes':
             if self.verbose:
                 self.ShowMCConfig()
             self.verbose_print('Creating Toy Data with {0} Hits'.format(self.NumberOfHits))
             integral50_max = self.MCAttributes['integral50_max'] # Maximum of Signal response allowed (data: 500 ?)
-            i = 0
-            j = 0
-            while i < self.NumberOfHits and j < 2*self.NumberOfHits:
-                # Get x and y
-                if self.MCAttributes['HitDistributionMode'] == 'Uniform':
-                    track_x[0] = gRandom.Uniform(xmin,xmax)
-                    track_y[0] = gRandom.Uniform(ymin,ymax)
-                else:
-                    HitsTemplate.GetRandom2(a,b)
-                    track_x[0] = gRandom.Gaus(a, self.MCAttributes['TrackResolution']) # 0.002 = 20mu track resolution (first guess)
-                    track_y[0] = gRandom.Gaus(b, self.MCAttributes['TrackResolution'])
-
-                # Get Signal at x and y
-                if self.MCAttributes['SignalMode'] == 'Landau':
-                    integral50[0] = gRandom.Landau(f_signal(track_x[0], track_y[0]), sigma)
-                else:
-                    integral50[0] = gRandom.Gaus(f_signal(track_x[0], track_y[0]), 0.6*f_signal(track_x[0], track_y[0])-33)
-
-                # check if found values fulfill requirements
-                if xmin < track_x[0] < xmax and ymin < track_y[0] < ymax and integral50[0] < integral50_max:
-                    tmp_time += MCEventDeltaTime
-                    time_stamp[0] = tmp_time
-                    self.track_info.Fill()
-                    self.Data['track_x'].append(track_x[0])
-                    self.Data['track_y'].append(track_y[0])
-                    self.Data['integral50'].append(integral50[0])
-                    i += 1
-                j += 1
-            if not j<2*self.NumberOfHits: # if too many times requirements were not fulfilled
+            hits = []
+            n_hits = 0
+            n_tries = 0
+            while n_hits < self.NumberOfHits and n_tries < 2*self.NumberOfHits:
+                n = min(self.NumberOfHits - n_hits, 2*self.NumberOfHits - n_tries)
+                hits.append(GenerateHits(n))
+                n_hits += hits[-1][0].size
+                n_tries += n
+            if n_hits < self.NumberOfHits: # if too many times requirements were not fulfilled
                 assert(False), "Bad MC Parameters"
+            track_x, track_y, integral50 = [np.concatenate(v)[:self.NumberOfHits] for v in zip(*hits)]
+            time_stamp = (mc_start_timestamp + MCEventDeltaTime * np.arange(1, self.NumberOfHits + 1)).astype('f4')
+
+            # Fill the tree in bulk:
+            text = StringIO()
+            zeros = np.zeros(self.NumberOfHits)
+            np.savetxt(text, np.array([track_x, track_y, integral50, zeros, zeros, time_stamp]).T, fmt=['%.9g', '%.9g', '%.9g', '%d', '%d', '%.9g'])
+            self.track_info.ReadStream(std.istringstream(text.getvalue()), 'track_x/F:track_y/F:integral50/F:calibflag/I:calib_offset/I:time_stamp/F')
+            self.Data['track_x'] = track_x.tolist()
+            self.Data['track_y'] = track_y.tolist()
+            self.Data['integral50'] = integral50.tolist()
 
             # Save root file and true Signal Shape:
             if self.MCAttributes['Save']:
@@ -447,7 +482,6 @@ class MCRun(Run):
                         y = self.SignalParameters[4+4*i]
                         print "Peak {0:.0f} at position: ({1:.3f}/{2:.3f}) with Laundau Response MPV: {3:.2f} Sigma: {4:.1f}".format(i+1, x, y, f_signal(x, y),sigma)
                 else:
-                    integral50[0] = gRandom.Gaus(f_signal(track_x[0], track_y[0]), 0.6*f_signal(track_x[0], track_y[0])-33)
                     for i in xrange(int(self.SignalParameters[0])):
                         x = self.SignalParameters[3+4*i]
                         y = self.SignalParameters[4+4*i]
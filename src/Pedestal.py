@@ -41,7 +41,7 @@ class PedestalAnalysis(Analysis):
         name = self.SignalName if name is None else name
         suffix = '{r}_fwhm_{c}'.format(c=self.Cut(cut).GetName(), r=self.get_all_signal_names()[name])
         picklepath = self.make_pickle_path('Pedestal', run=self.RunNumber, ch=self.DUT.Number, suf=suffix)
-        return make_ufloat(do_pickle(picklepath, partial(self.draw_disto_fit, name=name, cut=self.Cut(cut), show=False), redo=redo), par=par)
+        return make_ufloat(self.do_pickle(picklepath, partial(self.draw_disto_fit, name=name, cut=self.Cut(cut), show=False), redo=redo), par=par)
 
     def get_mean(self, name=None, cut=None, redo=False):
         return self.get_par(1, name, cut, redo)
@@ -74,12 +74,12 @@ class PedestalAnalysis(Analysis):
         def func():
             info('Drawing pedestal distribution for {d} of run {r}'.format(d=self.DUT.Name, r=self.RunNumber), prnt=prnt)
             h1 = TH1F('h_pd', 'Pedestal Distribution', 2400, -150, 150)
-            self.Tree.Draw('{name}>>h_pd'.format(name=signal_name), cut, 'goff')
+            self.Run.Booking.draw(h1, signal_name, cut)
             return h1
 
         if show:
             self.format_statbox(all_stat=True, w=.3)
-        h = do_pickle(picklepath, func, redo=redo)
+        h = self.do_pickle(picklepath, func, redo=redo)
         format_histo(h, 'Pedestal', x_tit='Pedestal [mV]', y_tit='Number of Entries', y_off=1.8, fill_color=self.FillColor, normalise=normalise)
         set_drawing_range(h, rfac=.2)
         self.save_histo(h, 'PedestalDistribution{}'.format(cut.GetName()), show, save=save, logy=logy, lm=.13, prnt=prnt)
@@ -99,7 +99,7 @@ class PedestalAnalysis(Analysis):
         def f():
             return fit_fwhm(h, do_fwhm=True, draw=True)
 
-        fit_pars = do_pickle(picklepath, f, redo=True)
+        fit_pars = self.do_pickle(picklepath, f, redo=True)
         f = deepcopy(h.GetFunction('gaus'))
         f.SetNpx(1000)
         f.SetRange(h.GetXaxis().GetXmin(), h.GetXaxis().GetXmax())
@@ -171,7 +171,7 @@ class PedestalAnalysis(Analysis):
                 g1.SetPointError(ibin - 1, 0, fit.ParError(2 if sigma else 1))
             return g1
 
-        g = do_pickle(picklepath, func, redo=redo)
+        g = self.do_pickle(picklepath, func, redo=redo)
         format_histo(g, x_tit='Time [min]', y_tit='Mean Pulse Height [au]', y_off=1.6)
         self.save_histo(g, 'Pedestal{s}PulseHeight'.format(s='Sigma' if sigma else ''), show=show, lm=.14, draw_opt='apl')
         return g
@@ -51,12 +51,12 @@ class PulserAnalysis(Analysis):
 
     def get_pulse_height(self, corr=True, bin_width=.1, redo=False):
         pickle_path = self.make_pickle_path('Pulser', 'HistoFit', self.RunNumber, self.DUT.Number, suf='{}_{}'.format('ped_corr' if corr else '', 'BeamOn'))
-        fit = do_pickle(pickle_path, partial(self.draw_distribution_fit, show=False, prnt=False, corr=corr, redo=redo, bin_width=bin_width), redo=redo)
+        fit = self.do_pickle(pickle_path, partial(self.draw_distribution_fit, show=False, prnt=False, corr=corr, redo=redo, bin_width=bin_width), redo=redo)
         return make_ufloat(fit, par=1)
 
     def get_pedestal(self, par=1, redo=False):
         pickle_path = self.make_pickle_path('Pulser', 'Pedestal', self.RunNumber, self.DUT.Number)
-        fit = do_pickle(pickle_path, partial(self.draw_pedestal, show=False, prnt=False, redo=redo))
+        fit = self.do_pickle(pickle_path, partial(self.draw_pedestal, show=False, prnt=False, redo=redo))
         return make_ufloat(fit, par=par)
 
     def get_pedestal_mean(self, redo=False):
@@ -112,7 +112,7 @@ class PulserAnalysis(Analysis):
                 gr.SetPointError(xbin - 2, h.GetXaxis().GetBinWidth(xbin) / 2., f2.ParError(1))
             return gr
 
-        g = do_pickle(pickle_path, f, redo=redo)
+        g = self.do_pickle(pickle_path, f, redo=redo)
         self.format_statbox(only_fit=True, form='1.2f')
         fit_res = g.Fit('pol0', 'qs')
         values = [g.GetY()[i] for i in xrange(g.GetN()) if g.GetY()[i]]
@@ -157,7 +157,7 @@ class PulserAnalysis(Analysis):
             fit_func = h.Fit('gaus', 'qs{0}'.format('' if show else '0'), '', xmin, xmax)
             return FitRes(fit_func)
 
-        fit = do_pickle(pickle_path, f, redo=redo)
+        fit = self.do_pickle(pickle_path, f, redo=redo)
         f2 = deepcopy(gROOT.GetFunction('gaus'))
         f2.SetLineStyle(7)
         f2.SetRange(0, 500)
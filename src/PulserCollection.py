@@ -38,7 +38,7 @@ class PulserCollection(Analysis):
                 self.PBar.update(i)
             return phs
 
-        return do_pickle(pickle_path, f, redo=redo)
+        return self.do_pickle(pickle_path, f, redo=redo)
 
     def get_pulse_height_graph(self, sigma=False, vs_time=False, corr=True, beam_on=True, redo=False, legend=True, show_flux=True):
 
@@ -107,7 +107,7 @@ class PulserCollection(Analysis):
         mode = 'Time' if vs_time else 'Flux'
         pickle_path = self.make_pickle_path('Pulser', 'PulseHeights', self.RunPlan, self.DUT.Name, '{}_{}'.format(mode, sigma))
         f = partial(self.get_pulse_height_graph, sigma, vs_time, redo=redo)
-        mg = do_pickle(pickle_path, f, redo=redo)
+        mg = self.do_pickle(pickle_path, f, redo=redo)
         scale_multigraph(mg, scale)
         xtit = 'Time [hh:mm]' if vs_time else 'Flux [kHz/cm^{2}]'
         y_range = [.95, 1.05] if y_range is None and scale == 1 else y_range
@@ -43,7 +43,7 @@ class TimingAnalysis(Analysis):
             h = self.draw_peaks(show=False, prnt=False, redo=redo)
             return FitRes(h.GetListOfFunctions()[0])
 
-        return make_ufloat(do_pickle(pickle_path, f, redo=redo), par=par)
+        return make_ufloat(self.do_pickle(pickle_path, f, redo=redo), par=par)
 
     # --------------------------
     # region RUN CONFIG
@@ -108,7 +108,7 @@ class TimingAnalysis(Analysis):
                 return
             return h1
 
-        h = do_pickle(pickle_path, f, redo=redo)
+        h = self.do_pickle(pickle_path, f, redo=redo)
         if h is None:
             return
         self.format_statbox(fit=fit, w=.2, all_stat=not fit)
@@ -197,7 +197,7 @@ class TimingAnalysis(Analysis):
                 h.GetListOfFunctions().Add(fit_func)
             return h
 
-        histo = do_pickle(pickle_path, f, redo=redo)
+        histo = self.do_pickle(pickle_path, f, redo=redo)
         format_histo(histo, x_tit='Trigger Cell', y_tit='Signal Peak Time [ns]', y_off=1.8, stats=fit)
         self.format_statbox(only_fit=fit, x=.7)
         self.save_histo(histo, 'OriPeakPosVsTriggerCell', show, lm=.13, prnt=prnt, save=save)
@@ -1,6 +1,9 @@
 from draw import *
 from ConfigParser import ConfigParser
 from glob import glob
+from hashlib import sha1
+from cache import get_cache
+from hdf5_store import get_hdf5_store
 from numpy import deg2rad, rad2deg, arange, round_
 
 # global test campaign
@@ -29,6 +32,8 @@ class Analysis(Draw):
         self.PickleDir = join(self.Dir, self.MainConfig.get('SAVE', 'pickle directory'))
         self.DataDir = self.MainConfig.get('MAIN', 'data directory')
         self.PickleSubDir = ''
+        self.Cache = self.load_cache()
+        self.HDF5 = self.load_hdf5_store()
 
         # Test Campaign
         self.TCString = self.load_test_campaign(testcampaign)
@@ -60,6 +65,20 @@ class Analysis(Draw):
         parser.read(file_name)
         return parser
 
+    def load_cache(self):
+        enabled = self.MainConfig.getboolean('SAVE', 'cache') if self.MainConfig.has_option('SAVE', 'cache') else True
+        max_size = self.MainConfig.getfloat('SAVE', 'cache size') * 1e9 if self.MainConfig.has_option('SAVE', 'cache size') else None
+        return get_cache(self.PickleDir, max_size, enabled)
+
+    def load_hdf5_store(self):
+        max_open = self.MainConfig.getint('SAVE', 'hdf5 max open') if self.MainConfig.has_option('SAVE', 'hdf5 max open') else None
+        mmap = self.MainConfig.getboolean('SAVE', 'hdf5 mmap') if self.MainConfig.has_option('SAVE', 'hdf5 mmap') else None
+        return get_hdf5_store(max_open, mmap)
+
+    def close_hdf5(self):
+        """ closes all pooled hdf5 handles of this process, they get reopened at the next access """
+        self.HDF5.close()
+
     def load_test_campaign(self, testcampaign):
         global g_test_campaign
         if g_test_campaign is None and testcampaign is None:
@@ -132,6 +151,25 @@ class Analysis(Draw):
     def make_simple_hdf5_path(self, *args, **kwargs):
         return self.make_simple_pickle_path(*args, **kwargs).replace('pickle', 'hdf5')
 
+    def make_cut_hdf5_path(self, cut, name='', suf='', *args, **kwargs):
+        """ :returns the simple hdf5 path with a short hash of the [cut] string for the files which depend on the cut but are not written by the cache """
+        cut = cut.GetTitle() if hasattr(cut, 'GetTitle') else str(cut)
+        return self.make_simple_hdf5_path(name, '_'.join(str(v) for v in [suf, sha1(cut).hexdigest()[:8]] if str(v)), *args, **kwargs)
+
+    def get_cache_context(self, cut=True):
+        """ :returns the state of the analysis which cached results depend on: the config sections and the active cut string """
+        parsers = [self.Config] + ([self.Run.Config] if hasattr(self, 'Run') and hasattr(self.Run, 'Config') else [])
+        sections = [[(section, parser.items(section, raw=True)) for section in parser.sections()] for parser in parsers]
+        cut = getattr(self, 'Cut', None) if cut else None  # the sub analyses keep the TCut of their analysis
+        cut = cut().GetTitle() if hasattr(cut, 'CutStrings') else cut.GetTitle() if hasattr(cut, 'GetTitle') else None
+        return [self.TCString, sections, cut]
+
+    def do_pickle(self, path, func, value=None, redo=False, *args, **kwargs):
+        return self.Cache.do_pickle(path, func, value, redo, self.get_cache_context(), args, kwargs)
+
+    def do_hdf5(self, path, func, redo=False, *args, **kwargs):
+        return self.Cache.do_hdf5(path, func, redo, self.get_cache_context(), args, kwargs)
+
     # TODO: move to higher analysis
     def calc_time_difference(self, m1, m2, p=None):
         return t_diff(self.PathLength, self.Momentum if p is None else p, m1, m2) % self.BunchSpacing
@@ -33,7 +33,9 @@ class AnalysisCollection(Analysis):
 
         # Loading the Trees and Time Vectors in Parallel
         self.LoadTree = load_tree
-        self.Threads = load_root_files(self.RunSelection, load_tree)
+        self.NWorkers = self.load_n_workers()
+        self.Threads = load_root_files(self.RunSelection, load_tree, self.NWorkers)
+        self.remove_failed_runs(self.Threads.keys())
 
         # Make Common Pickles
         self.MinFluxRun, self.MaxFluxRun = self.get_high_low_rate_runs()
@@ -83,6 +85,31 @@ class AnalysisCollection(Analysis):
         rows = zip(self.Runs, ['{:14.1f}'.format(flux.n) for flux in self.Fluxes], bias, self.RunSelection.get_selected_start_times(), times)
         print_table(header=['Run', 'Flux [kHz/cm2]', 'Bias [V]', 'Start', 'Duration [hh:mm]'], rows=rows, prnt=self.Verbose)
 
+    def get_cache_context(self, cut=True):
+        cuts = [ana.Cut().GetTitle() for ana in self.Analyses.itervalues()] if cut and self.LoadTree and hasattr(self, 'Analyses') else None
+        return Analysis.get_cache_context(self, cut=False) + [cuts]
+
+    def load_n_workers(self):
+        return self.MainConfig.getint('PARALLEL', 'workers') if self.MainConfig.has_option('PARALLEL', 'workers') else None
+
+    def load_parallel_analyses(self):
+        return self.MainConfig.getboolean('PARALLEL', 'analyses') if self.MainConfig.has_option('PARALLEL', 'analyses') else False
+
+    def load_parallel_plots(self):
+        return self.MainConfig.getboolean('PARALLEL', 'run plots') if self.MainConfig.has_option('PARALLEL', 'run plots') else False
+
+    def remove_failed_runs(self, good_runs):
+        failed = [run for run in self.Runs if run not in good_runs]
+        if not failed:
+            return
+        if len(failed) == self.NRuns:
+            critical('Could not load any run of run plan {}'.format(self.RunPlan))
+        warning('Removing run{} {} from the selection'.format('s' if len(failed) > 1 else '', ', '.join(str(run) for run in failed)))
+        self.RunSelection.unselect_list_of_runs([int(run) for run in failed])
+        self.Runs = array(self.RunSelection.get_selected_runs())
+        self.NRuns = len(self.Runs)
+        self.Fluxes = self.RunSelection.get_selected_fluxes()
+
     def get_high_low_rate_runs(self):
         return self.Runs[where(self.Fluxes == self.Fluxes.min())[0]][0], self.Runs[where(self.Fluxes == self.Fluxes.max())[0]][0]
 
@@ -108,6 +135,8 @@ class AnalysisCollection(Analysis):
 
     def load_analyses(self):
         """ Creates and adds Analysis objects with run numbers in runs. """
+        if self.LoadTree and self.load_parallel_analyses():
+            self.remove_failed_runs(self.prepare_analyses())
         analyses = OrderedDict()
         for run in self.Runs:
             analysis = self.load_analysis(run)
@@ -118,10 +147,33 @@ class AnalysisCollection(Analysis):
         self.Threads = None
         return analyses
 
+    def prepare_analyses(self, timeout=60 * 60):
+        """ Builds the single analyses in worker processes, so that all their pickles (cuts, pulse heights, ...) already exist when they are loaded.
+            :returns the runs which could be built """
+        n_workers = get_n_workers(self.NWorkers, self.NRuns)
+        self.info('Preparing {} analyses with {} workers ...'.format(self.NRuns, n_workers))
+        pool = Pool(n_workers)
+        results = [pool.apply_async(prepare_analysis, (self.load_dummy(), run, self.DUT.Number, self.TCString, self.MinFluxRun, self.MaxFluxRun)) for run in self.Runs]
+        self.PBar.start(self.NRuns)
+        good_runs = []
+        for run, result in zip(self.Runs, results):
+            try:
+                error = result.get(timeout)
+            except Exception as err:
+                error = '{}: {}'.format(err.__class__.__name__, err)
+            if error is None:
+                good_runs.append(run)
+            else:
+                warning('Could not build the analysis of run {} ({})'.format(run, error))
+            self.PBar.update()
+        pool.close()
+        return good_runs
+
     def close_files(self):
         for ana in self.Analyses.itervalues():
             ana.Run.tree.Delete()
             ana.Run.RootFile.Close()
+        self.close_hdf5()
 
     def delete_trees(self):
         for ana in self.Analyses.itervalues():
@@ -189,7 +241,7 @@ class AnalysisCollection(Analysis):
             bins = sorted(s.GetPositionX()[i] for i in xrange(s.GetNPeaks()))
             split_bins = histogram(values, concatenate(([0], [[ibin / 10 ** .1, ibin * 10 ** .1] for ibin in bins], [1e5]), axis=None))[0]
             return cumsum(split_bins[where(split_bins > 0)])[:-1]
-        return do_pickle(self.make_simple_pickle_path('Splits', sub_dir='Flux'), f, redo=redo or show)
+        return self.do_pickle(self.make_simple_pickle_path('Splits', sub_dir='Flux'), f, redo=redo or show)
 
     def get_flux_average(self, values):
         values = values[self.get_fluxes().argsort()]  # sort by ascending fluxes
@@ -213,23 +265,41 @@ class AnalysisCollection(Analysis):
     def get_currents(self):
         return OrderedDict((key, ana.Currents.get_current()) for key, ana in self.Analyses.iteritems())
 
-    def get_run_values(self, string, f, runs=None, pbar=None, avrg=False, picklepath=None, *args, **kwargs):
-        return self.generate_run_plots(string, f, runs, pbar, avrg, picklepath, *args, **kwargs)
+    def get_run_values(self, string, f, runs=None, pbar=None, avrg=False, picklepath=None, parallel=None, *args, **kwargs):
+        return self.generate_run_plots(string, f, runs, pbar, avrg, picklepath, parallel, *args, **kwargs)
 
-    def get_values(self, string, f, pbar=True, avrg=False, picklepath=None, *args, **kwargs):
-        return self.generate_run_plots(string, f, None, pbar, avrg, picklepath, *args, **kwargs)
+    def get_values(self, string, f, pbar=True, avrg=False, picklepath=None, parallel=None, *args, **kwargs):
+        return self.generate_run_plots(string, f, None, pbar, avrg, picklepath, parallel, *args, **kwargs)
 
-    def generate_run_plots(self, string, f, runs=None, pbar=None, avrg=False, picklepath=None, *args, **kwargs):
+    def generate_run_plots(self, string, f, runs=None, pbar=None, avrg=False, picklepath=None, parallel=None, *args, **kwargs):
+        """ :param parallel: run [f] in worker processes, only possible for methods of the analysis class with picklable return values. Default from main config. """
         pbar = not all(file_exists(picklepath.format(run)) for run in self.Runs) if picklepath is not None and pbar is None else pbar
         pbar = True if 'redo' in kwargs and kwargs['redo'] else pbar
         self.info('Generating {} ...'.format(string), prnt=pbar)
         self.PBar.start(self.NRuns if runs is None else len(runs)) if pbar else do_nothing()
-        plots = []
-        for ana in self.get_analyses(runs):
-            plots.append(f(ana, *args, **kwargs))
-            self.PBar.update() if pbar else do_nothing()
+        plots = self.generate_parallel(f, runs, pbar, *args, **kwargs) if self.can_parallelise(f, parallel) else None
+        if plots is None:
+            plots = []
+            for ana in self.get_analyses(runs):
+                plots.append(f(ana, *args, **kwargs))
+                self.PBar.update() if pbar else do_nothing()
         return array(self.get_flux_average(array(plots)) if avrg else plots)
 
+    def can_parallelise(self, f, parallel=None):
+        parallel = self.load_parallel_plots() if parallel is None else parallel
+        method = getattr(self.Analysis, getattr(f, '__name__', ''), None)
+        return parallel and self.LoadTree and method is not None and getattr(method, 'im_func', None) is getattr(f, 'im_func', f)
+
+    def generate_parallel(self, f, runs=None, pbar=True, *args, **kwargs):
+        """ :returns the results of [f] for all analyses calculated in worker processes or None if that failed """
+        runs = [run for run in self.Analyses if runs is None or run in runs]
+        builders = [(build_analysis, (self.load_dummy(), run, self.DUT.Number, self.TCString, self.MinFluxRun, self.MaxFluxRun), {}) for run in runs]
+        try:
+            return parallelise_instance(builders, f, args, kwargs, self.NWorkers, pbar=self.PBar if pbar else None)
+        except Exception as err:
+            warning('Parallel generation of {} failed ({}: {}), falling back to serial mode'.format(f.__name__, err.__class__.__name__, err))
+            self.PBar.start(len(runs)) if pbar else do_nothing()
+
     def generate_plots(self, string, f, pbar=True, *args, **kwargs):
         return self.generate_run_plots(string, f, runs=None, pbar=pbar, *args, **kwargs)
 
@@ -244,7 +314,7 @@ class AnalysisCollection(Analysis):
             self.info('Getting STD of Signal Map ... ')
             return OrderedDict((key, ana.get_sm_std(redo=redo)) for key, ana in self.Analyses.iteritems())
 
-        return do_pickle(pickle_path, f, redo=redo)
+        return self.do_pickle(pickle_path, f, redo=redo)
 
     def get_sm_std(self, redo=False, low=False, high=False):
         pickle_path = self.make_pickle_path('Uniformity', 'SMSTD', self.RunPlan, self.DUT.Number, suf='{}{}'.format(int(low), int(high)))
@@ -253,7 +323,7 @@ class AnalysisCollection(Analysis):
         def f():
             return mean_sigma([v for run, v in self.get_sm_std_devs(redo).iteritems() if run in runs]) if runs else make_ufloat((0, 0))
 
-        return do_pickle(pickle_path, f, redo=redo)
+        return self.do_pickle(pickle_path, f, redo=redo)
 
     def get_pulse_heights(self, bin_width=None, redo=False, runs=None, corr=True, err=True, pbar=None, avrg=False, peaks=False):
         error = self.get_repr_error(110, peaks, redo) if err else 0
@@ -304,7 +374,7 @@ class AnalysisCollection(Analysis):
                 return .01  # take 1% if there is only one measurement below the given flux
             return mean_sigma(values)[1]
 
-        return do_pickle(pickle_path, f, redo=redo)
+        return self.do_pickle(pickle_path, f, redo=redo)
 
     def get_uniformities(self, bins=10, redo=False, low_flux=False, high_flux=False):
         runs = self.get_runs_below_flux(110) if low_flux else self.get_runs_above_flux(2000) if high_flux else self.Runs
@@ -357,7 +427,7 @@ class AnalysisCollection(Analysis):
                 i_bin += 1  # there is an empty bin after each run
             return h1
 
-        h = do_pickle(pickle_path, f, redo=redo)
+        h = self.do_pickle(pickle_path, f, redo=redo)
         format_histo(h, x_tit='Time [hh:mm]', y_tit='Mean Pulse Height [au]', y_off=.8, fill_color=self.FillColor, stats=0, y_range=[0, h.GetMaximum() * 1.05])
         set_time_axis(h, off=self.FirstAnalysis.Run.StartTime if rel_t else 0)
         c = self.draw_histo(h, show=show, draw_opt='hist', x=1.5, y=.75, lm=.065, gridy=True, rm=.1 if with_flux else None)
@@ -541,7 +611,7 @@ class AnalysisCollection(Analysis):
             collimator_settings = set([(ana.Run.RunInfo['fs11'], ana.Run.RunInfo['fsh13']) for key, ana in self.Analyses.iteritems()])
             return {s: self.draw_ph_distributions(bin_width, show=show, fs11=s[0], fsh13=s[1]) for s in collimator_settings}
 
-        return do_pickle(pickle_path, f)
+        return self.do_pickle(pickle_path, f)
 
     def draw_ph_distributions(self, binning=None, fsh13=.5, fs11=65, show=True):
         runs = self.get_runs_by_collimator(fsh13=fsh13, fs11=fs11)
@@ -554,7 +624,7 @@ class AnalysisCollection(Analysis):
             runs = self.get_runs_below_flux(flux)
             return self.draw_combined_ph_distributions(runs, bin_width, show=False)
 
-        h = do_pickle(pickle_path, f, redo=show)
+        h = self.do_pickle(pickle_path, f, redo=show)
         return h
 
     def draw_combined_ph_distributions(self, runs, bin_width=.5, show=True):
@@ -661,7 +731,7 @@ class AnalysisCollection(Analysis):
                     h1.SetBinError(i, value.s)
                 return h1
 
-        hist = do_pickle(pickle_path, f, redo=redo)
+        hist = self.do_pickle(pickle_path, f, redo=redo)
         format_histo(hist, x_tit='Time [hh:mm]', y_tit='Flux [kHz/cm^{2}]', t_ax_off=self.InitTime if rel_time else 0, fill_color=self.FillColor, y_range=[1, 20000], stats=0)
         self.save_histo(hist, 'FluxEvo', x=1.5, y=.75, show=show, logy=True, draw_opt='bar' if not self.FirstAnalysis.has_branch('rate') else '')
         return hist
@@ -868,6 +938,22 @@ class AnalysisCollection(Analysis):
             ana.Cut.verbose = status
 
 
+def build_analysis(cls, run, dut, test_campaign, low_run, high_run):
+    """ Builds the analysis of a single run like AnalysisCollection.load_analyses, but opens the tree itself (for worker processes). """
+    ana = cls(run, dut, test_campaign, tree=True, prnt=False)
+    ana.Cut.set_high_low_rate_run(low_run=low_run, high_run=high_run)
+    ana.Cut.reload()
+    return ana
+
+
+def prepare_analysis(cls, run, dut, test_campaign, low_run, high_run):
+    """ Builds the analysis of a single run in a worker process. The results are stored as pickles, only the error message is sent back. """
+    try:
+        build_analysis(cls, run, dut, test_campaign, low_run, high_run).get_pulse_height()
+    except Exception as err:
+        return '{}: {}'.format(err.__class__.__name__, err)
+
+
 if __name__ == '__main__':
 
     p = init_argparser(run=10, dut=1, tree=True, has_verbose=True, has_collection=True, return_parser=True)
@@ -7,7 +7,7 @@
 from json import loads
 
 from ROOT import gStyle
-from numpy import arange, array, delete, append, concatenate, sqrt
+from numpy import arange, array, append, concatenate, sqrt, searchsorted, clip, cumsum, maximum
 
 from utils import get_root_vec
 from run import Run
@@ -69,7 +69,7 @@ class Bins:
         gStyle.SetNumberContours(self.Config.getint('PLOTS', 'contours'))
 
     def load_time_binning(self):
-        return array([self.Run.get_time_at_event(event) for event in self.Binning], 'd')
+        return array(self.Run.get_time_at_event(self.Binning), 'd')
 
     def create(self, evts_per_bin=None):
         evts_per_bin = self.BinSize if evts_per_bin is None else evts_per_bin
@@ -77,10 +77,13 @@ class Bins:
             return self.get_raw(evts_per_bin)
         jumps = filter(lambda x: x[1] > self.Cut.get_min_event(), self.Cut.get_interruptions_ranges())  # filter out interruptions outside event range
         first_jump_end = jumps[0][1] if jumps else 0
-        events = arange(min(self.Cut.get_min_event(), first_jump_end), self.Cut.get_max_event())
-        for start, stop in jumps:  # remove beam interruptions from events
-            events = delete(events, arange(start, stop + 1))
-        events = events[::evts_per_bin]  # slice out every nth entry
+        first, last = min(self.Cut.get_min_event(), first_jump_end), self.Cut.get_max_event()
+        starts, ends = clip(array(jumps, 'i8').reshape(-1, 2) + [0, 1], first, last).T  # sorted beam interruptions [start, end)
+        ends = maximum.accumulate(ends)
+        starts = maximum(starts, concatenate([[first], ends[:-1]]))  # remove events only once if the interruptions touch
+        n_removed = concatenate([[0], cumsum(ends - starts)])
+        kept = arange(0, last - first - n_removed[-1], evts_per_bin)  # every nth entry of the events without the interruptions
+        events = first + kept + n_removed[searchsorted(starts - first - n_removed[:-1], kept, 'right')]  # shift by the removed events before each kept event
         return append(events, self.Cut.get_max_event()) if self.Cut.get_max_event() != events[-1] else events
 
     def set_bin_size(self, value):
@@ -109,7 +112,7 @@ class Bins:
         """ returns bins with fixed time width. bin_width in seconds """
         if t_from_event:
             ev_bins = self.get_raw_event(bin_width, start_time, end_time)[1]
-            bins = array([self.Run.get_time_at_event(int(ev)) for ev in ev_bins], 'd')
+            bins = array(self.Run.get_time_at_event(ev_bins.astype('i8')), 'd')
         else:
             end_time = self.Run.EndTime if end_time is None else end_time
             bins = arange(self.Run.StartTime + start_time, end_time, bin_width)
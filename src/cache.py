@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+# --------------------------------------------------------
+#       content addressed cache for the pickles and hdf5 files of the analyses
+# --------------------------------------------------------
+
+import pickle
+from atexit import register
+from functools import partial
+from hashlib import sha1
+from json import dump, load
+from os import listdir, remove, rename, stat, symlink, readlink, utime, getpid
+from os.path import join, basename, lexists, islink, isfile, getsize, relpath, abspath
+from types import FunctionType, MethodType, BuiltinFunctionType
+
+from ROOT import TCut
+from numpy import ndarray
+
+from hdf5_store import get_hdf5_store
+from utils import ensure_dir, info, warning, print_table, make_byte_string, do_pickle, do_hdf5
+
+SCHEMA_VERSION = 1
+
+# one cache per directory and process
+g_caches = {}
+
+
+def get_cache(directory, max_size=None, enabled=True):
+    if directory not in g_caches:
+        g_caches[directory] = Cache(directory, max_size, enabled)
+    return g_caches[directory]
+
+
+class Cache(object):
+    """ Stores the results of do_pickle and do_hdf5 under a hash of the function (including its code), the arguments, the analysis context
+        (cut strings and config sections) and the schema version. The requested paths become symlinks to the latest entry with that name. """
+
+    def __init__(self, directory, max_size=None, enabled=True):
+        self.BaseDir = directory
+        self.Dir = ensure_dir(join(directory, 'Cache'))
+        self.IndexFile = join(self.Dir, 'index.json')
+        self.Enabled = enabled
+        self.MaxSize = max_size  # [B]
+
+        self.Index = self.load_index()
+        self.Entries = {}  # entries of this process since the last save
+        self.Hits, self.Misses = 0, 0
+        self.Size = sum(getsize(f) for f in self.get_files())
+        self.evict()
+        register(self.save_index)
+
+    # ----------------------------------------
+    # region INDEX
+    def load_index(self):
+        if isfile(self.IndexFile):
+            try:
+                with open(self.IndexFile) as f:
+                    return load(f)
+            except ValueError:
+                warning('Could not read the cache index, starting a new one')
+        return {'hits': 0, 'misses': 0, 'entries': {}}
+
+    def save_index(self):
+        """ merges the stats of this process into the index on disk, so that several processes can share the same cache """
+        if not self.Entries and not self.Hits and not self.Misses:
+            return
+        index = self.load_index()
+        index['hits'] += self.Hits
+        index['misses'] += self.Misses
+        for key, entry in self.Entries.iteritems():
+            entry['hits'] = entry['hits'] + index['entries'][key]['hits'] if key in index['entries'] else entry['hits']
+            index['entries'][key] = entry
+        index['entries'] = {key: entry for key, entry in index['entries'].iteritems() if isfile(self.get_path(key, entry['ext']))}
+        tmp_file = '{}.{}'.format(self.IndexFile, getpid())
+        with open(tmp_file, 'w') as f:
+            dump(index, f)
+        rename(tmp_file, self.IndexFile)
+        self.Index, self.Entries, self.Hits, self.Misses = index, {}, 0, 0
+
+    def update_entry(self, key, name, ext, hit):
+        entry = self.Entries.setdefault(key, {'name': name, 'ext': ext, 'hits': 0})
+        entry['hits'] += hit
+        self.Hits += hit
+        self.Misses += not hit
+
+    def get_files(self):
+        return [join(self.Dir, name) for name in listdir(self.Dir) if name.endswith('.pickle') or name.endswith('.hdf5')]
+
+    def get_path(self, key, ext='pickle'):
+        return join(self.Dir, '{}.{}'.format(key, ext))
+    # endregion INDEX
+    # ----------------------------------------
+
+    # ----------------------------------------
+    # region KEYS
+    def make_key(self, name, func, args=(), kwargs=None, context=None):
+        h = sha1(str(SCHEMA_VERSION))
+        for value in [relpath(abspath(name), self.BaseDir), self.get_identity(func), args, kwargs, context]:
+            self.update_hash(h, value)
+        return h.hexdigest()
+
+    def get_identity(self, func):
+        """ :returns a description of the function which changes when its code or its bound arguments change """
+        if isinstance(func, partial):
+            return [self.get_identity(func.func), func.args, func.keywords]
+        if isinstance(func, MethodType):
+            return [func.im_class.__name__, self.get_identity(func.im_func)]
+        if isinstance(func, FunctionType):
+            cells = [cell.cell_contents for cell in func.func_closure] if func.func_closure else []
+            return [func.__module__, func.__name__, self.get_code(func.func_code), func.func_defaults, cells]
+        if isinstance(func, BuiltinFunctionType):
+            return [getattr(func.__self__, '__class__', type(None)).__name__, func.__name__]
+        return getattr(func, '__name__', type(func).__name__)
+
+    def get_code(self, code):
+        return [code.co_code, code.co_names, [self.get_code(c) if hasattr(c, 'co_code') else c for c in code.co_consts]]
+
+    def update_hash(self, h, value):
+        if value is None or isinstance(value, (bool, int, long, float, str, unicode)):
+            h.update(repr(value))
+        elif isinstance(value, (list, tuple)):
+            h.update('[')
+            for v in value:
+                self.update_hash(h, v)
+            h.update(']')
+        elif isinstance(value, dict):
+            for key in sorted(value):
+                self.update_hash(h, key)
+                self.update_hash(h, value[key])
+        elif isinstance(value, ndarray):
+            h.update('{}{}'.format(value.dtype, value.shape))
+            h.update(value.tobytes())
+        elif isinstance(value, TCut):
+            h.update(value.GetTitle())
+        elif isinstance(value, (FunctionType, MethodType, partial)):
+            self.update_hash(h, self.get_identity(value))
+        elif hasattr(value, 'nominal_value'):  # ufloat
+            h.update(repr((value.n, value.s)))
+        else:  # analysis instances and other objects are described by the context
+            h.update(type(value).__name__)
+    # endregion KEYS
+    # ----------------------------------------
+
+    # ----------------------------------------
+    # region LOAD & SAVE
+    def do_pickle(self, path, func, value=None, redo=False, context=None, args=(), kwargs=None):
+        kwargs = {} if kwargs is None else kwargs
+        if not self.Enabled:
+            return do_pickle(path, func, value, redo, *args, **kwargs)
+        key = self.make_key(path, func, args, kwargs, context)
+        entry = self.get_path(key)
+        if value is None and not redo and isfile(entry):
+            try:
+                with open(entry) as f:
+                    value = pickle.load(f)
+                self.use(key, path, 'pickle', hit=True)
+                return value
+            except (ImportError, EOFError, ValueError, IndexError, pickle.UnpicklingError):  # recompute corrupt entries
+                pass
+        value = func(*args, **kwargs) if value is None else value
+        tmp_file = '{}.{}'.format(entry, getpid())
+        with open(tmp_file, 'w') as f:
+            pickle.dump(value, f)
+        rename(tmp_file, entry)
+        self.use(key, path, 'pickle', hit=False)
+        return value
+
+    def do_hdf5(self, path, func, redo=False, context=None, args=(), kwargs=None):
+        kwargs = {} if kwargs is None else kwargs
+        if not self.Enabled:
+            return do_hdf5(path, func, redo, *args, **kwargs)
+        store = get_hdf5_store()
+        if func is None:  # only load the latest entry with that name
+            return store.load(path)
+        key = self.make_key(path, func, args, kwargs, context)
+        entry = self.get_path(key, 'hdf5')
+        if not redo and isfile(entry):
+            try:
+                data = store.load(entry)
+                self.use(key, path, 'hdf5', hit=True)
+                return data
+            except (IOError, KeyError):  # recompute corrupt entries
+                store.close(entry)
+        tmp_file = '{}.{}'.format(entry, getpid())
+        store.save(tmp_file, data=func(*args, **kwargs))
+        store.close(entry)
+        rename(tmp_file, entry)
+        self.use(key, path, 'hdf5', hit=False)
+        return store.load(entry)
+
+    def use(self, key, path, ext, hit):
+        entry = self.get_path(key, ext)
+        if hit:
+            utime(entry, None)  # the modification time is the last access for the eviction
+        else:
+            self.Size += getsize(entry)
+        self.update_entry(key, basename(path), ext, hit)
+        self.link(entry, path)
+        if not hit:
+            self.evict()
+
+    @staticmethod
+    def link(entry, path):
+        """ point the requested path to the entry, this also replaces pickles from before the cache """
+        try:
+            if islink(path) and readlink(path) == entry:
+                return
+            if lexists(path):
+                remove(path)
+            symlink(entry, path)
+        except OSError:  # another process was faster
+            pass
+    # endregion LOAD & SAVE
+    # ----------------------------------------
+
+    # ----------------------------------------
+    # region EVICTION
+    def evict(self, max_size=None):
+        """ removes the least recently used entries until the cache is smaller than [max_size] """
+        max_size = self.MaxSize if max_size is None else max_size
+        if max_size is None or self.Size <= max_size:
+            return
+        files = sorted(((stat(f).st_mtime, getsize(f), f) for f in self.get_files()), reverse=True)
+        self.Size, n = 0, 0
+        for t, size, f in files:
+            if self.Size + size > max_size:
+                get_hdf5_store().remove(f)
+                n += 1
+            else:
+                self.Size += size
+        info('Removed {} old entries from the cache ({} left)'.format(n, make_byte_string(self.Size)))
+        self.save_index()
+
+    def clear(self):
+        for f in self.get_files():
+            get_hdf5_store().remove(f)
+        self.Size = 0
+        self.save_index()
+    # endregion EVICTION
+    # ----------------------------------------
+
+    def get_stats(self):
+        hits, misses = self.Index['hits'] + self.Hits, self.Index['misses'] + self.Misses
+        return {'hits': hits, 'misses': misses, 'ratio': hits / float(hits + misses) if hits + misses else 0., 'entries': len(self.get_files()), 'size': self.Size}
+
+    def print_stats(self):
+        s = self.get_stats()
+        print_table([[s['entries'], make_byte_string(s['size']), s['hits'], s['misses'], '{:.1f}'.format(100 * s['ratio'])]], ['Entries', 'Size', 'Hits', 'Misses', 'Hit Ratio [%]'])
+
+    def print_entries(self, n=20):
+        self.save_index()
+        entries = sorted(self.Index['entries'].iteritems(), key=lambda x: -x[1]['hits'])[:n]
+        print_table([[key[:10], entry['name'], entry['hits'], make_byte_string(getsize(self.get_path(key, entry['ext'])))] for key, entry in entries], ['Key', 'Name', 'Hits', 'Size'])
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# --------------------------------------------------------
+#       adc to vcal conversion with lookup tables for every pixel
+# --------------------------------------------------------
+
+from os import rename, getpid
+from os.path import join, basename, dirname, splitext, getmtime
+
+import h5py
+from numpy import genfromtxt, arange, clip, errstate, array
+from scipy.special import erf, erfinv
+
+from hdf5_store import get_hdf5_store
+
+VCAL_RANGE = [-500, 255 * 7]  # range of the calibration fit [vcal]
+N_ADC = 256
+
+
+def calc_adc(pars, vcal):
+    """ :returns the calibration fit [3] * (erf((x - [0]) / [1]) + [2]) for the parameters [pars] (shape [..., 4]) """
+    return pars[..., 3] * (erf((vcal - pars[..., 0]) / pars[..., 1]) + pars[..., 2])
+
+
+def calc_vcal(pars, adc):
+    """ :returns the inverse of the calibration fit, adc values outside of the fit give the limits of its range like TF1::GetX (nan without calibration) """
+    with errstate(divide='ignore', invalid='ignore'):
+        return clip(pars[..., 0] + pars[..., 1] * erfinv(clip(adc / pars[..., 3] - pars[..., 2], -1, 1)), *VCAL_RANGE)
+
+
+class Calibration(object):
+    """ Converts adc to vcal with a lookup table for every adc value of every pixel of the ROCs, calculated from the fits of the phCalibration.
+        The tables are saved in one hdf5 file per calibration file and are rebuilt if the calibration file changes. """
+
+    def __init__(self, fit_files, n_cols, n_rows, save_dir):
+        self.Files = fit_files
+        self.NCols, self.NRows = n_cols, n_rows
+        self.SaveDir = save_dir
+        self.HDF5 = get_hdf5_store()
+        self.Tables = {}  # roc -> modification time of the calibration file, fit parameters, lookup table
+
+    def get_path(self, roc):
+        return join(self.SaveDir, '{}_{}.hdf5'.format(basename(dirname(self.Files[roc])), splitext(basename(self.Files[roc]))[0]))
+
+    def load(self, roc, redo=False):
+        """ :returns the fit parameters [col, row] and the lookup table [col, row, adc] of [roc] """
+        mtime = getmtime(self.Files[roc])
+        if redo or self.Tables.get(roc, [None])[0] != mtime:
+            path = self.get_path(roc)
+            try:
+                f = self.HDF5.open(path)
+                if redo or f.attrs['mtime'] != mtime:
+                    raise IOError
+            except (IOError, KeyError):
+                self.save(roc, path, mtime)
+                f = self.HDF5.open(path)
+            self.Tables[roc] = mtime, f['pars'][:], f['table'][:]
+        return self.Tables[roc][1:]
+
+    def save(self, roc, path, mtime):
+        pars = genfromtxt(self.Files[roc], skip_header=3, usecols=arange(4)).reshape(self.NCols, self.NRows, 4)
+        tmp_file = '{}.{}'.format(path, getpid())
+        with h5py.File(tmp_file, 'w') as f:
+            f.attrs['mtime'] = mtime
+            f.create_dataset('pars', data=pars)
+            f.create_dataset('table', data=calc_vcal(pars[..., None, :], arange(N_ADC)))
+        self.HDF5.close(path)
+        rename(tmp_file, path)
+
+    def get_parameters(self, roc, redo=False):
+        return self.load(roc, redo)[0]
+
+    def get_vcal(self, roc, cols, rows, adcs):
+        """ :returns the vcal values of the hits with [adcs] in the pixels [cols], [rows] of [roc] """
+        pars, table = self.load(roc)
+        cols, rows, adcs = (array(v, 'i8') for v in [cols, rows, adcs])
+        vcals = table[cols, rows, clip(adcs, 0, N_ADC - 1)]
+        outside = (adcs < 0) | (adcs >= N_ADC)
+        vcals[outside] = calc_vcal(pars[cols[outside], rows[outside]], adcs[outside])
+        return vcals
+
+    def get_thresholds(self, roc):
+        """ :returns the vcal at zero adc of every pixel [col, row] of [roc] """
+        return calc_vcal(self.get_parameters(roc), 0.)
+
+    def get_adc(self, roc, vcal):
+        """ :returns the adc of every pixel [col, row] of [roc] at [vcal] """
+        return calc_adc(self.get_parameters(roc), vcal)
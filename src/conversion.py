@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# --------------------------------------------------------
+#       parallel and resumable conversion of several runs
+# --------------------------------------------------------
+
+from json import dump, load
+from multiprocessing import Process
+from os import rename, getpid
+from os.path import join, isfile, basename
+
+from run import Run
+from utils import *
+
+# maximum number of runs per stage if not set in the main config, 0 = one per cpu core
+STAGE_LIMITS = {'convert': 2, 'plane errors': 1, 'align': 0, 'track': 0, 'rename': 1}
+# stages which produce the root files that Converter.get_first_stage checks
+FILE_STAGES = ['convert', 'track', 'rename']
+
+
+def run_stage(run_number, test_campaign, stage, verbose=False):
+    """ executes the conversion [stage] of a single run, target of the worker processes """
+    run = Run(run_number, test_campaign, tree=False, verbose=verbose)
+    run.Converter.get_stages()[stage]()
+
+
+class ConversionScheduler(object):
+    """ Executes the stages of the conversion (see Converter.get_stages) for several runs in worker processes. The stages of a run are executed in order,
+        but different runs are converted at the same time with a maximum number of processes per stage: the converter is limited by i/o and
+        the tracking by the cpu. The state of every stage is saved, so an interrupted conversion resumes at the first unfinished stage of every run. """
+
+    def __init__(self, runs, test_campaign=None, verbose=False):
+
+        self.Run = Run(None, test_campaign, tree=False, verbose=verbose)
+        self.Converter = self.Run.Converter
+        self.TCString = self.Run.TCString
+        self.Verbose = verbose
+        self.Runs = sorted(runs)
+
+        self.Stages = self.Converter.get_stages().keys()
+        self.Limits = self.load_limits()
+        self.NWorkers = self.load_n_workers()
+        self.Target = run_stage  # function which is executed in the worker processes
+
+        self.StateFile = join(self.Run.RootFileDir, '.conversion_state.json')
+        self.State = self.load_state()
+        self.Running = {}  # run -> stage, process, start time
+        self.Times = {stage: [] for stage in self.Stages}  # durations of the finished stages of this session
+        self.Converted = []
+
+    # ----------------------------------------
+    # region INIT
+    def load_limits(self):
+        config = self.Run.MainConfig
+        return {stage: get_n_workers(config.getint('CONVERSION', stage) if config.has_option('CONVERSION', stage) else STAGE_LIMITS.get(stage, 0)) for stage in self.Stages}
+
+    def load_n_workers(self):
+        return get_n_workers(self.Run.MainConfig.getint('CONVERSION', 'workers') if self.Run.MainConfig.has_option('CONVERSION', 'workers') else 0)
+    # endregion INIT
+    # ----------------------------------------
+
+    # ----------------------------------------
+    # region STATE
+    def load_state(self):
+        if isfile(self.StateFile):
+            try:
+                with open(self.StateFile) as f:
+                    return {int(run): stages for run, stages in load(f).iteritems()}
+            except ValueError:
+                warning('Could not read the conversion state, starting from the root files')
+        return {}
+
+    def save_state(self):
+        tmp_file = '{}.{}'.format(self.StateFile, getpid())
+        with open(tmp_file, 'w') as f:
+            dump({str(run): stages for run, stages in self.State.iteritems()}, f, indent=2, sort_keys=True)
+        rename(tmp_file, self.StateFile)
+
+    def set_state(self, run, stage, status, duration=None):
+        stages = self.State.setdefault(run, {})
+        if status == 'running':  # the following stages have to be redone
+            for s in self.Stages[self.Stages.index(stage):]:
+                stages.pop(s, None)
+        stages[stage] = {'status': status, 'time': duration, 'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+        self.save_state()
+
+    def get_status(self, run, stage):
+        return self.State.get(run, {}).get(stage, {}).get('status')
+
+    def get_interrupted_stage(self, run):
+        return next((stage for stage in self.Stages if self.get_status(run, stage) in ['running', 'failed']), None)
+
+    def get_first_stage(self, run):
+        """ :returns the index of the first stage which is neither done according to the root files nor to the saved state.
+            A stage which was interrupted or failed is redone, since ROOT may recover a valid tree from its half written output. """
+        self.Converter.set_run(run)
+        interrupted = self.get_interrupted_stage(run)
+        if interrupted is not None:
+            return self.reset_stage(run, interrupted)
+        first = self.Converter.get_first_stage()
+        done = next((i for i, stage in enumerate(self.Stages) if self.get_status(run, stage) != 'done'), len(self.Stages))
+        # the files only show the progress up to the next stage which produces a file, the state tells the stages in between
+        last = next((i for i, stage in enumerate(self.Stages) if i >= first and stage in FILE_STAGES), len(self.Stages))
+        if done > last:  # the state is ahead of the files, e.g. removed files: trust the files
+            for stage in self.Stages[first:]:
+                self.State.get(run, {}).pop(stage, None)
+            self.save_state()
+            return first
+        return max(first, done)
+
+    def reset_stage(self, run, stage):
+        """ removes the output of the interrupted [stage] of [run] and :returns the index of the stage to resume from """
+        c = self.Converter
+        warning('stage "{}" of run {} was interrupted or failed, redoing it'.format(stage, run))
+        if stage in ['convert', 'align']:  # the alignment rewrites the eudaq file
+            remove_file(c.get_eudaqfile_path())
+            return 0
+        if stage == 'track':
+            remove_file(join(c.TrackingDir, basename(c.get_trackingfile_path())))
+            remove_file(c.get_trackingfile_path())
+        if stage == 'rename':  # renaming is atomic, so the files tell whether it happened
+            return c.get_first_stage()
+        return self.Stages.index(stage) if c.file_is_valid(c.get_eudaqfile_path()) else 0
+    # endregion STATE
+    # ----------------------------------------
+
+    # ----------------------------------------
+    # region RUN
+    def count_running(self, stage):
+        return sum(s == stage for s, p, t in self.Running.itervalues())
+
+    def start_stages(self, queue):
+        """ starts the next stages of the waiting runs, runs in later stages first to finish them as early as possible """
+        for run, i in sorted(queue.iteritems(), key=lambda x: (-x[1], x[0])):
+            stage = self.Stages[i]
+            if len(self.Running) >= self.NWorkers:
+                return
+            if run in self.Running or self.count_running(stage) >= self.Limits[stage]:
+                continue
+            process = Process(target=self.Target, args=(run, self.TCString, stage, self.Verbose))
+            process.start()
+            self.Running[run] = (stage, process, time())
+            self.set_state(run, stage, 'running')
+
+    def collect_stages(self, queue):
+        """ updates the state of the finished stages and advances their runs in the [queue] """
+        for run, (stage, process, t) in self.Running.items():
+            if process.is_alive():
+                continue
+            process.join()
+            del self.Running[run]
+            duration = time() - t
+            if process.exitcode:
+                warning('stage "{}" of run {} failed with exit code {}, skipping the run'.format(stage, run, process.exitcode))
+                self.set_state(run, stage, 'failed', duration)
+                del queue[run]
+                continue
+            self.set_state(run, stage, 'done', duration)
+            self.Times[stage].append(duration)
+            queue[run] += 1
+            if queue[run] == len(self.Stages):
+                info('finished the conversion of run {} ({} runs left)'.format(run, len(queue) - 1))
+                self.Converted.append(run)
+                del queue[run]
+
+    def run(self):
+        """ converts all runs and :returns the runs which were converted successfully """
+        t = time()
+        queue = OrderedDict((run, self.get_first_stage(run)) for run in self.Runs)
+        self.Converted = [run for run, i in queue.iteritems() if i == len(self.Stages)]
+        queue = OrderedDict((run, i) for run, i in queue.iteritems() if i < len(self.Stages))
+        info('Converting {} of {} runs with {} processes ({})'.format(len(queue), len(self.Runs), self.NWorkers, ', '.join('{}: {}'.format(s, self.Limits[s]) for s in self.Stages)))
+        try:
+            while queue or self.Running:
+                self.collect_stages(queue)
+                self.start_stages(queue)
+                sleep(.1)
+        finally:
+            for stage, process, t0 in self.Running.itervalues():  # stages which were interrupted stay "running" and are redone on the next start
+                process.terminate()
+        self.print_timing(time() - t)
+        return sorted(self.Converted)
+
+    def print_timing(self, total_time=None):
+        rows = [[stage, self.Limits[stage], len(times), '{:.1f}'.format(sum(times)), '{:.1f}'.format(mean(times) if times else 0), '{:.1f}'.format(max(times) if times else 0)]
+                for stage, times in [(s, self.Times[s]) for s in self.Stages]]
+        print_table(rows, ['Stage', 'Processes', 'Runs', 'Total [s]', 'Mean [s]', 'Max [s]'])
+        if total_time is not None:
+            info('Total conversion time: {:.1f} s'.format(total_time))
+
+    def get_failed(self):
+        return [run for run in self.Runs if 'failed' in [self.get_status(run, stage) for stage in self.Stages]]
+    # endregion RUN
+    # ----------------------------------------
+
+
+if __name__ == '__main__':
+
+    aparser = ArgumentParser()
+    aparser.add_argument('runs', nargs='+', type=int, help='run numbers to convert')
+    aparser.add_argument('-tc', '--testcampaign', nargs='?', default=None)
+    aparser.add_argument('-v', '--verbose', action='store_true')
+    args = aparser.parse_args()
+
+    z = ConversionScheduler(args.runs, args.testcampaign, args.verbose)
+    z.run()
@@ -4,7 +4,7 @@ from shutil import move
 from subprocess import check_call
 
 from numpy import sign
-from os import getcwd, chdir, rename, system
+from os import rename, system
 from os.path import expanduser, join, basename
 from re import sub
 
@@ -43,6 +43,8 @@ class Converter:
         self.SoftwareDir = self.load_dirname(base='', option='software')
         self.EudaqDir = self.load_dirname(self.SoftwareDir, 'eudaq')
         self.TrackingDir = self.load_dirname(self.SoftwareDir, 'tracking')
+        self.ConverterExe = self.load_executable('converter executable', join(self.EudaqDir, 'bin', 'Converter.exe'))
+        self.TrackingExe = self.load_executable('tracking executable', join(self.TrackingDir, 'TrackingTelescope'))
 
         if self.RunNumber is not None:
             # Tracking Software
@@ -63,6 +65,12 @@ class Converter:
             critical('"{}" does not exist. Please set it correctly in Configuration/main.ini.'.format(path))
         return path
 
+    def load_executable(self, option, default):
+        """ the executables can be replaced in the main config, e.g. by stubs for testing """
+        if self.MainConfig.has_option('Directories', option) and self.MainConfig.get('Directories', option):
+            return expanduser(self.MainConfig.get('Directories', option))
+        return default
+
     def load_rawfile_dirname(self):
         file_dir = join(self.TCDir, self.Config.get('BASIC', 'raw directory') if self.RunConfig.has_option('BASIC', 'raw directory') else 'raw')
         if not dir_exists(file_dir):
@@ -114,38 +122,45 @@ class Converter:
     def file_is_valid(self, file_path):
         return False if not file_exists(file_path) else self.Run.rootfile_is_valid(file_path)
 
-    def convert_run(self):
+    def get_stages(self):
+        """ :returns the steps of the conversion in the order of their execution """
+        return OrderedDict([('convert', self.convert_raw_to_root), ('plane errors', self.add_plane_errors), ('align', self.align_run), ('track', self.add_tracking),
+                            ('rename', self.finish_conversion)])
+
+    def get_first_stage(self):
+        """ :returns the index of the first stage which has to be executed based on the existing root files """
         if self.file_is_valid(self.Run.RootFilePath):  # check if final root file exists
+            return len(self.get_stages())
+        elif self.file_is_valid(self.get_trackingfile_path()):  # check if the file after tracking exists
+            return self.get_stages().keys().index('rename')
+        elif self.file_is_valid(self.get_eudaqfile_path()):  # check if eudaq file exists
+            return self.get_stages().keys().index('plane errors')
+        return 0
+
+    def convert_run(self):
+        first_stage = self.get_first_stage()
+        if first_stage == len(self.get_stages()):
             self.add_plane_errors()  # add plane errors if set in config file
             return
-        elif self.file_is_valid(self.get_trackingfile_path()):  # check if the file after tracking exists
+        elif first_stage == self.get_stages().keys().index('rename'):
             self.rename_tracking_file()
             return
-        elif self.file_is_valid(self.get_eudaqfile_path()):  # check if eudaq file exists
-            self.Run.info('Found eudaq root file --> starting conversion')
-        else:
-            self.Run.info('did not find any matching root file --> starting conversion')
-            self.convert_raw_to_root()
-        self.add_plane_errors()
-        self.align_run()
-        self.add_tracking()
-        remove(self.get_eudaqfile_path())
+        self.Run.info('Found eudaq root file --> starting conversion' if first_stage else 'did not find any matching root file --> starting conversion')
+        for stage in self.get_stages().values()[first_stage:]:
+            stage()
 
     def convert_raw_to_root(self):
         if not file_exists(self.RawFilePath):
             critical('The raw file {} does not exist ...'.format(self.RawFilePath))
         self.remove_pickle_files()
-        curr_dir = getcwd()
-        chdir(self.Run.RootFileDir)  # go to root directory
         # prepare converter command
-        cmd_list = [join(self.EudaqDir, 'bin', 'Converter.exe'), '-t', self.ConverterTree, '-c', join(self.EudaqDir, 'conf', self.NewConfigFile), self.RawFilePath]
+        cmd_list = [self.ConverterExe, '-t', self.ConverterTree, '-c', join(self.EudaqDir, 'conf', self.NewConfigFile), self.RawFilePath]
         self.set_converter_configfile()
         print_banner('START CONVERTING RAW FILE FOR RUN {0}'.format(self.RunNumber))
         info('{}\n'.format(' '.join(cmd_list)))
-        check_call(cmd_list)
+        check_call(cmd_list, cwd=self.Run.RootFileDir)  # the converter writes to the current directory
         self.remove_new_configfile()
         self.remove_decodingfile()
-        chdir(curr_dir)
 
     def align_run(self):
         aligner = PadAlignment(self) if self.Type == 'pad' else PixAlignment(self)
@@ -175,19 +190,20 @@ class Converter:
 
     def tracking_tel(self, action='0'):
         root_file = self.Run.RootFilePath if file_exists(self.Run.RootFilePath) else self.get_eudaqfile_path()
-        cmd_list = [join(self.TrackingDir, 'TrackingTelescope'), root_file, str(action), str(self.TelescopeID), '' if self.Type == 'pad' else '1']
+        cmd_list = [self.TrackingExe, root_file, str(action), str(self.TelescopeID), '' if self.Type == 'pad' else '1']
         print ' '.join(cmd_list)
-        curr_dir = getcwd()
-        chdir(self.TrackingDir)
-        check_call(cmd_list)
-        chdir(curr_dir)
+        check_call(cmd_list, cwd=self.TrackingDir)
 
     def add_tracking(self):
         print_banner('START TRACKING FOR RUN {}'.format(self.RunNumber))
         self.tracking_tel()
         # move file from tracking directory to data directory
         move(join(self.TrackingDir, basename(self.get_trackingfile_path())), self.Run.RootFileDir)
+
+    def finish_conversion(self):
         self.rename_tracking_file()
+        if file_exists(self.get_eudaqfile_path()):
+            remove(self.get_eudaqfile_path())
 
     def load_polarities(self, pulser=False):
         option = '{}polarities'.format('pulser_' if pulser else '')
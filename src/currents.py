@@ -4,8 +4,9 @@ from glob import glob
 from analysis import Analysis, format_histo, join, basename
 from run_selection import RunSelection
 from ROOT import TGraph, TProfile, TH1F, TH2F
-from numpy import genfromtxt, isnan, datetime64, vectorize, invert, zeros
+from numpy import zeros
 
+from hv_log import get_hv_log
 from utils import *
 
 # ====================================
@@ -57,6 +58,7 @@ class Currents(Analysis):
         self.Precision = .005 if '237' in self.Name else .05
 
         self.DataPath = self.find_data_path()
+        self.LogPath = join(ensure_dir(join(self.PickleDir, 'Currents')), '{}_{}.hdf5'.format(self.TCString, basename(self.DataPath)))
 
         # data
         self.LogNames = None
@@ -172,21 +174,19 @@ class Currents(Analysis):
         return self.TimeZone.localize(datetime.strptime(log_date, '%Y%m%d%H%M%S.log'))
 
     def find_data(self):
+        """ reads the data of the log files in [Begin, End] from the binary copy, which is only updated with the changes of the logs """
         if len(self.Currents) > 0:
             return
-        f = vectorize(time_stamp)
-        for i, log_file_name in enumerate(self.get_log_names()):
-            data = genfromtxt(log_file_name, usecols=arange(3), dtype=[object, float, float])
-            data = data[where(invert(isnan(data['f1'])))[0]]  # remove text entries
-            log_date = self.get_log_date(log_file_name)
-            data['f0'] = f((log_date.strftime('%Y-%m-%d ') + data['f0']).astype(datetime64).astype(datetime), log_date.utcoffset().seconds)
-            data = data[where((data['f0'] >= time_stamp(self.Begin, off=True)) & (data['f0'] <= time_stamp(self.End, off=True)))]
-            data = data[where(abs(data['f2']) < 1e-3)]  # filter our very high unphysical currents > 3mA
+        log = get_hv_log(self.DataPath, self.LogPath, self.TimeZone)
+        for t, voltages, currents in log.get(time_stamp(self.Begin, off=True), time_stamp(self.End, off=True)):  # one entry per log file
+            good = abs(currents) < 1e-3  # filter our very high unphysical currents > 3mA
+            t, voltages, currents = t[good], voltages[good], currents[good]
             if self.IgnoreJumps:  # filter out jumps
-                data = data[where(abs(data['f2'][:-1]) * 100 > abs(data['f2'][1:]))[0] + 1]
-            self.Time = concatenate([self.Time, data['f0'].astype('i4') + self.Begin.utcoffset().seconds])  # in local start time
-            self.Voltages = concatenate([self.Voltages, data['f1']])
-            self.Currents = concatenate([self.Currents, data['f2'] * 1e9])  # unit nA
+                good = where(abs(currents[:-1]) * 100 > abs(currents[1:]))[0] + 1
+                t, voltages, currents = t[good], voltages[good], currents[good]
+            self.Time = concatenate([self.Time, t.astype('i4') + self.Begin.utcoffset().seconds])  # in local start time
+            self.Voltages = concatenate([self.Voltages, voltages])
+            self.Currents = concatenate([self.Currents, currents * 1e9])  # unit nA
         if not self.Currents.size:
             self.Time = array([time_stamp(self.Begin), time_stamp(self.End)])
             self.Currents = zeros(2)
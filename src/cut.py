@@ -9,7 +9,7 @@ from ROOT import TCut, TPie, TProfile
 from InfoLegend import InfoLegend
 from binning import Bins
 from ConfigParser import NoOptionError
-from numpy import histogram, histogram2d, split, where, linspace
+from numpy import histogram, where, linspace, ones, zeros, count_nonzero
 
 
 class Cut:
@@ -38,6 +38,10 @@ class Cut:
     def __call__(self, cut=None):
         return self.CutStrings() if cut is None else TCut(cut)
 
+    def do_pickle(self, path, func, value=None, redo=False, *args, **kwargs):
+        """ cache the results of the cut generation without the cut string itself, which is still being built """
+        return self.Analysis.Cache.do_pickle(path, func, value, redo, self.Analysis.get_cache_context(cut=False), args, kwargs)
+
     def has(self, name):
         return bool(self.get(name).GetTitle())
 
@@ -115,12 +119,12 @@ class Cut:
     def get_beam_interruptions(self):
         """ :returns: list of raw interruptions, type [list[tup]]"""
         pickle_path = self.Analysis.make_pickle_path('BeamInterruptions', run=self.RunNumber, suf='_'.join(str(i) for i in self.CutConfig['jump_range']))
-        return do_pickle(pickle_path, self.find_beam_interruptions)
+        return self.do_pickle(pickle_path, self.find_beam_interruptions)
 
     def get_interruptions_ranges(self):
         """ :returns: list of interruptions including safety margin from the AnalysisConfig. """
         range_pickle = self.Analysis.make_pickle_path('BeamInterruptions', 'Ranges', run=self.RunNumber, suf='_'.join(str(i) for i in self.CutConfig['jump_range']))
-        return do_pickle(range_pickle, self.create_interruption_ranges, interruptions=self.get_beam_interruptions())
+        return self.do_pickle(range_pickle, self.create_interruption_ranges, interruptions=self.get_beam_interruptions())
 
     def get_fiducial_size(self):
         xy = self.CutConfig['fiducial'] * 10  # in mm
@@ -249,6 +253,20 @@ class Cut:
 
     def generate_consecutive(self):
         return self.CutStrings.consecutive()
+
+    def generate_consecutive_masks(self):
+        """ :returns the cumulative AND of the masks of all cuts ordered by their level """
+        masks = OrderedDict([('raw', ones(self.Analysis.Run.NEntries, '?'))])
+        for cut in self.CutStrings.get_strings():
+            masks[cut.Name] = masks.values()[-1] & self.get_mask(cut())
+        return masks
+
+    def get_mask(self, cut=None):
+        """ :returns a boolean mask of the events passing [cut] (all cuts if None), the masks of the single cut strings are cached by the event store """
+        return self.Analysis.Run.get_mask(self(cut))
+
+    def get_events(self, cut=None):
+        return where(self.get_mask(cut))[0]
     # endregion GENERATE
     # ----------------------------------------
 
@@ -264,7 +282,7 @@ class Cut:
             self.Analysis.add_to_info(t)
             return chi2s
 
-        chi2 = do_pickle(picklepath, f)
+        chi2 = self.do_pickle(picklepath, f)
         q = self.CutConfig['chi2_{mod}'.format(mod=mode.lower())] if quantile is None else quantile
         return chi2[q] if q != 100 else None
 
@@ -284,7 +302,7 @@ class Cut:
             self.Analysis.add_to_info(t)
             return cut_vals
 
-        return do_pickle(picklepath, func)
+        return self.do_pickle(picklepath, func)
 
     def get_raw_pulse_height(self):
         n = self.Analysis.Tree.Draw(self.Analysis.generate_signal_name(), self.CutStrings(), 'goff')
@@ -305,7 +323,7 @@ class Cut:
             self.Analysis.add_to_info(t)
             return None if ph < 10 or i_break is None else self.Analysis.get_event_at_time(p.GetBinCenter(i_break - 2), rel=True)
 
-        return do_pickle(pickle_path, f, redo=redo)
+        return self.do_pickle(pickle_path, f, redo=redo)
 
     def find_beam_interruptions(self):
         return self.find_pad_beam_interruptions() if self.Analysis.Run.Type == 'pad' else self.find_pixel_beam_interruptions()
@@ -313,17 +331,14 @@ class Cut:
     def find_pad_beam_interruptions(self, bin_width=100, max_thresh=.6):
         """ Looking for the beam interruptions by investigating the pulser rate. """
         t = self.Analysis.info('Searching for beam interruptions of run {r} ...'.format(r=self.RunNumber), next_line=False)
-        n = self.Analysis.Tree.Draw('Entry$:pulser', '', 'goff')
-        x, y = get_root_vecs(self.Analysis.Tree, n, 2, dtype='i4')
-        rates, x_bins, y_bins = histogram2d(x, y, bins=[arange(0, n, bin_width, dtype=int), 2])
-        rates = rates[:, 1] / bin_width
+        pulser = self.Analysis.Run.get_root_vec(var='pulser', dtype='?')
+        bins = arange(0, pulser.size, bin_width, dtype=int)
+        events = where(pulser[:bins[-1] + 1])[0]
+        rates = bincount(minimum(events / bin_width, bins.size - 2), minlength=bins.size - 1).astype('d') / bin_width  # the last bin includes its upper edge
         thresh = min(max_thresh, mean(rates) + .2)
-        events = x_bins[:-1][rates > thresh] + bin_width / 2
-        not_connected = where(concatenate([[False], events[:-1] != events[1:] - bin_width]))[0]  # find the events where the previous event is not related to the event (more than a bin width away)
-        events = split(events, not_connected)  # events grouped into connecting events
-        interruptions = [(ev[0], ev[0]) if ev.size == 1 else (ev[0], ev[-1]) for ev in events] if events[0].size else []
+        events = bins[:-1][rates > thresh] + bin_width / 2
         self.Analysis.add_to_info(t)
-        return array(interruptions, 'i4')
+        return self.group_connected(events, bin_width).astype('i4')
 
     def find_pixel_beam_interruptions(self, bin_width=10, threshold=.4):
         """ Finding beam interruptions by incestigation the event rate. """
@@ -331,31 +346,34 @@ class Cut:
         bin_values, time_bins = histogram(self.Analysis.Run.Time / 1000, bins=self.Bins.get_raw_time(bin_width)[1])
         m = mean(bin_values[bin_values.argsort()][-20:-10])  # take the mean of the 20th to the 10th highest bin to get an estimate of the plateau
         deviating_bins = where(abs(1 - bin_values / m) > threshold)[0]
-        times = time_bins[deviating_bins] + bin_width / 2 - self.Analysis.Run.Time[0] / 1000  # shift to the center of the bin
-        not_connected = where(concatenate([[False], deviating_bins[:-1] != deviating_bins[1:] - 1]))[0]  # find the bins that are not consecutive
-        times = split(times, not_connected)
-        interruptions = [[self.Analysis.get_event_at_time(v) for v in [t[0], t[0] if t.size == 1 else t[-1]]] for t in times] if len(times[0]) else []
+        times = time_bins[self.group_connected(deviating_bins)] + bin_width / 2 - self.Analysis.Run.Time[0] / 1000  # shift to the center of the bin
         self.Analysis.add_to_info(t_start)
-        return interruptions
+        return self.Analysis.get_event_at_time(times).tolist()
+
+    @staticmethod
+    def group_connected(values, step=1):
+        """ :returns the first and last value of every group of consecutive [values] which are [step] apart """
+        if not len(values):
+            return zeros((0, 2), 'i4')
+        first = concatenate([[True], diff(values) != step])  # the previous value is not related to the value
+        return array([values[first], values[concatenate([first[1:], [True]])]]).T.reshape(-1, 2)
 
     def create_interruption_ranges(self, interruptions):
-        ranges = []
-        for i, tup in enumerate(interruptions):
-            t_start = max(0, self.Analysis.Run.get_time_at_event(tup[0]) - self.Analysis.Run.StartTime - self.CutConfig['jump_range'][0])
-            t_stop = self.Analysis.Run.get_time_at_event(tup[1]) - self.Analysis.Run.StartTime + self.CutConfig['jump_range'][1]
-            # if interruptions overlay just set the last stop to the current stop
-            if i and t_start <= (ranges[-1][1]) + 10:
-                ranges[-1][1] = t_stop
-                continue
-            ranges.append([t_start, t_stop])
-        return [[self.Analysis.Run.get_event_at_time(t) for t in tup] for tup in ranges]
+        if not len(interruptions):
+            return []
+        run = self.Analysis.Run
+        t_start, t_stop = (run.get_time_at_event(array(interruptions)[:, i]) - run.StartTime for i in [0, 1])
+        t_start, t_stop = maximum(0, t_start - self.CutConfig['jump_range'][0]), t_stop + self.CutConfig['jump_range'][1]
+        # if interruptions overlay merge them: the stop of the merged range is always the stop of the previous interruption
+        first = concatenate([[True], t_start[1:] > t_stop[:-1] + 10])
+        return run.get_event_at_time(array([t_start[first], t_stop[concatenate([first[1:], [True]])]]).T).tolist()
 
     def find_n_misaligned(self):
         pickle_path = self.Analysis.make_pickle_path('Cuts', 'align', self.RunNumber)
 
         def f():
             return where(get_root_vec(self.Analysis.Tree, var='aligned[0]', dtype=bool) == 0)[0].size
-        return do_pickle(pickle_path, f)
+        return self.do_pickle(pickle_path, f)
 
     # endregion COMPUTE
     # ----------------------------------------
@@ -371,10 +389,10 @@ class Cut:
         contr = OrderedDict()
         n_events = self.Analysis.Run.NEntries
         cut_events = 0
-        for i, (key, cut) in enumerate(self.generate_consecutive().iteritems()):
+        for i, (key, mask) in enumerate(self.generate_consecutive_masks().iteritems()):
             if key == 'raw':
                 continue
-            events = n_events - int(self.Analysis.Tree.Draw('1', cut, 'goff'))
+            events = n_events - count_nonzero(mask)
             print(key.rjust(18), '{0:5d} {1:04.1f}%'.format(events - cut_events, (1. - float(events) / n_events) * 100.))
             contr[key.title().replace('_', ' ')] = (events - cut_events, self.Analysis.get_color())
             cut_events = events
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# --------------------------------------------------------
+#       translation of ROOT cut strings into numpy expressions
+# --------------------------------------------------------
+
+from re import compile as re_compile
+
+TOKEN = re_compile(r'\s*(?:(\d+\.?\d*(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?)|([A-Za-z_]\w*(?:::\w+)?\$?)|(\|\||&&|==|!=|<=|>=|[-+*/()<>!\[\],]))')
+FUNCTIONS = {'abs': 'abs_', 'fabs': 'abs_', 'TMath::Abs': 'abs_', 'sqrt': 'sqrt_', 'TMath::Sqrt': 'sqrt_'}
+
+
+def tokenize(string):
+    tokens, pos = [], 0
+    string = string.rstrip()
+    while pos < len(string):
+        m = TOKEN.match(string, pos)
+        if m is None or m.end() == pos:
+            raise ValueError('can not parse "{}" at position {}'.format(string, pos))
+        tokens.append(next(g for g in m.groups() if g is not None))
+        pos = m.end()
+    return tokens
+
+
+def strip_brackets(string):
+    """ removes brackets which enclose the whole [string] """
+    string = string.strip()
+    while string.startswith('(') and string.endswith(')') and find_closing(string) == len(string) - 1:
+        string = string[1:-1].strip()
+    return string
+
+
+def find_closing(string, start=0):
+    depth = 0
+    for i in xrange(start, len(string)):
+        depth += {'(': 1, ')': -1}.get(string[i], 0)
+        if not depth:
+            return i
+
+
+def split_cut(string):
+    """ :returns the terms of the top level AND (&&) of the cut [string], nested ANDs are flattened """
+    string, terms, depth, start = strip_brackets(string), [], 0, 0
+    for i, char in enumerate(string):
+        depth += {'(': 1, ')': -1}.get(char, 0)
+        if not depth and string[i:i + 2] == '||':  # OR binds weaker than AND
+            return [string] if string else []
+        if not depth and string[i:i + 2] == '&&':
+            terms.append(string[start:i])
+            start = i + 2
+    terms.append(string[start:])
+    return [term for sub_terms in [split_cut(t) if len(terms) > 1 else [strip_brackets(t)] for t in terms] for term in sub_terms if term]
+
+
+class CutParser(object):
+    """ Translates a cut string into an equivalent python expression with the same operator precedence as TFormula.
+        Branches are replaced by variable names, elements of array branches [name[i]] by [name__i]. """
+
+    def __init__(self, string):
+        self.Tokens = tokenize(string)
+        self.Pos = 0
+        self.Names = set()  # (branch, index or None)
+
+    def __call__(self):
+        expression = self.logical_or()
+        if self.Pos != len(self.Tokens):
+            raise ValueError('unexpected token "{}"'.format(self.Tokens[self.Pos]))
+        return self.to_bool(expression)
+
+    def peek(self):
+        return self.Tokens[self.Pos] if self.Pos < len(self.Tokens) else None
+
+    def take(self, *tokens):
+        if self.peek() in tokens:
+            self.Pos += 1
+            return self.Tokens[self.Pos - 1]
+
+    def expect(self, token):
+        if self.take(token) is None:
+            raise ValueError('expected "{}"'.format(token))
+
+    @staticmethod
+    def to_bool(expression):
+        return '({} != 0)'.format(expression)
+
+    def logical_or(self):
+        terms = [self.logical_and()]
+        while self.take('||'):
+            terms.append(self.logical_and())
+        return terms[0] if len(terms) == 1 else '({})'.format(' | '.join(self.to_bool(t) for t in terms))
+
+    def logical_and(self):
+        terms = [self.equality()]
+        while self.take('&&'):
+            terms.append(self.equality())
+        return terms[0] if len(terms) == 1 else '({})'.format(' & '.join(self.to_bool(t) for t in terms))
+
+    def equality(self):
+        expression = self.comparison()
+        op = self.take('==', '!=')
+        while op is not None:
+            expression = '({} {} {})'.format(expression, op, self.comparison())
+            op = self.take('==', '!=')
+        return expression
+
+    def comparison(self):
+        expression = self.sum()
+        op = self.take('<', '>', '<=', '>=')
+        while op is not None:
+            expression = '({} {} {})'.format(expression, op, self.sum())
+            op = self.take('<', '>', '<=', '>=')
+        return expression
+
+    def sum(self):
+        expression = self.product()
+        op = self.take('+', '-')
+        while op is not None:
+            expression = '({} {} {})'.format(expression, op, self.product())
+            op = self.take('+', '-')
+        return expression
+
+    def product(self):
+        expression = self.unary()
+        op = self.take('*', '/')
+        while op is not None:
+            expression = '({} {} {})'.format(expression, op, self.unary())
+            op = self.take('*', '/')
+        return expression
+
+    def unary(self):
+        if self.take('!'):
+            return '(~{})'.format(self.to_bool(self.unary()))
+        if self.take('-'):
+            return '(-{})'.format(self.unary())
+        self.take('+')
+        return self.atom()
+
+    def atom(self):
+        token = self.peek()
+        if token is None:
+            raise ValueError('unexpected end of the cut string')
+        self.Pos += 1
+        if token == '(':
+            expression = self.logical_or()
+            self.expect(')')
+            return '({})'.format(expression)
+        if token[0].isdigit() or token[0] == '.':
+            return repr(float(token))
+        if not (token[0].isalpha() or token[0] == '_'):
+            raise ValueError('unexpected token "{}"'.format(token))
+        if token in FUNCTIONS and self.take('('):
+            expression = self.logical_or()
+            self.expect(')')
+            return '{}({})'.format(FUNCTIONS[token], expression)
+        name = token.replace('$', '_')
+        if self.take('['):
+            index = self.take(*[t for t in [self.peek()] if t is not None and t.isdigit()])
+            if index is None:
+                raise ValueError('only constant indices are supported')
+            self.expect(']')
+            self.Names.add((token, int(index)))
+            return '{}__{}'.format(name, index)
+        self.Names.add((token, None))
+        return name
+
+
+def compile_cut(string, boolean=True):
+    """ :returns the python expression of the cut [string] and the required (branch, index) pairs or (None, None) if the string is not supported
+        :param boolean: convert the result to bool like a cut, otherwise keep the value like a variable of TTree::Draw """
+    try:
+        parser = CutParser(string)
+        expression = parser() if boolean else parser.logical_or()
+        return (expression, parser.Names) if parser.Pos == len(parser.Tokens) else (None, None)
+    except ValueError:
+        return None, None
@@ -744,6 +744,11 @@ def get_hist_vecs(p, err=True):
     return get_hist_args(p, err), get_hist_vec(p, err)
 
 
+def get_hist_arrays(h):
+    """ :returns the bin centres, contents and errors of the histogram [h] """
+    return array([[h.GetBinCenter(ibin), h.GetBinContent(ibin), h.GetBinError(ibin)] for ibin in range(1, h.GetNbinsX() + 1)]).T
+
+
 def get_h_values(h):
     return get_graph_y(h) if 'Graph' in h.ClassName() else get_hist_vec(h)
 
@@ -822,10 +827,9 @@ def fit_bucket(histo, show=True):
 
 
 def fill_hist(h, x, y=None, zz=None):
-    x, y, zz = array(x).astype('d'), array(y).astype('d'), array(zz).astype('d')
-    if h.ClassName == 'TProfile2D':
-        for i in range(x.size):
-            h.Fill(x[i], y[i], zz[i])
+    x, y, zz = (None if v is None else array(v).astype('d') for v in [x, y, zz])
+    if h.ClassName() == 'TProfile2D':
+        fill_profile_2d(h, x, y, zz)
     elif 'TH1' in h.ClassName():
         h.FillN(x.size, x, ones(x.size))
     elif any(name in h.ClassName() for name in ['TH2', 'TProfile']):
@@ -834,6 +838,27 @@ def fill_hist(h, x, y=None, zz=None):
         h.FillN(x.size, x, y, zz, ones(x.size))
 
 
+def fill_profile_2d(p, x, y, z):
+    """ fills the empty TProfile2D [p] like TProfile2D::Fill(x, y, z) for every value, the sums of the bins are calculated with numpy """
+    (nx, x_bins), (ny, y_bins) = [(ax.GetNbins(), array([ax.GetBinLowEdge(i) for i in xrange(1, ax.GetNbins() + 2)])) for ax in [p.GetXaxis(), p.GetYaxis()]]
+    if p.GetZmin() != p.GetZmax():
+        x, y, z = (v[(z >= p.GetZmin()) & (z <= p.GetZmax())] for v in [x, y, z])
+    ix, iy = searchsorted(x_bins, x, 'right'), searchsorted(y_bins, y, 'right')  # 0 is the underflow and n + 1 the overflow bin like in TAxis::FindBin
+    cells = ix + (nx + 2) * iy
+    n, s, s2 = (bincount(cells, w, minlength=(nx + 2) * (ny + 2)) for w in [None, z, z * z])
+    has_bin_sumw2 = p.GetBinSumw2().GetSize() > 0
+    for i in where(n)[0].tolist():
+        p.SetBinContent(i, s[i])  # profiles store the sum of z in the bin content
+        p.SetBinEntries(i, n[i])
+        p.GetSumw2().SetAt(s2[i], i)
+        if has_bin_sumw2:
+            p.GetBinSumw2().SetAt(n[i], i)
+    r = (ix > 0) & (ix <= nx) & (iy > 0) & (iy <= ny)  # the statistics only contain the values inside the axis ranges
+    x, y, z = x[r], y[r], z[r]
+    p.PutStats(array([x.size, x.size, x.sum(), (x * x).sum(), y.sum(), (y * y).sum(), (x * y).sum(), z.sum(), (z * z).sum()], 'd'))
+    p.SetEntries(ix.size)
+
+
 def set_palette(pal):
     gStyle.SetPalette(pal)
 
@@ -51,7 +51,7 @@ class DUTAnalysis(TelecopeAnalysis):
     # region GET
     def get_events(self, cut=None, redo=False):
         cut = self.Cut(cut)
-        return do_hdf5(self.make_hdf5_path('Events', run=self.RunNumber, ch=self.DUT.Number, suf=cut.GetName()), self.Run.get_root_vec, redo, dtype='i4', var='Entry$', cut=cut)
+        return self.do_hdf5(self.make_hdf5_path('Events', run=self.RunNumber, ch=self.DUT.Number, suf=cut.GetName()), self.Run.get_root_vec, redo, dtype='i4', var='Entry$', cut=cut)
 
     def get_n_entries(self, cut):
         return self.Tree.GetEntries(self.Cut(cut).GetTitle())
@@ -86,7 +86,7 @@ class DUTAnalysis(TelecopeAnalysis):
         def f():
             return self.draw_uniformity(bins=bins, show=False)
 
-        return do_pickle(pickle_path, f, redo=redo)
+        return self.do_pickle(pickle_path, f, redo=redo)
 
     def get_track_length_var(self):
         dx2, dy2 = ['TMath::Power(TMath::Tan(TMath::DegToRad() * {}_{}), 2)'.format('slope' if self.Run.has_branch('slope_x') else 'angle', direction) for direction in ['x', 'y']]
@@ -102,7 +102,7 @@ class DUTAnalysis(TelecopeAnalysis):
             n1, n2 = self.get_n_entries(self.Cut.generate_custom(include=['tracks', 'fiducial'], prnt=False)), self.get_n_entries(self.Cut.get('tracks'))
             a1, a2 = self.Cut.get_fiducial_area(), min(self.Run.get_unmasked_area().values())
             return n1 / a1 * a2 / n2
-        return do_pickle(self.make_pickle_path('Flux', 'Corr', self.RunNumber, self.DUT.Number), f)
+        return self.do_pickle(self.make_pickle_path('Flux', 'Corr', self.RunNumber, self.DUT.Number), f)
 
     def get_additional_peak_height(self):
         pass
@@ -153,15 +153,14 @@ class DUTAnalysis(TelecopeAnalysis):
             atts = [name, 'Track Hit Map' if hitmap else 'Signal Map'] + (self.Bins.get_global(res, mm=True) if bins is None else bins)
             h1 = TH2I(*atts) if hitmap else TProfile2D(*atts)
             self.info('drawing {mode}map of {dia} for Run {run}...'.format(dia=self.DUT.Name, run=self.RunNumber, mode='hit' if hitmap else 'signal '), prnt=prnt)
-            y, x = self.Cut.get_track_vars(self.DUT.Number - 1, mm=True)
-            self.Tree.Draw('{z}{y}:{x}>>{h}'.format(z=self.get_ph_str() + ':' if not hitmap else '', x=x, y=y, h=name), cut, 'goff')
+            self.Run.Booking.draw(h1, self.get_signal_map_var(hitmap), cut)
             set_2d_ranges(h1, *([3, 3] if size is None else size))
             adapt_z_range(h1) if not hitmap else do_nothing()
             return h1
 
         set_palette(pal=1 if hitmap else 53)
         self.format_statbox(entries=True, x=0.82)
-        h = do_pickle(pickle_path, func, redo=redo)
+        h = self.do_pickle(pickle_path, func, redo=redo)
         z_tit = 'Number of Entries' if hitmap else 'Pulse Height [mV]'
         format_histo(h, x_tit='Track Position X [mm]', y_tit='Track Position Y [mm]', y_off=1.4, z_off=1.5, z_tit=z_tit, ncont=50, ndivy=510, ndivx=510, z_range=z_range)
         self.draw_histo(h, '', show, lm=.12, rm=.16, draw_opt='colzsame')
@@ -170,6 +169,10 @@ class DUTAnalysis(TelecopeAnalysis):
         self.save_plots('HitMap' if hitmap else 'SignalMap2D', prnt=prnt, save=save)
         return h
 
+    def get_signal_map_var(self, hitmap=False):
+        y, x = self.Cut.get_track_vars(self.DUT.Number - 1, mm=True)
+        return '{z}{y}:{x}'.format(z=self.get_ph_str() + ':' if not hitmap else '', x=x, y=y)
+
     def draw_hitmap(self, res=None, cut=None, fid=False, redo=False, z_range=None, size=None, show=True, save=True, prnt=True):
         cut = self.Cut.get('tracks') if cut is None else self.Cut(cut)
         return self.draw_signal_map(res, cut, fid, hitmap=True, redo=redo, bins=None, z_range=z_range, size=size, show=show, save=save, prnt=prnt)
@@ -268,7 +271,7 @@ class DUTAnalysis(TelecopeAnalysis):
             mean_error = mean([v.n for v in get_2d_hist_vec(self.draw_error_signal_map(show=False))])
             h.GetQuantiles(2, y, q)
             return make_ufloat([y[1], mean_error]) / make_ufloat([y[0], mean_error]) - 1
-        ratio = do_pickle(pickle_path, f)
+        ratio = self.do_pickle(pickle_path, f)
         self.info('Relative Signal Spread is: {:2.2f} %'.format(ratio * 100), prnt=prnt)
         return ratio
 
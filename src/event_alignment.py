@@ -5,8 +5,31 @@
 # --------------------------------------------------------
 
 from utils import *
-from ROOT import TFile, vector
-from numpy import split, cumsum
+from ROOT import TFile, vector, gInterpreter
+import ROOT
+from numpy import cumsum, repeat, argsort, flatnonzero
+
+FILL_CODE = '''
+void fill_aligned_events(TTree* in_tree, TTree* new_tree, Long64_t first, Long64_t n, const int* n_hits, const UShort_t* plane, const UShort_t* col, const UShort_t* row,
+                         const Short_t* adc, const UInt_t* charge, std::vector<UShort_t>& v_plane, std::vector<UShort_t>& v_col, std::vector<UShort_t>& v_row,
+                         std::vector<Short_t>& v_adc, std::vector<UInt_t>& v_charge) {
+  Long64_t k = 0;
+  for (Long64_t i = 0; i < n; i++) {
+    in_tree->GetEntry(first + i);
+    v_plane.assign(plane + k, plane + k + n_hits[i]);
+    v_col.assign(col + k, col + k + n_hits[i]);
+    v_row.assign(row + k, row + k + n_hits[i]);
+    v_adc.assign(adc + k, adc + k + n_hits[i]);
+    v_charge.assign(charge + k, charge + k + n_hits[i]);
+    k += n_hits[i];
+    new_tree->Fill();
+  }
+}'''
+
+
+def get_ranges(starts, sizes):
+    """ :returns the concatenated ranges [start, start + size) """
+    return arange(sizes.sum()) - repeat(cumsum(sizes) - sizes - starts, sizes)
 
 
 class EventAligment:
@@ -30,6 +53,7 @@ class EventAligment:
         self.NEntries = int(self.InTree.GetEntries())
         self.MaxOffset = 5
         self.AtEntry = -1
+        self.ChunkSize = 100000  # number of events which are written to the aligned tree at once
         self.IsAligned = self.check_alignment_fast()
 
         # Branches
@@ -92,12 +116,17 @@ class EventAligment:
     def load_variables(self):
         """ get all the telescope branches in vectors"""
         t = self.Run.info('Loading information from tree ... ', next_line=False)
-        n_hits = self.InTree.Draw('plane', '', 'goff')
-        self.InTree.SetEstimate(n_hits)
-        self.InTree.Draw('plane:col:row:adc:charge', '', 'paragoff')
-        plane, column, row, adc, charge = get_root_vecs(self.InTree, n_hits, 5, dtype=int)
+        hits = self.load_hits()[0]
         self.Run.add_to_info(t)
-        return split(array([plane, column, row, adc, charge]), cumsum(self.NHits), axis=1)
+        return hits
+
+    def load_hits(self, first_entry=0, n_entries=None):
+        """ :returns the flat plane, col, row, adc and charge values of the hits in the given entries and the number of hits per entry """
+        n_entries = self.NEntries - first_entry if n_entries is None else n_entries
+        n_hits = self.load_n_hits(n_entries, first_entry).astype('i4')
+        self.InTree.SetEstimate(max(1, n_hits.sum()))
+        n = self.InTree.Draw('plane:col:row:adc:charge', '', 'paragoff', n_entries, first_entry)
+        return array(get_root_vecs(self.InTree, n, 5, dtype=int)), n_hits
 
     def reload(self):
         self.NHits = self.load_n_hits()
@@ -166,25 +195,58 @@ class EventAligment:
         for i, j in self.Branches.iteritems():
             print i, list(j)
 
-    def fill_branches(self, offset):
-        pass
+    def get_event_offsets(self, offsets):
+        """ :returns the accumulated offset of every event of the aligned tree, which ends when the shifted events run out """
+        values = zeros(self.NEntries, 'i8')
+        for event, offset in offsets.iteritems():
+            if event < self.NEntries:
+                values[event] += offset
+        values = cumsum(values)
+        beyond = arange(self.NEntries) > self.NEntries - abs(values) - 1
+        return values[:argmax(beyond)] if beyond.any() else values
+
+    def get_hit_sources(self, events, offsets):
+        """ :returns the events from which the hits of the aligned [events] are taken (negative for none) and a function selecting the hits by plane or None for all """
+        return [(events + offsets, None)]
+
+    def load_aligned_hits(self, events, offsets):
+        """ :returns the hit values of the aligned [events] and the number of hits per event, reading only the required entries of the tree """
+        sources = self.get_hit_sources(events, offsets)
+        used = concatenate([ev[ev >= 0] for ev, select in sources])
+        if not used.size:
+            return zeros((5, 0), 'i8'), zeros(events.size, 'i4')
+        first = used.min()
+        hits, n_hits = self.load_hits(first, used.max() + 1 - first)
+        starts = cumsum(n_hits) - n_hits
+        indices, labels = [], []
+        for i, (ev, select) in enumerate(sources):
+            aligned = flatnonzero(ev >= 0)
+            sizes = n_hits[ev[aligned] - first]
+            ind, label = get_ranges(starts[ev[aligned] - first], sizes), repeat(aligned, sizes) * len(sources) + i
+            if select is not None:
+                selected = select(hits[0][ind])
+                ind, label = ind[selected], label[selected]
+            indices.append(ind)
+            labels.append(label)
+        labels = concatenate(labels)
+        order = argsort(labels, kind='mergesort')  # keep the order of the hits within the events
+        return hits[:, concatenate(indices)[order]], bincount(labels // len(sources), minlength=events.size).astype('i4')
 
     def write_aligned_tree(self):
-        offsets = self.find_offsets()
+        """ writes the shifted hits in chunks of [ChunkSize] events with a compiled loop, all other branches are copied from the same entry """
+        offsets = self.get_event_offsets(self.find_offsets())
         self.NewFile = TFile(self.Converter.get_eudaqfile_path(), 'RECREATE')
         self.NewTree = self.InTree.CloneTree(0)
         self.set_branch_addresses()
-        self.PBar.start(self.NEntries)
-        offset = 0
-        while self.get_next_event():
-            self.PBar.update(self.AtEntry)
-            self.clear_vectors()
-            if self.AtEntry in offsets:
-                offset += offsets[self.AtEntry]
-            if self.AtEntry > self.NEntries - abs(offset) - 1:
-                break
-            self.fill_branches(offset)
-            self.NewTree.Fill()
+        if not hasattr(ROOT, 'fill_aligned_events'):
+            gInterpreter.Declare(FILL_CODE)
+        self.PBar.start(offsets.size)
+        for first in xrange(0, offsets.size, self.ChunkSize):
+            events = arange(first, min(first + self.ChunkSize, offsets.size))
+            hits, n_hits = self.load_aligned_hits(events, offsets[events])
+            hits = [values.astype(dtype) for values, dtype in zip(hits, ['u2', 'u2', 'u2', 'i2', 'u4'])]
+            ROOT.fill_aligned_events(self.InTree, self.NewTree, first, events.size, n_hits, *(hits + self.Branches.values()))
+            self.PBar.update(events[-1])
         self.PBar.finish()
         self.save_tree()
     # endregion WRITE TREE
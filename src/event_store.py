@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# --------------------------------------------------------
+#       columnar copy of the most frequently used branches of a run
+# --------------------------------------------------------
+
+from __future__ import division  # the expressions are evaluated with true division like in ROOT
+from fnmatch import fnmatch
+from os.path import join, getmtime
+
+import h5py
+from numpy import arange, unique, ones, zeros, where, absolute, sqrt
+
+from cut_evaluator import compile_cut, split_cut
+from hdf5_store import get_hdf5_store
+from utils import ensure_dir, get_base_dir, get_root_vec, info, add_to_info
+
+BRANCHES = ['event_number', 'time', 'n_tracks', 'chi2_*', 'slope_*', 'angle_*', 'dia_track_*_local', 'pulser', 'trigger_cell', 'IntegralValues', 'TimeIntegralValues', 'IntegralPeak*',
+            'peaks*', 'aligned']
+DTYPES = {'Float_t': 'f4', 'Double_t': 'f8', 'Int_t': 'i4', 'UInt_t': 'u4', 'Short_t': 'i2', 'UShort_t': 'u2', 'Char_t': 'i1', 'UChar_t': 'u1', 'Bool_t': '?', 'Long64_t': 'i8',
+          'ULong64_t': 'u8', 'vector<float>': 'f4', 'vector<double>': 'f8', 'vector<int>': 'i4', 'vector<unsigned short>': 'u2', 'vector<bool>': '?'}
+
+
+class EventStore(object):
+    """ Stores the scalar branches in BRANCHES (and fixed size arrays of them) as one hdf5 dataset per branch. Each branch is extracted from the tree
+        at its first use, the store is rebuilt if the root file changes. Cuts and expressions of stored branches are evaluated with numpy. """
+
+    def __init__(self, run):
+        self.Run = run
+        self.Tree = run.Tree
+        self.NEntries = run.NEntries
+        self.Path = join(ensure_dir(join(get_base_dir(), run.MainConfig.get('SAVE', 'pickle directory'), 'Columns')), '{}_{}.hdf5'.format(run.TCString, run.RunNumber))
+        self.HDF5 = get_hdf5_store()
+        self.Branches = self.load_branches()
+        self.Masks = {}  # cut string -> boolean mask of the entries
+        self.check_file()
+
+    def load_branches(self):
+        """ :returns the names and types of the branches which can be stored """
+        branches = {}
+        for branch in self.Tree.GetListOfBranches():
+            name = branch.GetName()
+            leaf = branch.GetLeaf(name)
+            if any(fnmatch(name, pattern) for pattern in BRANCHES) and leaf and not leaf.GetLeafCount() and leaf.GetTypeName() in DTYPES:
+                branches[name] = DTYPES[leaf.GetTypeName()]
+        return branches
+
+    def check_file(self):
+        """ remove the store if it was made from another version of the root file """
+        try:
+            f = self.HDF5.open(self.Path)
+            if f.attrs.get('root mtime') == getmtime(self.Run.RootFilePath) and f.attrs.get('entries') == self.NEntries:
+                return
+        except IOError:
+            pass
+        self.HDF5.remove(self.Path)
+        with h5py.File(self.Path, 'w') as f:
+            f.attrs['root mtime'] = getmtime(self.Run.RootFilePath)
+            f.attrs['entries'] = self.NEntries
+
+    # ----------------------------------------
+    # region EXTRACT
+    def extract(self, name):
+        t = info('extracting branch {} of run {} ...'.format(name, self.Run.RunNumber), next_line=False, prnt=self.Run.Verbose)
+        n_values = self.NEntries
+        if 'vector' in self.Tree.GetLeaf(name).GetTypeName():
+            lengths = unique(get_root_vec(self.Tree, var='Length$({})'.format(name), dtype='i4'))
+            if lengths.size != 1:  # only fixed sizes can be stored as a matrix
+                self.Branches[name] = None
+                return
+            n_values *= lengths[0]
+        else:
+            n_values *= self.Tree.GetLeaf(name).GetLen()
+        estimate = self.Tree.GetEstimate()
+        self.Tree.SetEstimate(n_values)
+        values = get_root_vec(self.Tree, var=name, dtype=self.Branches[name]).reshape(self.NEntries, -1)
+        self.Tree.SetEstimate(estimate)
+        self.HDF5.close(self.Path)
+        with h5py.File(self.Path, 'a') as f:
+            f.create_dataset(name, data=values if values.shape[1] > 1 else values.flatten())
+        add_to_info(t, prnt=self.Run.Verbose)
+
+    def build(self):
+        """ extract all storable branches at once """
+        for name in sorted(self.Branches):
+            self.load(name)
+
+    def load(self, name):
+        if self.Branches.get(name) is not None and name not in self.HDF5.open(self.Path):
+            self.extract(name)
+        return self.HDF5.load(self.Path, name) if self.Branches.get(name) is not None else None
+    # endregion EXTRACT
+    # ----------------------------------------
+
+    # ----------------------------------------
+    # region GET
+    def get_mask(self, cut=None):
+        """ :returns a boolean mask of the tree entries passing [cut]. Every term of the top level AND is evaluated only once per run:
+            with numpy if it only uses stored branches, otherwise with a single tree scan. """
+        cut = '' if cut is None else cut.GetTitle() if hasattr(cut, 'GetTitle') else str(cut)
+        if cut not in self.Masks:
+            mask = ones(self.NEntries, '?')
+            for term in split_cut(cut):
+                if term not in self.Masks:
+                    self.Masks[term] = self.evaluate_cut(term)
+                mask &= self.Masks[term]
+            self.Masks[cut] = mask
+        return self.Masks[cut]
+
+    def evaluate_cut(self, cut):
+        expression, names = compile_cut(cut)
+        variables = self.load_variables(names)
+        if variables is not None:
+            return eval(expression, {'__builtins__': {}}, variables)
+        mask = zeros(self.NEntries, '?')
+        estimate = self.Tree.GetEstimate()
+        self.Tree.SetEstimate(self.NEntries)
+        mask[get_root_vec(self.Tree, var='Entry$', cut=cut, dtype='i4')] = True
+        self.Tree.SetEstimate(estimate)
+        return mask
+
+    def get_events(self, cut=None):
+        """ :returns the tree entries passing [cut] """
+        return where(self.get_mask(cut))[0]
+
+    def has_variables(self, names):
+        """ :returns whether all (branch, index) pairs [names] are stored, without reading the columns """
+        if names is None:
+            return False
+        for name, i in names:
+            if name == 'Entry$':
+                continue
+            column = self.load(name)
+            if column is None or (i is None) != (column.ndim == 1) or i is not None and i >= column.shape[1]:
+                return False
+        return True
+
+    def load_variables(self, names, events=None):
+        """ :returns the columns for the (branch, index) pairs [names] as float64 arrays (like TFormula) or None if a branch is not stored """
+        if not self.has_variables(names):
+            return None
+        variables = {'abs_': absolute, 'sqrt_': sqrt}
+        events = slice(None) if events is None else events
+        for name, i in names:
+            if name == 'Entry$':
+                variables['Entry_'] = arange(self.NEntries, dtype='d')[events]
+                continue
+            column = self.load(name)
+            variables[name if i is None else '{}__{}'.format(name, i)] = (column[:] if i is None else column[:, i])[events].astype('d')
+        return variables
+
+    def get(self, var, cut=None):
+        """ :returns the values of [var] for the events passing [cut] like TTree::Draw or None if [var] can not be evaluated from the store.
+            The mask of the cut is only built if the store can evaluate [var]. """
+        if var.strip() == 'Entry$':
+            return self.get_events(cut).astype('d')
+        if self.Branches.get(var.strip()) is not None:  # whole branch, arrays are flattened like in TTree::Draw
+            column = self.load(var.strip())
+            return None if column is None else column[:][self.get_events(cut)].flatten().astype('d')
+        expression, names = compile_cut(var, boolean=False)
+        if not self.has_variables(names):
+            return None
+        values = eval(expression, {'__builtins__': {}}, self.load_variables(names, self.get_events(cut)))
+        return values if getattr(values, 'ndim', 0) == 1 else None
+    # endregion GET
+    # ----------------------------------------
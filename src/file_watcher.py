@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# --------------------------------------------------------
+#       notifications about changed files in directories
+# --------------------------------------------------------
+
+from ctypes import CDLL, get_errno
+from ctypes.util import find_library
+from os import read, close, listdir, stat, strerror
+from os.path import join
+from select import select
+from struct import unpack_from, calcsize
+from time import sleep
+
+IN_MODIFY, IN_CLOSE_WRITE, IN_MOVED_TO, IN_CREATE = 0x2, 0x8, 0x80, 0x100
+EVENTS = [(IN_CREATE, 'created'), (IN_MOVED_TO, 'created'), (IN_MODIFY, 'modified'), (IN_CLOSE_WRITE, 'closed')]
+HEADER = 'iIII'  # watch descriptor, mask, cookie, length of the name
+
+
+def get_watcher(directories, interval=1.):
+    """ :returns an inotify watcher of the [directories] if the system supports it, otherwise one which compares the modification times every [interval] seconds """
+    try:
+        return InotifyWatcher(directories)
+    except (OSError, AttributeError, TypeError):
+        return PollingWatcher(directories, interval)
+
+
+class InotifyWatcher(object):
+    """ Receives the creation, modification and close after writing of the files in the [directories] from the kernel. """
+
+    def __init__(self, directories):
+        self.LibC = CDLL(find_library('c'), use_errno=True)
+        self.FD = self.LibC.inotify_init()
+        if self.FD < 0:
+            raise OSError(get_errno(), strerror(get_errno()))
+        self.Dirs = {}  # watch descriptor -> directory
+        for d in directories:
+            wd = self.LibC.inotify_add_watch(self.FD, d, IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE)
+            if wd < 0:
+                self.close()
+                raise OSError(get_errno(), '{}: {}'.format(strerror(get_errno()), d))
+            self.Dirs[wd] = d
+
+    def __del__(self):
+        self.close()
+
+    def get_events(self, timeout=None):
+        """ :returns the (path, event) pairs of the changes within [timeout] seconds, returns immediately if there are changes """
+        if not select([self.FD], [], [], timeout)[0]:
+            return []
+        data, events, i, size = read(self.FD, 1 << 16), [], 0, calcsize(HEADER)
+        while i < len(data):
+            wd, mask, cookie, length = unpack_from(HEADER, data, i)
+            name = data[i + size:i + size + length].rstrip('\0')
+            i += size + length
+            events += [(join(self.Dirs[wd], name), event) for flag, event in EVENTS if mask & flag and wd in self.Dirs]
+        return events
+
+    def close(self):
+        if getattr(self, 'FD', -1) >= 0:
+            close(self.FD)
+            self.FD = -1
+
+
+class PollingWatcher(object):
+    """ Compares the modification times and sizes of the files in the [directories] every [interval] seconds. """
+
+    def __init__(self, directories, interval=1.):
+        self.Dirs = directories
+        self.Interval = interval
+        self.Index = self.scan()  # path -> modification time, size
+
+    def scan(self):
+        index = {}
+        for d in self.Dirs:
+            for name in listdir(d):
+                try:
+                    s = stat(join(d, name))
+                    index[join(d, name)] = (s.st_mtime, s.st_size)
+                except OSError:  # removed in the meantime
+                    pass
+        return index
+
+    def get_events(self, timeout=None):
+        sleep(self.Interval if timeout is None else min(timeout, self.Interval))
+        index = self.scan()
+        events = [(path, 'modified' if path in self.Index else 'created') for path, value in index.iteritems() if self.Index.get(path) != value]
+        self.Index = index
+        return events
+
+    def close(self):
+        pass
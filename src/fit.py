@@ -3,7 +3,11 @@
 from ROOT import TF1, Math, TMath
 from draw import *
 from scipy.special import erf
-from numpy import pi
+from scipy.optimize import curve_fit
+from numpy import pi, digitize, errstate, interp, dot, diag, clip, argmax, take_along_axis, linspace, log, inf, nan, tan
+import numpy.random as npr
+import math
+from numpy.polynomial.polynomial import polyval
 
 
 class Fit(Draw):
@@ -43,9 +47,24 @@ class Fit(Draw):
     def set_par_names(self):
         pass
 
-    def set_par_limits(self):
+    def model(self, x, *pars):
+        """ :returns the fit function at [x] for arrays """
+        pass
+
+    def estimate_pars(self, x, y):
+        """ :returns the start values, the limits ([low, high] or None) and the indices of the fixed parameters for the points [x], [y] """
         pass
 
+    def set_par_limits(self):
+        if self.Histo is not None:
+            start, limits, fixed = self.estimate_pars(*[array([v.n for v in values]) for values in [self.X, self.Values]])
+            for i, par_limits in enumerate(limits):
+                if par_limits is not None:
+                    self.Fit.SetParLimits(i, *par_limits)
+            self.Fit.SetParameters(*start)
+            for i in fixed:
+                self.Fit.FixParameter(i, start[i])
+
     def set_start_values(self):
         pass
 
@@ -75,6 +94,14 @@ class Fit(Draw):
         if show:
             self.Fit.Draw('same')
 
+    def fit_batch(self, histos):
+        """ fits the model to all [histos] (with the same binning) in the fit range at once, the start values and limits are estimated for every histogram.
+            :returns the parameters, their errors, chi2 and ndf of all histograms as arrays """
+        x, y, ey = array([get_hist_arrays(h) for h in histos]).transpose(1, 0, 2)
+        start, limits, fixed = zip(*[self.estimate_pars(ix, iy) for ix, iy in zip(x, y)])
+        bounds = array([[[-inf, inf] if par_limits is None else par_limits for par_limits in ilimits] for ilimits in limits]).transpose(2, 0, 1)
+        return fit_arrays(self.model, x, y, where((x >= self.XMin) & (x <= self.XMax), ey, 0), start, bounds, fixed[0])
+
     def draw(self, *args, **kwargs):
         pass
 
@@ -94,17 +121,13 @@ class Crystalball(Fit):
         self.Fit.SetParameters(c, alpha, n, m, sigma, off)
         self.draw_histo(self.Fit)
 
-    def set_par_limits(self):
-        if self.Histo is not None:
-            maxval = max(self.Values).n
-            max_x = self.X[where(self.Values == max(self.Values))][0].n
-            self.Fit.SetParLimits(0, 1, 2 * maxval)
-            self.Fit.SetParLimits(1, .1, 10)
-            self.Fit.SetParLimits(2, 1, 50)
-            self.Fit.SetParLimits(3, .9 * max_x, 1.1 * max_x)
-            self.Fit.SetParLimits(4, 1e-2, self.XMax - self.XMin)
-            self.Fit.SetParLimits(5, -.1 * maxval, .1 * maxval)
-            self.Fit.SetParameters(maxval, .5, 1, max_x, (self.XMax - self.XMin) / 4., 0)
+    def model(self, x, *pars):
+        return calc_crystalball(x, *pars, inv=self.Invert)
+
+    def estimate_pars(self, x, y):
+        maxval, max_x = y.max(), x[argmax(y)]
+        limits = [[1, 2 * maxval], [.1, 10], [1, 50], [.9 * max_x, 1.1 * max_x], [1e-2, self.XMax - self.XMin], [-.1 * maxval, .1 * maxval]]
+        return [maxval, .5, 1, max_x, (self.XMax - self.XMin) / 4., 0], limits, []
 
 
 class ErfLand(Fit):
@@ -125,202 +148,276 @@ class ErfLand(Fit):
     def get_rise_time(self, p=.1, show=False):
         return self._get_rise_time(p, show, off_par=6)
 
-    def set_par_limits(self):
-        if self.Histo is not None:
-            maxval = max(self.Values).n
-            max_x = self.X[where(self.Values == max(self.Values))][0].n
-            w = self.XMax - self.XMin
-            self.Fit.SetParLimits(0, 1, 10 * maxval)
-            self.Fit.SetParLimits(1, .9 * max_x, 1.1 * max_x)
-            self.Fit.SetParLimits(2, 1e-2, w)
-            self.Fit.SetParLimits(3, 1, 10 * maxval)
-            self.Fit.SetParLimits(4, 1, 1.5 * max_x)
-            self.Fit.SetParLimits(5, .1, 1)
-            self.Fit.SetParLimits(6, -10, 10)
-            w1 = max_x - self.Histo.GetBinCenter(self.Histo.FindFirstBinAbove(.1 * maxval))
-            self.Fit.FixParameter(7, max_x - .4 * w1)
-            self.Fit.SetParameters(maxval * 5, max_x, 3, maxval / 2., .5, max_x - 10, 0, max_x - .5 * w1)
+    def model(self, x, *pars):
+        return calc_erfland(x, *pars)
+
+    def estimate_pars(self, x, y):
+        maxval, max_x = y.max(), x[argmax(y)]
+        w = self.XMax - self.XMin
+        w1 = max_x - x[argmax(y > .1 * maxval)]
+        limits = [[1, 10 * maxval], [.9 * max_x, 1.1 * max_x], [1e-2, w], [1, 10 * maxval], [1, 1.5 * max_x], [.1, 1], [-10, 10], None]
+        return [maxval * 5, max_x, 3, maxval / 2., .5, max_x - 10, 0, max_x - .5 * w1], limits, [7]
 
 
 class Langau(Fit):
-    def __init__(self, h=None, nconv=100, fit_range=None, npx=1000):
+    def __init__(self, h=None, nconv=100, fit_range=None, npx=1000, table=False):
 
         self.NConvolutions = nconv
         self.NSigma = 5.
+        self.Table = table
+        self.ParLimits = None
         Fit.__init__(self, 'langau', h, fit_range, npx)
         self.XMin, self.XMax = [k * self.Histo.GetMean() for k in [.1, 3]] if fit_range is None else fit_range
         print(self.XMin, self.XMax)
 
     def init_fit(self):
-        return TF1(self.Name, partial(langau, nconv=self.NConvolutions, nsigma=self.NSigma), 0, self.get_x_max() * 3, self.NPars)
+        return TF1(self.Name, partial(langau, nconv=self.NConvolutions, nsigma=self.NSigma, table=self.Table), 0, self.get_x_max() * 3, self.NPars)
 
     def set_par_names(self):
         return ['Width', 'MPV', 'Area', 'GSigma']
 
     def set_par_limits(self):
         sigma = self.estimate_sigma()
-        self.Fit.SetParLimits(0, 0, .6 * sigma)                                 # Width (scale) parameter of Landau density
-        self.Fit.SetParLimits(1, *array([.5, 1.5]) * self.get_x_max())          # Most Probable (MPV, location) parameter of Landau density
-        self.Fit.SetParLimits(2, *array([.5, 5000]) * self.Histo.Integral())    # Total area (integral -inf to inf, normalization constant)
-        self.Fit.SetParLimits(3, *array([.5, 3]) * sigma)                       # Width (sigma) of convoluted Gaussian function
+        self.ParLimits = [[0, .6 * sigma],                                      # Width (scale) parameter of Landau density
+                          array([.5, 1.5]) * self.get_x_max(),                  # Most Probable (MPV, location) parameter of Landau density
+                          array([.5, 5000]) * self.Histo.Integral(),            # Total area (integral -inf to inf, normalization constant)
+                          array([.5, 3]) * sigma]                               # Width (sigma) of convoluted Gaussian function
+        for i, limits in enumerate(self.ParLimits):
+            self.Fit.SetParLimits(i, *limits)
         self.Fit.SetParameters(sigma / 5, self.get_x_max(), self.Histo.Integral() * 500, sigma)
 
+    def fit(self, n=1, show=True, minuit=False):
+        """ fits the bins in the fit range with the array fitter and sets the results to the TF1, with [minuit] the TF1 is fitted by ROOT instead """
+        if minuit:
+            return Fit.fit(self, n, show, minuit)
+        x, y, ey = array([v.n for v in self.X]), array([v.n for v in self.Values]), array([v.s for v in self.Values])
+        in_range = (x >= self.XMin) & (x <= self.XMax)
+        for i in range(n):
+            pars, errors, chi2, ndf = fit_langau(x[in_range], y[in_range], ey[in_range], [self.Fit.GetParameter(j) for j in range(self.NPars)], array(self.ParLimits).T,
+                                                 self.NConvolutions, self.NSigma, self.Table)
+            self.Fit.SetParameters(*pars)
+            self.Fit.SetParErrors(errors)
+            self.Fit.SetChisquare(chi2)
+            self.Fit.SetNDF(ndf)
+        self.Fit.SetRange(self.XMin, self.XMax)
+        if show:
+            self.Fit.Draw('same')
+
     def estimate_sigma(self):
         fit = self.Histo.Fit('gaus', 'qs0', '', *array([.7, 1.3]) * self.get_x_max())
         return fit.Parameter(2)
 
+    def model(self, x, *pars):
+        return calc_langau(x, *pars, nconv=self.NConvolutions, nsigma=self.NSigma, table=self.Table)
+
     def get_x_max(self):
         return 1000 if self.Histo is None else self.Histo.GetBinCenter(self.Histo.GetMaximumBin())
 
     def get_mpv(self):
         return self.get_parameter(1)
 
+    def get_peak(self):
+        """ :returns the location of the maximum and the full width at half maximum of the fit """
+        return langaupro([self.Fit.GetParameter(i) for i in range(self.NPars)], self.NConvolutions, self.NSigma, self.Table)
 
-def erfland(x, pars):
-    c0, mpv, sigma, c1, xoff, w, yoff, x0 = [float(p) for p in pars]
-    return yoff + (c0 * TMath.Landau(x[0], mpv, sigma) if x[0] > x0 else c1 * (erf(w * (x[0] - xoff)) + 1))
-
-
-def crystalball(x, pars, inv=False):
-    scale, alpha, n, m, sigma, off = [float(p) for p in pars]
-    x[0] *= -1 if inv else 1
-    m *= -1 if inv else 1
-    if (x[0] - m) / sigma > -alpha:
-        return gauss(x[0], scale, m, sigma, off)
-    else:
-        a = (n / abs(alpha)) ** n * exp(-abs(alpha) ** 2 / 2)
-        b = n / abs(alpha) - abs(alpha)
-        return scale * a * (b - (x[0] - m) / sigma) ** -n + off
-
-
-def langau(x, pars, nconv, nsigma=5):
-    # Convoluted Landau and Gaussian Fitting Function
-    #         (using ROOT's Landau and Gauss functions)
-    # Fit parameters:
-    # par[0]=Width (scale) parameter of Landau density
-    # par[1]=Most Probable (MP, location) parameter of Landau density
-    # par[2]=Total area (integral -inf to inf, normalization constant)
-    # par[3]=Width (sigma) of convoluted Gaussian function
-
-    x = x[0]
-
-    # MP shift correction
-    mpshift = -0.22278298  # Landau maximum location
-    mpc = pars[1] - mpshift * pars[0]
-
-    # Range of convolution integral
-    xmin, xmax = [x + i * nsigma * pars[3] for i in [-1, 1]]
-    step = (xmax - xmin) / nconv
-
-    # Variables
-    sum_int = 0.
-    i = 1.
-
-    # Convolution integral of Landau and Gaussian by sum
-    while i <= nconv / 2:
-        xx = xmin + (i - .5) * step
-        fland = TMath.Landau(xx, mpc, pars[0]) / pars[0]
-        sum_int += fland * TMath.Gaus(x, xx, pars[3])
 
-        xx = xmax - (i - .5) * step
-        fland = TMath.Landau(xx, mpc, pars[0]) / pars[0]
-        sum_int += fland * TMath.Gaus(x, xx, pars[3])
+def calc_erfland(x, c0, mpv, sigma, c1, xoff, w, yoff, x0):
+    """ :returns a Landau density above [x0] and an error function below for arrays """
+    x = array(x, 'd')
+    return yoff + where(x > x0, c0 * landau(x, mpv, sigma), c1 * (erf(w * (x - xoff)) + 1))
 
-        i += 1
 
-    return pars[2] * step * sum_int / sqrt(2 * pi) / pars[3]
-
-
-def langaupro(params, maxx, FWHM):
-
-    #  Seaches for the location (x value) at the maximum of the
-    #  Landau-Gaussian convolute and its full width at half-maximum.
-    #
-    #  The search is probably not very efficient, but it's a first try.
-
-    i = 0
-    MAXCALLS = 10000
-
-    #  Search for maximum
-
-    p = params[1] - 0.1 * params[0]
-    step = 0.05 * params[0]
-    lold = -2.0
-    l = -1.0
-
-    x = array("d", [0])
-
-    while ((l != lold) and (i < MAXCALLS)):
-        i += 1
-
-        lold = l
-        x[0] = p + step
-        l = langau(x, params)
-
-        if (l < lold):
-            step = -step / 10
-
-        p += step
-
-    if (i == MAXCALLS):
-        return (-1)
-
-    maxx = x[0]
-
-    fy = l / 2
-
-    #  Search for right x location of fy
-
-    p = maxx + params[0]
-    step = params[0]
-    lold = -2.0
-    l = -1e300
-    i = 0
-
-    while ((l != lold) and (i < MAXCALLS)):
-        i += 1
-
-        lold = l
-        x[0] = p + step
-        l = TMath.Abs(langau(x, params) - fy)
-
-        if (l > lold):
-            step = -step / 10
-
-        p += step
-
-    if (i == MAXCALLS):
-        return (-2)
-
-    fxr = x[0]
-
-    #  Search for left x location of fy
-
-    p = maxx - 0.5 * params[0]
-    step = -params[0]
-    lold = -2.0
-    l = -1e300
-    i = 0
-
-    while ((l != lold) and (i < MAXCALLS)):
-        i += 1
-
-        lold = l
-        x[0] = p + step
-        l = TMath.Abs(langau(x, params) - fy)
-
-        if (l > lold):
-            step = -step / 10
+def erfland(x, pars):
+    """ scalar version of calc_erfland for the TF1 """
+    c0, mpv, sigma, c1, xoff, w, yoff, x0 = [pars[i] for i in xrange(8)]
+    return yoff + (c0 * TMath.Landau(x[0], mpv, sigma) if x[0] > x0 else c1 * (math.erf(w * (x[0] - xoff)) + 1))
 
-        p += step
 
-    if (i == MAXCALLS):
-        return (-3)
+def calc_crystalball(x, scale, alpha, n, m, sigma, off, inv=False):
+    """ :returns a Gaussian with a power law tail below [m] - [alpha] * [sigma] (above for [inv]) for arrays """
+    x, m = (-array(x, 'd'), -m) if inv else (array(x, 'd'), m)
+    t = (x - m) / sigma
+    a = abs(alpha)
+    with errstate(all='ignore'):
+        tail = scale * (n / a) ** n * exp(-a ** 2 / 2) * (n / a - a - t) ** -n + off
+    return where(t > -alpha, gauss(x, scale, m, sigma, off), tail)
 
-    fxl = x[0]
 
-    FWHM = fxr - fxl
-    return (0)
+def crystalball(x, pars, inv=False):
+    """ scalar version of calc_crystalball for the TF1 """
+    scale, alpha, n, m, sigma, off = [pars[i] for i in xrange(6)]
+    x, m = (-x[0], -m) if inv else (x[0], m)
+    t = (x - m) / sigma
+    if t > -alpha:
+        return scale * math.exp(-.5 * t ** 2) + off
+    a = abs(alpha)
+    return scale * (n / a) ** n * math.exp(-a ** 2 / 2) * (n / a - a - t) ** -n + off
+
+
+def fit_arrays(model, x, y, ey, p0, bounds, fixed=()):
+    """ least squares fits of [model] (evaluated on arrays) to N data sets, points with ey <= 0 are skipped like in TH1::Fit.
+        [x], [y] and [ey] have the shape [N, n], the start values [p0] and the [low, high] [bounds] the shape [N, n_pars].
+        :returns the parameters, their errors, chi2 and ndf of all data sets as arrays (nan for failed fits) """
+    x, y, ey, pars = [array(v, 'd') for v in [x, y, ey, p0]]
+    low, high = array(bounds, 'd')
+    free = array([i not in fixed for i in xrange(pars.shape[1])])
+    errors, chi2, ndf = zeros(pars.shape), zeros(x.shape[0]), (ey > 0).sum(1) - free.sum()
+    for i in xrange(x.shape[0]):
+        s = ey[i] > 0
+        p = pars[i].copy()
+
+        def f(xx, *free_pars):
+            p[free] = free_pars
+            return model(xx, *p)
+        try:
+            pars[i, free], cov = curve_fit(f, x[i][s], y[i][s], clip(p[free], low[i][free], high[i][free]), ey[i][s], absolute_sigma=True, bounds=(low[i][free], high[i][free]))
+            errors[i, free] = sqrt(diag(cov))
+            chi2[i] = (((f(x[i][s], *pars[i, free]) - y[i][s]) / ey[i][s]) ** 2).sum()
+        except (RuntimeError, ValueError) as err:
+            warning('fit of data set {} failed: {}'.format(i, err))
+            pars[i], errors[i], chi2[i] = nan, nan, nan
+    return pars, errors, chi2, ndf
+
+
+# ----------------------------------------
+# region LANDAU GAUSS
+# coefficients (lowest order first) of the approximation of the Landau density of CERNLIB G110 (DENLAN), which is used by TMath::Landau
+LANDAU_EDGES = [-5.5, -1, 1, 5, 12, 50, 300]
+LANDAU_P = array([[.4259894875, -.1249762550, .03984243700, -.006298287635, .001511162253],
+                  [.1788541609, .1173957403, .01488850518, -.001394989411, .0001283617211],
+                  [.1788544503, .09359161662, .006325387654, .00006611667319, -.000002031049101],
+                  [.9874054407, 118.6723273, 849.2794360, -743.7792444, 427.0262186],
+                  [1.003675074, 167.5702434, 4789.711289, 21217.86767, -22324.94910],
+                  [1.000827619, 664.9143136, 62972.92665, 475554.6998, -5743609.109]])
+LANDAU_Q = array([[1, -.3388260629, .09594393323, -.01608042283, .003778942063],
+                  [1, .7428795082, .3153932961, .06694219548, .008790609714],
+                  [1, .6097809921, .2560616665, .04746722384, .006957301675],
+                  [1, 106.8615961, 337.6496214, 2016.712389, 1597.063511],
+                  [1, 156.9424537, 3745.310488, 9834.698876, 66924.28357],
+                  [1, 651.4101098, 56974.73333, 165917.4725, -2815759.939]])
+LANDAU_A1 = [1, .04166666667, -.01996527778, .02709538966]
+LANDAU_A2 = [0, 0, 1, -1.845568670, -4.284640743]
+MP_SHIFT = -0.22278298  # location of the maximum of the standard Landau density
+LANDAU_TABLE_RANGE = [-8, 100, 1e-3]  # range and step of the interpolation table of the standard Landau density
+
+g_landau_table = []
+g_grids = {}
+
+
+def calc_landau(v):
+    """ :returns the standard Landau density at [v] (array) """
+    v = array(v, 'd')
+    values = zeros(v.shape)
+    region = digitize(v, LANDAU_EDGES)
+    with errstate(all='ignore'):
+        x = v[region == 0]
+        u = exp(x + 1)
+        values[region == 0] = where(u < 1e-10, 0, .3989422803 * exp(-1 / u) / sqrt(u) * polyval(u, LANDAU_A1))
+        x = v[region == 1]
+        u = exp(-x - 1)
+        values[region == 1] = exp(-u) * sqrt(u) * polyval(x, LANDAU_P[0]) / polyval(x, LANDAU_Q[0])
+        for i in [2, 3]:
+            x = v[region == i]
+            values[region == i] = polyval(x, LANDAU_P[i - 1]) / polyval(x, LANDAU_Q[i - 1])
+        for i in [4, 5, 6]:
+            u = 1 / v[region == i]
+            values[region == i] = u ** 2 * polyval(u, LANDAU_P[i - 1]) / polyval(u, LANDAU_Q[i - 1])
+        x = v[region == 7]
+        u = 1 / (x - x * log(x) / (x + 1))
+        values[region == 7] = polyval(u, LANDAU_A2)
+    return values
+
+
+def get_landau_table():
+    if not g_landau_table:
+        x = arange(*LANDAU_TABLE_RANGE)
+        g_landau_table.extend([x, calc_landau(x)])
+    return g_landau_table
+
+
+def landau(x, mpv=0, sigma=1, table=False):
+    """ :returns the Landau density like TMath::Landau(x, mpv, sigma) for arrays [x], [mpv] and [sigma],
+        with [table] the standard Landau density is linearly interpolated from a precomputed table (exact outside of its range) """
+    with errstate(all='ignore'):
+        v = (array(x, 'd') - mpv) / sigma
+    if table:
+        x, y = get_landau_table()
+        inside = (v >= x[0]) & (v <= x[-1])
+        values = interp(v, x, y)
+        values[~inside] = calc_landau(v[~inside])
+    else:
+        values = calc_landau(v)
+    return where(sigma > 0, values, 0)
+
+
+def random_landau(mpv=0, sigma=1, size=None, random=None):
+    """ :returns random numbers of the Landau distribution like TRandom::Landau(mpv, sigma), which is the stable distribution with alpha = beta = 1
+        and scale pi / 2, drawn with the method of Chambers, Mallows and Stuck from [random] (numpy RandomState) """
+    random = npr if random is None else random
+    u, w = random.uniform(-pi / 2, pi / 2, size), random.standard_exponential(size)
+    return mpv + sigma * ((pi / 2 + u) * tan(u) - log(w * cos(u) / (pi / 2 + u)))
+
+
+def get_convolution_grid(nconv, nsigma):
+    """ :returns the distances of the nodes of the convolution integral to x in units of the Gaussian sigma and their Gaussian weights """
+    if (nconv, nsigma) not in g_grids:
+        u = -nsigma + (arange(nconv // 2) + .5) * 2. * nsigma / nconv
+        u = concatenate([u, -u])
+        g_grids[(nconv, nsigma)] = u, exp(-.5 * u ** 2)
+    return g_grids[(nconv, nsigma)]
+
+
+def calc_langau(x, width, mpv, area, gsigma, nconv=100, nsigma=5., table=False):
+    """ :returns the convolution of a Landau and a Gaussian density at [x] by a sum over [nconv] nodes within [nsigma] Gaussian sigmas.
+        [x] and the parameters can be arrays of any shape which broadcast together.
+        :parameter: width (scale) of the Landau density, most probable value of the Landau density, total area, sigma of the Gaussian """
+    u, weights = get_convolution_grid(nconv, nsigma)
+    x, width, mpv, area, gsigma = [array(v, 'd')[..., None] for v in [x, width, mpv, area, gsigma]]
+    with errstate(all='ignore'):
+        values = landau(x + u * gsigma, mpv - MP_SHIFT * width, width, table) / width
+    return area[..., 0] * 2 * nsigma / nconv * dot(values, weights) / sqrt(2 * pi)
+
+
+def langau(x, pars, nconv, nsigma=5, table=False):
+    """ Landau-Gauss convolution for TF1 with the parameters [width, mpv, area, gsigma] """
+    return float(calc_langau(x[0], *[pars[i] for i in xrange(4)], nconv=nconv, nsigma=nsigma, table=table))
+
+
+def fit_langau(x, y, ey, p0, bounds, nconv=100, nsigma=5., table=False):
+    """ least squares fit of the Landau-Gauss convolution to the values [y] with the errors [ey] at [x], points without error are skipped like in TH1::Fit
+        :returns the parameters, their errors, chi2 and the number of degrees of freedom """
+    x, y, ey = [array(v, 'd')[array(ey) > 0] for v in [x, y, ey]]
+    p0 = clip(p0, *bounds)
+
+    def f(xx, *p):
+        return calc_langau(xx, *p, nconv=nconv, nsigma=nsigma, table=table)
+    pars, cov = curve_fit(f, x, y, p0, ey, absolute_sigma=True, bounds=bounds)
+    return pars, sqrt(diag(cov)), (((f(x, *pars) - y) / ey) ** 2).sum(), x.size - pars.size
+
+
+def find_grid_index(f, lo, hi, find, precision, n):
+    """ :returns the point given by [find] (function values on the grid -> index), the grids between [lo] and [hi] are refined around the found point """
+    while (abs(hi - lo) > precision).any():
+        x = lo + (hi - lo) * linspace(0, 1, n)
+        i = find(f(x))[..., None]
+        lo, hi = [take_along_axis(x, clip(i + j, 0, n - 1), -1) for j in [-1, 1]]
+    return (lo + hi) / 2
+
+
+def langaupro(pars, nconv=100, nsigma=5., table=False, precision=1e-4, n=101):
+    """ :returns the location of the maximum and the full width at half maximum of the Landau-Gauss convolution with the parameters [pars] (shape [..., 4]).
+        The intervals containing the maximum and the points at half maximum are shrunk with grids of [n] points until they are smaller than [precision] times the width. """
+    width, mpv, area, gsigma = [array(pars, 'd')[..., i, None] for i in xrange(4)]
+    scale = width + gsigma
+
+    def f(x):
+        return calc_langau(x, width, mpv, area, gsigma, nconv, nsigma, table)
+    x_max = find_grid_index(f, mpv - 3 * scale, mpv + 3 * scale, lambda v: argmax(v, axis=-1), precision * scale, n)
+    half_max = f(x_max) / 2
+    x_right, x_left = [find_grid_index(f, x_max, x_max + d * 10 * scale, lambda v: argmax(v < half_max, axis=-1), precision * scale, n) for d in [1, -1]]
+    return x_max[..., 0], (x_right - x_left)[..., 0]
+# endregion LANDAU GAUSS
+# ----------------------------------------
 
 
 if __name__ == '__main__':
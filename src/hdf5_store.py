@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# --------------------------------------------------------
+#       pool of hdf5 read handles shared by all analyses of a process
+# --------------------------------------------------------
+
+from atexit import register
+from collections import OrderedDict
+from os import remove
+from os.path import realpath, lexists
+
+import h5py
+from numpy import memmap
+
+# one store per process
+g_store = None
+
+
+def get_hdf5_store(max_open=None, mmap=None):
+    global g_store
+    if g_store is None:
+        g_store = HDF5Store()
+    g_store.MaxOpen = g_store.MaxOpen if max_open is None else max_open
+    g_store.MMap = g_store.MMap if mmap is None else mmap
+    return g_store
+
+
+class HDF5Store(object):
+    """ Keeps at most [max_open] read handles open and reuses them for every access to the same file. Files have to be written with save or closed before.
+        With [mmap] contiguous uncompressed datasets are returned as read only numpy memory maps instead of h5py datasets. """
+
+    def __init__(self, max_open=200, mmap=False):
+        self.MaxOpen = max_open
+        self.MMap = mmap
+        self.Files = OrderedDict()  # real path -> file, in order of the last access
+        register(self.close)
+
+    def open(self, path):
+        """ :returns the pooled read handle of the hdf5 file at [path] """
+        path = realpath(path)
+        if path in self.Files:
+            f = self.Files.pop(path)
+            if f.id.valid:
+                self.Files[path] = f
+                return f
+        self.Files[path] = h5py.File(path, 'r')
+        while len(self.Files) > self.MaxOpen:
+            self.close_file(self.Files.popitem(last=False)[1])
+        return self.Files[path]
+
+    def load(self, path, *names, **kwargs):
+        """ :returns the datasets [names] (default: "data") of the file at [path], memory mapped if requested and possible """
+        mmap = kwargs.get('mmap', self.MMap)
+        f = self.open(path)
+        data = [self.map(f[name]) if mmap else f[name] for name in (names if names else ['data'])]
+        return data[0] if len(data) == 1 else data
+
+    @staticmethod
+    def map(ds):
+        offset = ds.id.get_offset()
+        return ds if offset is None or ds.chunks is not None or ds.compression is not None else memmap(ds.file.filename, ds.dtype, 'r', offset, ds.shape)
+
+    def save(self, path, **datasets):
+        """ writes the [datasets] to a new file at [path], replacing a pooled handle of an old version """
+        self.close(path)
+        f = h5py.File(path, 'w')
+        for name, data in datasets.iteritems():
+            f.create_dataset(name, data=data)
+        f.close()
+
+    def remove(self, path):
+        self.close(path)
+        if lexists(path):
+            remove(path)
+
+    def close(self, path=None):
+        """ closes the handle of the file at [path] or all handles if None is provided. They are reopened on the next access. """
+        paths = self.Files.keys() if path is None else [realpath(path)]
+        for p in paths:
+            if p in self.Files:
+                self.close_file(self.Files.pop(p))
+
+    @staticmethod
+    def close_file(f):
+        if f.id.valid:
+            f.close()
+
+    def __len__(self):
+        return len(self.Files)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# --------------------------------------------------------
+#       filling of several histograms from one read of the tree
+# --------------------------------------------------------
+
+from collections import OrderedDict
+from re import split as re_split
+
+from numpy import array
+
+from draw import fill_hist
+from utils import get_root_vecs
+
+
+def split_variables(var):
+    """ :returns the expressions of the TTree::Draw variables [var] ('z:y:x') in the order of the axes (x, y, z) """
+    return [v.strip() for v in re_split(r'(?<!:):(?!:)', var)][::-1]
+
+
+def get_cut_string(cut):
+    return cut.GetTitle() if hasattr(cut, 'GetTitle') else '' if cut is None else str(cut)
+
+
+class HistoBooking(object):
+    """ Fills the histograms and profiles of a run without scanning the tree for every histogram. The analyses book the variables
+        (like TTree::Draw: 'z:y:x') and the cuts of the histograms they are going to draw. fill() reads all of them at once from the event store, which
+        evaluates every cut term only once, only variables which are not stored require a tree scan. draw() bins the values into the histogram. """
+
+    def __init__(self, run):
+        self.Run = run
+        self.Booked = OrderedDict()  # (variables, cut) -> None
+        self.Values = {}  # (variables, cut) -> events, values for every axis
+
+    def book(self, var, cut=''):
+        """ registers the variables [var] and the [cut] of a histogram which will be drawn after the next call of fill() """
+        key = (var, get_cut_string(cut))
+        if key not in self.Values:
+            self.Booked[key] = None
+        return key
+
+    def fill(self):
+        """ reads the values of all booked histograms """
+        for var, cut in self.Booked:
+            values = self.load_columns(var, cut)
+            self.Values[(var, cut)] = self.load_tree(var, cut) if values is None else values
+        self.Booked.clear()
+
+    def clear(self):
+        """ drops the booked and the read values which were not drawn """
+        self.Booked.clear()
+        self.Values.clear()
+
+    def load_columns(self, var, cut):
+        """ :returns the passing events and the values of the variables [var] from the event store or None if they are not stored """
+        store = self.Run.Columns
+        if store is None:
+            return None
+        events = store.get_events(cut)
+        values = [store.get(v, cut) for v in split_variables(var)]
+        return None if any(v is None or v.size != events.size for v in values) else (events, values)
+
+    def load_tree(self, var, cut):
+        """ :returns the values of [var] like TTree::Draw, the entry numbers are read as well if there are less than four variables """
+        variables = split_variables(var)
+        with_events = len(variables) < 4
+        estimate = self.Run.Tree.GetEstimate()
+        self.Run.Tree.SetEstimate(self.Run.NEntries * (len(variables) + with_events))  # the default estimate cuts off the values after 1M entries
+        n = self.Run.Tree.Draw(':'.join(variables[::-1] + (['Entry$'] if with_events else [])), cut, 'goff')
+        values = get_root_vecs(self.Run.Tree, n, len(variables) + with_events)
+        self.Run.Tree.SetEstimate(estimate)
+        return (values[-1].astype('i8') if with_events else None), values[:len(variables)][::-1]
+
+    def draw(self, h, var, cut='', n_events=None, start=0):
+        """ fills [h] like TTree::Draw('var>>h', cut, 'goff', n_events, start) with the values of the booked [var] and [cut] """
+        key = self.book(var, cut)
+        if key not in self.Values:
+            self.fill()
+        events, values = self.Values.pop(key)
+        if n_events is not None or start:
+            if events is None:
+                self.Run.Tree.Draw('{}>>{}'.format(var, h.GetName()), key[1], 'goff', self.Run.NEntries if n_events is None else n_events, start)
+                return h
+            selected = (events >= start) & (events < start + (self.Run.NEntries if n_events is None else n_events))
+            values = [v[selected] for v in values]
+        fill_hist(h, *[array(v, 'd') for v in values])
+        return h
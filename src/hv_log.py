@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# --------------------------------------------------------
+#       binary time indexed copy of the HV device logs
+# --------------------------------------------------------
+
+from collections import OrderedDict
+from datetime import datetime
+from glob import glob
+from os import rename, getpid, stat
+from os.path import join, basename, isfile
+from re import compile as re_compile, M
+
+import h5py
+from numpy import array, zeros, concatenate, cumsum, diff, searchsorted
+
+from hdf5_store import get_hdf5_store
+
+NUMBER = r'([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)'
+LINE = re_compile(r'^(\d\d):(\d\d):(\d\d)\s+{0}\s+{0}(?=\s|$)'.format(NUMBER), M)  # time, voltage, current; text entries do not match
+
+# one log per device channel and process
+g_logs = {}
+
+
+def get_hv_log(data_path, file_path, tz):
+    """ :returns the log of the device in [data_path] with all changes of the log files since the last call """
+    if file_path not in g_logs:
+        g_logs[file_path] = HVLog(data_path, file_path, tz)
+    else:
+        g_logs[file_path].update()
+    return g_logs[file_path]
+
+
+class HVLog(object):
+    """ Parses every log file of an HV device channel only once into arrays of the time stamps, voltages and currents, which are saved in an hdf5 file
+        (one group per log file). Log files which grew since are only parsed from the last complete line. """
+
+    def __init__(self, data_path, file_path, tz):
+        self.DataPath = data_path
+        self.FilePath = file_path
+        self.TimeZone = tz
+        self.HDF5 = get_hdf5_store()
+
+        self.Logs = self.load()  # log name -> info about the parsed part and its data
+        self.Time, self.Voltages, self.Currents, self.Bounds = None, None, None, None
+        self.update()
+
+    # ----------------------------------------
+    # region FILE
+    def load(self):
+        logs = OrderedDict()
+        if isfile(self.FilePath):
+            try:
+                f = self.HDF5.open(self.FilePath)
+                for name in sorted(f.keys()):
+                    logs[name] = dict(f[name].attrs.iteritems())
+                    logs[name]['data'] = f[name]['data'][:]
+            except (IOError, KeyError):  # rebuild from the log files
+                logs = OrderedDict()
+        return logs
+
+    def save(self):
+        tmp_file = '{}.{}'.format(self.FilePath, getpid())
+        with h5py.File(tmp_file, 'w') as f:
+            for name, log in self.Logs.iteritems():
+                group = f.create_group(name)
+                group.create_dataset('data', data=log['data'])
+                for key in ['size', 'mtime', 'offset', 'days', 'last']:
+                    group.attrs[key] = log[key]
+        self.HDF5.close(self.FilePath)
+        rename(tmp_file, self.FilePath)
+    # endregion FILE
+    # ----------------------------------------
+
+    # ----------------------------------------
+    # region PARSE
+    def update(self):
+        """ parses the new and changed log files and rebuilds the index of all logs """
+        changed = False
+        names = [basename(name) for name in sorted(glob(join(self.DataPath, '*')))]
+        for name in [name for name in self.Logs if name not in names]:
+            changed = self.Logs.pop(name) is not None
+        for name in names:
+            s = stat(join(self.DataPath, name))
+            log = self.Logs.get(name)
+            if log is not None and log['size'] == s.st_size and log['mtime'] == s.st_mtime:
+                continue
+            if log is None or s.st_size < log['size']:  # new or rewritten file
+                log = {'offset': 0, 'days': 0, 'last': -1, 'data': zeros((0, 3))}
+            self.Logs[name] = self.parse(name, log, s)
+            changed = True
+        if changed:
+            self.Logs = OrderedDict(sorted(self.Logs.iteritems()))
+            self.save()
+        if changed or self.Time is None:
+            self.make_index()
+
+    def parse(self, name, log, s):
+        """ parses the log file [name] from the offset of the already parsed part in [log] """
+        with open(join(self.DataPath, name)) as f:
+            f.seek(log['offset'])
+            text = f.read(s.st_size - log['offset'])
+        text = text[:text.rfind('\n') + 1]  # only complete lines, the rest is parsed once the logger finished the line
+        rows = LINE.findall(text)
+        values = array(rows).reshape(-1, 5).astype('f8')
+        seconds = values[:, 0] * 3600 + values[:, 1] * 60 + values[:, 2]
+        # count the days at every step back in time
+        days = log['days'] + cumsum(diff(concatenate([[log['last']], seconds])) < 0) if seconds.size else zeros(0)
+        data = array([self.get_day_start(name) + seconds + 86400 * days, values[:, 3], values[:, 4]]).T
+        return {'offset': log['offset'] + len(text), 'size': s.st_size, 'mtime': s.st_mtime, 'days': days[-1] if days.size else log['days'],
+                'last': seconds[-1] if seconds.size else log['last'], 'data': concatenate([log['data'], data])}
+
+    def get_day_start(self, name):
+        """ :returns the time stamp of the start of the day of the log file in the convention of utils.time_stamp """
+        log_date = self.TimeZone.localize(datetime.strptime(''.join(name.split('_')[-6:]), '%Y%m%d%H%M%S.log'))
+        return float(datetime(log_date.year, log_date.month, log_date.day).strftime('%s')) - log_date.utcoffset().seconds
+
+    def make_index(self):
+        self.Time, self.Voltages, self.Currents = concatenate([zeros((0, 3))] + [log['data'] for log in self.Logs.itervalues()]).T
+        sizes = [log['data'].shape[0] for log in self.Logs.itervalues()]
+        self.Bounds = zip(cumsum([0] + sizes[:-1]), cumsum(sizes))
+    # endregion PARSE
+    # ----------------------------------------
+
+    def get(self, begin, end):
+        """ :returns the time stamps, voltages and currents of every log file in the interval [begin, end] """
+        data = []
+        for i, j in self.Bounds:
+            t = self.Time[i:j]
+            if not t.size or t[0] > end or t[-1] < begin:
+                continue
+            s = slice(i + searchsorted(t, begin), i + searchsorted(t, end, 'right'))
+            data.append((self.Time[s], self.Voltages[s], self.Currents[s]))
+        return data
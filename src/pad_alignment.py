@@ -5,7 +5,7 @@
 # --------------------------------------------------------
 
 from ROOT import TProfile
-from numpy import histogram2d, sum
+from numpy import histogram2d, sum, cumsum, concatenate, minimum, searchsorted, flatnonzero
 
 from event_alignment import EventAligment
 from utils import *
@@ -18,6 +18,7 @@ class PadAlignment(EventAligment):
         self.Threshold = .4
         self.PulserEvents = array([])
         self.BinSize = 30
+        self.HitFractions = {}  # offset -> rolling hit fractions of all pulser events, indices of the misaligned ones
 
         EventAligment.__init__(self, converter, verbose)
         self.Offsets = sorted(range(-self.MaxOffset, self.MaxOffset + 1), key=abs)
@@ -32,6 +33,10 @@ class PadAlignment(EventAligment):
     def print_start(self):
         print_banner('STARTING PAD EVENT ALIGNMENT OF RUN {}'.format(self.Converter.RunNumber))
 
+    def load_variables(self):
+        """ the alignment only requires the number of hits, the hits are read in chunks when writing the aligned tree """
+        return None
+
     def update_variables(self):
         """ get additional vectors"""
         t = self.Run.info('Loading pad information from tree ... ', next_line=False)
@@ -65,8 +70,38 @@ class PadAlignment(EventAligment):
     def calc_hit_fraction(self, start, off=0, n_events=None):
         """" get the mean number of hits for a given offset in the pulser event interval [start: start + n] """
         n_events = self.BinSize if n_events is None else n_events
+        if n_events == self.BinSize and 0 <= start < self.PulserEvents.size:
+            return self.get_hit_fractions(off)[start]
         return mean(self.NHits[self.PulserEvents[start:start + n_events] + off] > 3)
 
+    def load_hit_fractions(self, offsets):
+        """ calculate the rolling hit fractions in windows of [BinSize] pulser events for all [offsets] at once with cumulative sums """
+        offsets = array([off for off in offsets if off not in self.HitFractions], 'i8')
+        if not offsets.size:
+            return
+        events = self.PulserEvents.astype('i8') + offsets.reshape(-1, 1)
+        hits = zeros(events.shape, 'i8')
+        valid = events < self.NHits.size  # the events beyond the end of the run are never used
+        hits[valid] = self.NHits[events[valid]] > 3
+        hits = concatenate([zeros((offsets.size, 1), 'i8'), cumsum(hits, axis=1)], axis=1)
+        start = arange(self.PulserEvents.size)
+        end = minimum(start + self.BinSize, self.PulserEvents.size)  # the last windows get shorter like the slices
+        fractions = (hits[:, end] - hits[:, start]) / (end - start).astype('d')
+        for off, f in zip(offsets, fractions):
+            self.HitFractions[off] = f, flatnonzero(f > self.Threshold)
+
+    def get_hit_fractions(self, off):
+        if off not in self.HitFractions:
+            self.load_hit_fractions(off + array(self.Offsets))
+        return self.HitFractions[off][0]
+
+    def find_next_misaligned(self, start, off):
+        """ :returns the index of the first pulser event from [start] with a hit fraction above threshold for the offset [off] """
+        self.get_hit_fractions(off)
+        misaligned = self.HitFractions[off][1]
+        i = searchsorted(misaligned, start)
+        return misaligned[i] if i < misaligned.size else self.PulserEvents.size
+
     def find_error_offset(self, pulser_event, offset):
         """check if the given event matches a decoding error"""
         for ev in self.Converter.DecodingErrors:
@@ -103,7 +138,15 @@ class PadAlignment(EventAligment):
         offsets = OrderedDict([(0, total_offset)] if total_offset else [])
         rates = [self.calc_hit_fraction(0)]
         i = 1
+        self.HitFractions = {}
+        self.load_hit_fractions(self.Offsets)
         while i < len(self.PulserEvents) - abs(total_offset) - n:
+            # skip the aligned events, only their rates are required for the last n steps
+            last = min(self.find_next_misaligned(i, total_offset), len(self.PulserEvents) - abs(total_offset) - n)
+            rates = (rates + self.get_hit_fractions(total_offset)[max(i, last - n):last].tolist())[-n:]
+            i = last
+            if i >= len(self.PulserEvents) - abs(total_offset) - n:
+                break
             rate = self.calc_hit_fraction(i, total_offset)
             if rate > self.Threshold:
                 # first check if the event is in the decoding errors
@@ -136,11 +179,6 @@ class PadAlignment(EventAligment):
     # endregion OFFSETS
     # ----------------------------------------
 
-    def fill_branches(self, offset):
-        for i, name in enumerate(self.Branches.iterkeys()):
-            for value in self.Variables[self.AtEntry + offset][i]:
-                self.Branches[name].push_back(value)
-
 
 if __name__ == '__main__':
 
@@ -177,7 +177,7 @@ class PadAnalysis(DUTAnalysis):
             p, fit_pars = self.draw_pulse_height(bin_size=bin_size, cut=self.Cut(cut), corr=corr, show=False, save=False, redo=redo)
             return fit_pars
 
-        ph = make_ufloat(do_pickle(picklepath, f, redo=redo), par=0)
+        ph = make_ufloat(self.do_pickle(picklepath, f, redo=redo), par=0)
         return ufloat(ph.n, ph.s + sys_err)
 
     def get_pedestal(self, pulser=False, par=1, redo=False):
@@ -213,10 +213,18 @@ class PadAnalysis(DUTAnalysis):
     # ----------------------------------------
 
     def make_all(self, redo=False):
-        self.draw_signal_distribution(redo=redo, show=False)
-        self.draw_pulse_height(redo=redo, show=False)
-        self.draw_signal_map(redo=redo, show=False)
-        self.draw_hitmap(redo=redo, show=False)
+        """ draws the main pulse height plots, the values of all of them are read at once by the first plot which is not cached """
+        self.Run.Booking.book(self.generate_signal_name(), self.Cut())
+        self.Run.Booking.book(self.get_ph_var(), self.Cut())
+        self.Run.Booking.book(self.get_signal_map_var(), self.Cut.generate_custom(exclude=['fiducial'], prnt=False))
+        self.Run.Booking.book(self.get_signal_map_var(hitmap=True), self.Cut.get('tracks'))
+        try:
+            self.draw_signal_distribution(redo=redo, show=False)
+            self.draw_pulse_height(redo=redo, show=False)
+            self.draw_signal_map(redo=redo, show=False)
+            self.draw_hitmap(redo=redo, show=False)
+        finally:
+            self.Run.Booking.clear()
 
     # ----------------------------------------
     # region 2D SIGNAL DISTRIBUTION
@@ -261,13 +269,17 @@ class PadAnalysis(DUTAnalysis):
             mx = mean([px.GetBinCenter(b) for b in [px.FindFirstBinAbove(px.GetMaximum() / 2), px.FindLastBinAbove(px.GetMaximum() / 2)]])
             my = mean([py.GetBinCenter(b) for b in [py.FindFirstBinAbove(py.GetMaximum() / 2), py.FindLastBinAbove(py.GetMaximum() / 2)]])
             return array([mx, my])
-        return do_pickle(self.make_simple_pickle_path('Center', sub_dir='Center'), f, redo=redo)
+        return self.do_pickle(self.make_simple_pickle_path('Center', sub_dir='Center'), f, redo=redo)
 
     # endregion 2D SIGNAL DISTRIBUTION
     # ----------------------------------------
 
     # ----------------------------------------
     # region PULSE HEIGHT
+    def get_ph_var(self, signal=None, evnt_corr=True):
+        """ :returns the variables of the pulse height vs. time """
+        return '{}:{}'.format(self.generate_signal_name(signal, evnt_corr), self.get_t_var())
+
     def generate_signal_name(self, signal=None, evnt_corr=True, off_corr=False, cut=None, region=None):
         sig_name = signal if signal is not None else self.get_signal_name(region)
         # pedestal polarity is always the same as signal polarity
@@ -312,13 +324,12 @@ class PadAnalysis(DUTAnalysis):
         picklepath = self.make_pickle_path('Ph_fit', None, self.RunNumber, self.DUT.Number, suf=suffix)
 
         def func():
-            signal = self.generate_signal_name(sig, corr)
             prof = TProfile('pph', 'Pulse Height Evolution', *self.Bins.get_time(bin_size))
-            self.Tree.Draw('{}:{}>>pph'.format(signal, self.get_t_var()), cut_str, 'goff')
+            self.Run.Booking.draw(prof, self.get_ph_var(sig, corr), cut_str)
             self.PulseHeight = prof
             return prof
 
-        p = do_pickle(picklepath, func, redo=redo)
+        p = self.do_pickle(picklepath, func, redo=redo)
         self.format_statbox(only_fit=True, w=.3)
         y = get_hist_vec(p)
         format_histo(p, name='Fit Result', x_tit='Time [hh:mm]', y_tit='Mean Pulse Height [mV]', y_off=1.6, x_range=[self.Run.StartTime, self.Bins.get_time()[1][-1]],
@@ -402,12 +413,12 @@ class PadAnalysis(DUTAnalysis):
             sig_name = self.generate_signal_name(sig, evnt_corr, off_corr, cut)
             start_event = int(float(start)) if start is not None else 0
             n_events = self.Run.find_n_events(n=events, cut=str(cut), start=start_event) if events is not None else self.Run.NEntries
-            self.Tree.Draw('{name}>>h_sd'.format(name=sig_name), str(cut), 'goff', n_events, start_event)
+            self.Run.Booking.draw(h1, sig_name, cut, n_events, start_event)
             h1.Rebin(max(1, int(h1.GetMean() / 30)))
             return h1
 
         self.format_statbox(all_stat=1, w=.3)
-        h = do_pickle(pickle_path, func, redo=redo)
+        h = self.do_pickle(pickle_path, func, redo=redo)
         x_range = increased_range([h.GetBinCenter(i) for i in [h.FindFirstBinAbove(0), h.FindLastBinAbove(3)]], .1) if x_range is None else x_range
         format_histo(h, x_tit='Pulse Height [mV]', y_tit='Number of Entries', y_off=2, fill_color=self.FillColor, x_range=x_range, normalise=normalise)
         self.save_histo(h, 'SignalDistribution', lm=.15, show=show, prnt=prnt, save=save, sumw2=sumw2)
@@ -520,7 +531,7 @@ class PadAnalysis(DUTAnalysis):
                 print('Old Bucket: {0} / {1} = {2:4.2f}%'.format(n_old, self.Run.NEntries, n_old / float(self.Run.NEntries) * 100))
             return {'old': n_old, 'new': n_new, 'all': float(self.Run.NEntries)}
 
-        return do_pickle(pickle_path, func)
+        return self.do_pickle(pickle_path, func)
 
     def show_bucket_hits(self, show=True):
         # hit position
@@ -610,7 +621,7 @@ class PadAnalysis(DUTAnalysis):
             return result
 
         res = func() if plot_histos else None
-        return do_pickle(pickle_path, func, res)
+        return self.do_pickle(pickle_path, func, res)
 
     def compare_single_cuts(self):
         gROOT.ProcessLine('gErrorIgnoreLevel = kError;')
@@ -861,7 +872,7 @@ class PadAnalysis(DUTAnalysis):
             alignment = PadAlignment(self.Run.Converter, verbose=False)
             return alignment.IsAligned
 
-        is_aligned = do_pickle(pickle_path, f)
+        is_aligned = self.do_pickle(pickle_path, f)
         log_warning('\nRun {r} is misaligned :-('.format(r=self.RunNumber)) if not is_aligned else do_nothing()
         return is_aligned
 
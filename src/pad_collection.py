@@ -1,7 +1,7 @@
 #! /usr/bin/env python
 from ROOT import TExec
 
-from Extrema import Extrema2D
+from Extrema import Extrema2D, get_square_votes
 from PulserCollection import PulserCollection
 from analysis_collection import *
 from pad_analysis import PadAnalysis
@@ -242,7 +242,7 @@ class PadCollection(AnalysisCollection):
             x0, y0, x1, y1 = [j for ind in [i0, i1] for j in get_hist_vecs(self.get_ana(ind).draw_signal_vs_peaktime(show=False))]
             y0 = where(y0 == 0, 1e10, y0)
             return x0, y1 / y0
-        x, y = do_pickle(self.make_simple_pickle_path('SigPeakRatio', sub_dir='Peaks', dut='{}{}'.format(i0, i1)), f, redo=redo)
+        x, y = self.do_pickle(self.make_simple_pickle_path('SigPeakRatio', sub_dir='Peaks', dut='{}{}'.format(i0, i1)), f, redo=redo)
         flux0, flux1 = [make_flux_string(self.get_ana(i).get_flux()) for i in [i0, i1]]
         g = self.make_tgrapherrors('gcspt', 'Signal Ratio Vs Peak Time at {} and {}'.format(flux0, flux1), x=x, y=y)
         format_histo(g, x_tit='Signal Peak Time [ns]', y_tit='Signal Ratio', y_off=1.7, y_range=array([-ym, ym]) + 1)
@@ -320,8 +320,26 @@ class PadCollection(AnalysisCollection):
         format_histo(g, y_tit='Peak Time [ns]', y_off=1.9, **self.get_x_args(vs_time))
         self.save_histo(g, 'PeakTimes', lm=.14, logx=not vs_time, show=show)
 
+    def fit_average_waveforms(self, fit_range=None, show=True):
+        """ fits the averaged waveforms of all runs with an ErfLand at once and shows the fitted peak positions.
+            :returns the parameters, their errors, chi2 and ndf of all runs as arrays """
+        from fit import ErfLand
+        histos = self.generate_plots('averaged waveforms', lambda ana: ana.Waveform.draw_all_average(show=False))
+        fit_range = self.FirstAnalysis.Waveform.get_average_fit_range() if fit_range is None else fit_range
+        pars, errors, chi2, ndf = ErfLand(fit_range=fit_range).fit_batch(histos)
+        g = self.make_tgrapherrors('gawp', 'Waveform Peak Positions', x=self.get_x_var(), y=pars[:, 1], ey=errors[:, 1])
+        format_histo(g, y_tit='Peak Position [ns]', y_off=1.9, **self.get_x_args(False))
+        self.save_histo(g, 'WaveformPeakPositions', lm=.14, logx=True, show=show)
+        return pars, errors, chi2, ndf
+
     def show_peak_distribution(self, show=True):
         """ Shows the positions of the peaks of the 2D map. """
+        for run in [run for run, ana in self.Analyses.iteritems() if not ana.IsAligned]:
+            print 'Run {run} is not aligned...'.format(run=run)
+        aligned = [ana for ana in self.Analyses.itervalues() if ana.IsAligned]
+        if not aligned:
+            warning('There are no aligned runs to find the peaks in')
+            return
         gROOT.ProcessLine('gErrorIgnoreLevel = kError;')
         gROOT.SetBatch(1)
         # create an overall VotingHistogram
@@ -329,11 +347,13 @@ class PadCollection(AnalysisCollection):
         ana.draw_mean_signal_distribution(show=False)
         extrema = Extrema2D(ana.SignalMapHisto, ana.MeanSignalHisto)
         h = extrema.create_voting_histo()
-        for run, ana in self.Analyses.iteritems():
-            if ana.IsAligned:
-                ana.find_2d_extrema(histo=h, show=False)
-            else:
-                print 'Run {run} is not aligned...'.format(run=run)
+        # scan the signal maps of all runs at once
+        extremas = []
+        for ana in aligned:
+            extremas.append(Extrema2D(ana.draw_signal_map(show=False), ana.draw_sig_map_disto(show=False)))
+            ana.save_plots('Extrema2D')
+        votes = get_square_votes(array([e.Values for e in extremas]), [e.Thresholds['max'][0] for e in extremas], [e.Thresholds['min'][-1] for e in extremas])
+        extrema.add_votes({name: v.sum(0) for name, v in votes.iteritems()}, h)
         c = TCanvas('c', 'Voting Histos', 1600, 800)
         c.Divide(2, 1)
         # new_pal = ar.array('i', [kYellow, kYellow, kOrange, kOrange - 3, kOrange + 7, kRed])
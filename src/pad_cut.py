@@ -125,11 +125,11 @@ class PadCut(Cut):
     # region COMPUTE
     def find_n_pulser(self, cut, redo=False):
         pickle_path = self.Analysis.make_pickle_path('Cuts', 'NPulser', self.RunNumber)
-        return int(do_pickle(pickle_path, self.Analysis.Tree.GetEntries, None, redo, str(cut)))
+        return int(self.do_pickle(pickle_path, self.Analysis.Tree.GetEntries, None, redo, str(cut)))
 
     def find_n_saturated(self, cut, redo=False):
         pickle_path = self.Analysis.make_pickle_path('Cuts', 'NSaturated', self.RunNumber)
-        return int(do_pickle(pickle_path, self.Analysis.Tree.GetEntries, None, redo, str(cut)))
+        return int(self.do_pickle(pickle_path, self.Analysis.Tree.GetEntries, None, redo, str(cut)))
 
     def find_fid_cut(self, thresh=.93, show=True):
         h = self.Analysis.draw_signal_map(show=False)
@@ -247,7 +247,7 @@ class PadCut(Cut):
             self.Analysis.add_to_info(t)
             return max_err
 
-        return do_pickle(pickle_path, f, redo=show or show_all)
+        return self.do_pickle(pickle_path, f, redo=show or show_all)
 
     def __calc_pedestal_range(self, sigma_range):
         picklepath = self.Analysis.make_pickle_path('Pedestal', 'Cut', self.RunNumber, self.Channel)
@@ -260,7 +260,7 @@ class PadCut(Cut):
             self.Analysis.add_to_info(t)
             return fit_pars
 
-        fit = do_pickle(picklepath, func)
+        fit = self.do_pickle(picklepath, func)
         sigma = fit.Parameter(2)
         mean_ = fit.Parameter(1)
         self.PedestalFit = fit
@@ -285,7 +285,7 @@ class PadCut(Cut):
             return fit.GetX(.1, 0, peaks[-1])
 
         threshold = func() if show else None
-        return do_pickle(pickle_path, func, threshold)
+        return self.do_pickle(pickle_path, func, threshold)
 
     def calc_timing_range(self, redo=False):
         def f():
@@ -302,6 +302,6 @@ class PadCut(Cut):
             self.Analysis.info('Peak Timing: Mean: {0}, sigma: {1}'.format(fit.GetParameter(1), fit.GetParameter(2)))
             return t_correction, fit
 
-        return do_pickle(self.Analysis.make_simple_pickle_path('TimingRange', sub_dir='Cuts'), f, redo=redo)
+        return self.do_pickle(self.Analysis.make_simple_pickle_path('TimingRange', sub_dir='Cuts'), f, redo=redo)
     # endregion COMPUTE
     # ----------------------------------------
@@ -9,7 +9,7 @@ from StringIO import StringIO
 from collections import OrderedDict
 from json import dumps, loads
 
-from numpy import array, concatenate, cumsum
+from numpy import array, concatenate, cumsum, arange
 
 from run import Run, join
 from utils import has_bit, critical, warning, ensure_dir, init_argparser
@@ -44,6 +44,7 @@ class PadRun(Run):
             self.TCal = self.load_tcal()
             self.TCalSum = cumsum(concatenate([[0], self.TCal, self.TCal])).astype('f4')
             self.NSamples = len(self.TCal)
+            self.TCalTable = None
             self.Channels = self.load_channels()
 
     def load_rootfile_dirname(self):
@@ -112,6 +113,12 @@ class PadRun(Run):
             tcal.append(2 * tcal[-1] - tcal[-2])
         return array(tcal[:1024], dtype='f4')
 
+    def get_tcal_table(self):
+        """ :returns the calibrated time axes for all trigger cells as [trigger cell x sample] table (built once per run). """
+        if self.TCalTable is None:
+            self.TCalTable = self.TCalSum[arange(self.NSamples).reshape(-1, 1) + arange(self.NSamples)] - self.TCalSum[:self.NSamples].reshape(-1, 1)
+        return self.TCalTable
+
     def get_calibrated_time(self, trigger_cell, ibin):
         v = self.TCal[int(trigger_cell)]
         for i in xrange(ibin):
@@ -5,11 +5,11 @@
 # --------------------------------------------------------
 
 from analysis import *
-from ROOT import TH1F, TCut, TProfile, THStack, TH2F, TMath
-from ROOT.gRandom import Landau
+from ROOT import TH1F, TCut, TProfile, THStack, TH2F
 from scipy.signal import find_peaks, savgol_filter
-from numpy import polyfit, pi, RankWarning, vectorize, size, split, ones, ceil, repeat, linspace, argmax, insert
-from numpy.random import normal
+from numpy import polyfit, pi, RankWarning, split, ones, ceil, repeat, linspace, argmax, insert, bincount, array_equal, allclose, clip
+from numpy.random import normal, RandomState
+from fit import landau, random_landau
 from warnings import simplefilter
 from InfoLegend import InfoLegend
 
@@ -56,7 +56,7 @@ class PeakAnalysis(Analysis):
         return self.Ana.Waveform.get_binning(bin_size)
 
     def get_from_tree(self):
-        return do_hdf5(self.make_hdf5_path('Peaks', 'V1', self.Ana.RunNumber, self.Channel), self.Run.get_root_vec, var=self.Ana.PeakName, cut=self.Cut, dtype='f2')
+        return self.do_hdf5(self.make_hdf5_path('Peaks', 'V1', self.Ana.RunNumber, self.Channel), self.Run.get_root_vec, var=self.Ana.PeakName, cut=self.Cut, dtype='f2')
 
     def get_signal_values(self, f, ind=None, default=-1, *args, **kwargs):
         signal_ind, noind = self.get_signal_indices(), self.get_no_signal_indices()
@@ -87,7 +87,7 @@ class PeakAnalysis(Analysis):
             nvalues = array([where((m - w < lst) & (lst < m + w))[0].size for lst in values])
             indices = where(nvalues == 0)[0]
             return indices - arange(indices.size)  # we need the positions where these indices are missing
-        return do_hdf5(self.make_simple_hdf5_path('NoSig'), f, redo=redo)
+        return self.do_hdf5(self.make_simple_hdf5_path('NoSig'), f, redo=redo)
 
     def get(self, flat=False, fit=False):
         times, heights, n_peaks = self.find_all(fit=fit)
@@ -131,7 +131,7 @@ class PeakAnalysis(Analysis):
             m = mean(values)
             return ufloat(m, sqrt(m / values.size))
         suffix = '{}_{}'.format(start_bunch, end_bunch) if start_bunch is not None else ''
-        return do_pickle(self.make_simple_pickle_path('NAdd', '{}{}'.format(suffix, '' if thresh is None else '{:1.0f}'.format(thresh))), f)
+        return self.do_pickle(self.make_simple_pickle_path('NAdd', '{}{}'.format(suffix, '' if thresh is None else '{:1.0f}'.format(thresh))), f)
 
     def get_corrected_times(self, times, n_peaks=None, events=None):
         signal_peak_times = repeat(self.get_from_tree(), n_peaks) if events is None else array(self.get_from_tree())[events]
@@ -153,7 +153,7 @@ class PeakAnalysis(Analysis):
             lambda_ = ufloat(mean(n), sqrt(mean(n) / n.size)) if l is None else l
             flux = lambda_ / (self.Ana.BunchSpacing * self.NBunches * self.get_area()) * 1e6
             return flux
-        value = do_pickle(self.make_simple_pickle_path('Flux'), f, redo=redo)
+        value = self.do_pickle(self.make_simple_pickle_path('Flux'), f, redo=redo)
         self.info('Estimated Flux by number of peaks: {}'.format(make_flux_string(value)), prnt=prnt)
         return value
 
@@ -189,7 +189,7 @@ class PeakAnalysis(Analysis):
             max_bin = h.GetMaximumBin()
             fit = h.Fit('landau', 'qs0', '', h.GetBinCenter(max_bin - 10), h.GetBinCenter(max_bin + 30))
             return fit.Parameter(1), fit.Parameter(2)
-        return do_pickle(self.make_simple_pickle_path('H'), f, redo=redo)
+        return self.do_pickle(self.make_simple_pickle_path('H'), f, redo=redo)
 
     def get_signal_ph(self):
         values = self.get_signal_heights()
@@ -213,7 +213,7 @@ class PeakAnalysis(Analysis):
                 hs[i].FillN(v.size, array(v, 'd'), ones(v.size))
             return hs[0] if split_ == 1 else hs
         suffix = '{}{}{}'.format(int(corr), '' if split_ == 1 else '_{}'.format(split_), '' if thresh is None else '_{:1.0f}'.format(thresh))
-        h = do_pickle(self.make_simple_pickle_path('Histo', suffix), f, redo=redo)
+        h = self.do_pickle(self.make_simple_pickle_path('Histo', suffix), f, redo=redo)
         if scale:
             h.Sumw2()
             h.Scale(1e5 / self.Ana.Waveform.get_from_tree().shape[0])
@@ -367,27 +367,45 @@ class PeakAnalysis(Analysis):
 
     def find_all(self, redo=False, thresh=None, fit=False):
         suf = '' if thresh is None and not fit else '{:1.0f}_{}'.format(thresh, int(fit)) if thresh is not None else int(fit)
-        hdf5_path = self.make_simple_hdf5_path(suf=suf, dut=self.Channel)
+        hdf5_path = self.make_cut_hdf5_path(self.Cut, suf=suf, dut=self.Channel)
         if file_exists(hdf5_path) and not redo:
-            f = h5py.File(hdf5_path, 'r')
-            return f['times'], f['heights'], f['n_peaks']
-        if redo and file_exists(hdf5_path):
-            remove_file(hdf5_path)
-        times, heights = [], []
+            return self.HDF5.load(hdf5_path, 'times', 'heights', 'n_peaks')
         simplefilter('ignore', RankWarning)
-        wave_forms, trigger_cells = self.WF.get_all(), self.WF.get_trigger_cells()
+        times, heights, n_peaks, peaks = self.find_batch(self.WF.get_all(), self.WF.get_trigger_cells(), thresh)
+        if fit:
+            times = concatenate([self.fit_landau(i, j) for i, j in enumerate(split(peaks, cumsum(n_peaks)[:-1]))])
+        self.HDF5.save(hdf5_path, times=times.astype('f2'), heights=heights.astype('f2'), n_peaks=n_peaks)
+        return self.HDF5.load(hdf5_path, 'times', 'heights', 'n_peaks')
+
+    def find_batch(self, values, trigger_cells, thresh=None, n_max=10000):
+        """ finds the peaks in all rows of the waveform matrix [values] in blocks of [n_max] events.
+            :returns flat arrays of the peak times, heights, number of peaks per event and peak indices """
+        trigger_cells = array(trigger_cells, dtype='i4')
+        ev, peaks, heights = [], [], []
         self.Ana.PBar.start(trigger_cells.size)
-        for i in xrange(trigger_cells.size):
-            j, t, p = self.find(wave_forms[i], trigger_cells[i], thresh=thresh)
-            times.append(self.fit_landau(i, j) if fit else t)
-            heights.append(p)
-            self.Ana.PBar.update()
-        find_n_peaks = vectorize(size, otypes=['u2'])
-        f = h5py.File(hdf5_path, 'w')
-        f.create_dataset('times', data=concatenate(times).astype('f2'))
-        f.create_dataset('heights', data=concatenate(heights).astype('f2'))
-        f.create_dataset('n_peaks', data=find_n_peaks(heights))
-        return f['times'], f['heights'], f['n_peaks']
+        for i in xrange(0, trigger_cells.size, n_max):
+            iev, ip, ih = find_peaks_2d(values[i:i + n_max], height=self.Threshold if thresh is None else thresh, distance=10, prominence=20)
+            ev.append(iev + i)
+            peaks.append(ip)
+            heights.append(ih)
+            self.Ana.PBar.update(min(i + n_max, trigger_cells.size) - 1)
+        ev, peaks, heights = concatenate(ev), concatenate(peaks), concatenate(heights)
+        tc = trigger_cells[ev]
+        times = self.Run.TCalSum[tc + peaks] - self.Run.TCalSum[tc]
+        return times, heights, bincount(ev, minlength=trigger_cells.size).astype('u2'), peaks
+
+    def check_find_all(self, n=1000, thresh=None):
+        """ compares the batch peak finding with the single event peak finding for the first [n] events. """
+        values, trigger_cells = array(self.WF.get_all()[:n]), self.WF.get_trigger_cells()[:n]
+        times, heights, n_peaks, peaks = self.find_batch(values, trigger_cells, thresh)
+        single = [self.find(values[i], trigger_cells[i], thresh) for i in xrange(trigger_cells.size)]
+        n_single = array([s[0].size for s in single], dtype='u2')
+        passed = array_equal(n_single, n_peaks) and array_equal(concatenate([s[0] for s in single]), peaks)
+        passed = passed and allclose(concatenate([s[1] for s in single]), times) and allclose(concatenate([s[2] for s in single]), heights)
+        self.info('batch peak finding {} the single event results for {} events'.format('reproduces' if passed else 'DOES NOT reproduce', trigger_cells.size))
+        if not passed:
+            warning('{} events with different number of peaks'.format(count_nonzero(n_single != n_peaks)))
+        return passed
 
     def find(self, values, trigger_cell, thresh=None):
         peaks = find_peaks(values, height=self.Threshold if thresh is None else thresh, distance=10, prominence=20)
@@ -420,16 +438,37 @@ class PeakAnalysis(Analysis):
         return cfds
 
     def find_all_cfd(self, thresh=.5, redo=False):
-        def f():
+        return self.find_all_cfds([thresh], redo)[0]
+
+    def find_all_cfds(self, thresholds=(.2, .5, .8), redo=False):
+        """ calculates the constant fraction times of all peaks for several [thresholds] in a single pass and saves them for each threshold. """
+        paths = [self.make_cut_hdf5_path(self.Cut, 'CFD', '{:.0f}'.format(thresh * 100)) for thresh in thresholds]
+        todo = [i for i, path in enumerate(paths) if redo or not file_exists(path)]
+        if todo:
             self.info('calculating constant fraction discrimination times ...')
-            values, times, peaks, peak_times = self.WF.get_all(), self.WF.get_all_times(), self.get_heights(), self.get()
-            self.PBar.start(values.shape[0])
-            cfds = []
-            for i in range(values.shape[0]):
-                cfds.append(self.find_cfd(values[i], times[i], peaks[i], peak_times[i], thresh=thresh))
-                self.PBar.update()
-            return concatenate(cfds).astype('f2')
-        return do_hdf5(self.make_simple_hdf5_path('CFD', '{:.0f}'.format(thresh * 100)), f, redo=redo)
+            for i, values in zip(todo, self.calc_cfds(array(thresholds, 'd')[todo])):
+                self.HDF5.save(paths[i], data=values.astype('f2'))
+        return [self.HDF5.load(path) for path in paths]
+
+    def calc_cfds(self, thresholds):
+        """ :returns constant fraction times [n_thresholds x n_peaks] of all peaks, vectorised version of find_cfd. """
+        cfds = []
+        for x, y, ev, i, heights in self.get_peak_data():
+            cfds.append(find_left_crossings(x, y, ev, i, heights.astype('d').reshape(-1, 1) * thresholds))
+        return concatenate(cfds).T
+
+    def get_peak_data(self, n_max=5000):
+        """ iterates over blocks of [n_max] events.
+            :returns time axes, waveforms, the event in the block, the sample index and the height of all peaks in the block """
+        values, times = self.WF.get_all(), self.WF.get_all_times()
+        peak_times, heights, n_peaks = [array(v) for v in self.find_all()]
+        events, first = repeat(arange(n_peaks.size), n_peaks), concatenate([[0], cumsum(n_peaks, dtype='i8')])
+        self.PBar.start(n_peaks.size)
+        for i in xrange(0, n_peaks.size, n_max):
+            peaks = slice(first[i], first[min(i + n_max, n_peaks.size)])
+            x, ev = times[i:i + n_max], events[peaks] - i
+            yield x, array(values[i:i + n_max]), ev, (x[ev] < peak_times[peaks].reshape(-1, 1)).sum(axis=1), heights[peaks]
+            self.PBar.update(min(i + n_max, n_peaks.size) - 1)
 
     def draw_cfd(self, thresh=.5, bin_size=.2, show=True, draw_ph=False, x=None, y=None, y_range=None):
         self.format_statbox(entries=1, x=.86 if draw_ph else .95)
@@ -453,33 +492,42 @@ class PeakAnalysis(Analysis):
     # ----------------------------------------
     # region TOT
     def calc_all_tot(self, thresh=None, fixed=True, redo=False):
-        def f():
+        return self.calc_all_tots([thresh], fixed, redo)[0]
+
+    def calc_all_tots(self, thresholds=(None,), fixed=True, redo=False):
+        """ calculates the time over threshold of all peaks for several [thresholds] in a single pass and saves them for each threshold. """
+        paths = [self.make_cut_hdf5_path(self.Cut, 'TOT', '' if thresh is None else '{:.0f}'.format(thresh if fixed else thresh * 100)) for thresh in thresholds]
+        todo = [i for i, path in enumerate(paths) if redo or not file_exists(path)]
+        if todo:
             self.info('calculating time over threshold ...')
-            values, times, peaks, peak_times = self.WF.get_all(), self.WF.get_all_times(), self.get_heights(), self.get()
-            self.PBar.start(values.shape[0])
-            tots = []
-            for i in range(values.shape[0]):
-                tots.append(self.calc_tot(values[i], times[i], peaks[i], peak_times[i], thresh=thresh, fixed=fixed))
-                self.PBar.update()
-            return concatenate(tots).astype('f2')
-        suffix = '' if thresh is None else '{:.0f}'.format(thresh if fixed else thresh * 100)
-        return do_hdf5(self.make_simple_hdf5_path('TOT', suffix), f, redo=redo)
+            for i, values in zip(todo, self.calc_tots([thresholds[i] for i in todo], fixed)):
+                self.HDF5.save(paths[i], data=values.astype('f2'))
+        return [self.HDF5.load(path) for path in paths]
+
+    def calc_tots(self, thresholds, fixed=True):
+        """ :returns times over threshold [n_thresholds x n_peaks] of all peaks, vectorised version of calc_tot. """
+        thresholds, tots = array([self.Threshold * .75 if thresh is None else thresh for thresh in thresholds], 'd'), []
+        for x, y, ev, i, heights in self.get_peak_data():
+            t = thresholds * (ones((heights.size, 1)) if fixed else heights.astype('d').reshape(-1, 1))
+            v = find_right_crossings(x, y, ev, i, t) - find_left_crossings(x, y, ev, i, t)
+            tots.append(where(v < 1000, v, -1))
+        return concatenate(tots).T
 
     def calc_tot(self, values=None, times=None, peaks=None, peak_times=None, ind=None, thresh=None, fixed=True, show=False):
         x, y, p, t = (times, values, peaks, peak_times) if ind is None else self.get_event(ind)
         tot = []
         for j, (ip, it) in enumerate(zip(p, t)):
-            thresh = ip * thresh if not fixed else self.Threshold * .75 if thresh is None else thresh
+            th = ip * thresh if not fixed else self.Threshold * .75 if thresh is None else thresh
             i = where(x == it)[0][0]
             vl, vr = y[max(0, i - 20):i], y[i:i + 40]  # get left and right side of the peak
-            l, r = argmax(vl > thresh), argmax(vr < thresh)  # find indices crossing the threshold
-            tl = interpolate_x(x[i + l - 21], x[i + l - 20], vl[l - 1], vl[l], thresh)
-            tr = interpolate_x(x[i + r - 1], x[i + r], vr[r - 1], vr[r], thresh)
+            l, r = argmax(vl > th), argmax(vr < th)  # find indices crossing the threshold
+            tl = interpolate_x(x[i + l - 21], x[i + l - 20], vl[l - 1], vl[l], th)
+            tr = interpolate_x(x[i + r - 1], x[i + r], vr[r - 1], vr[r], th)
             v = tr - tl
             tot.append(v if v < 1000 else -1)
             if show:
                 self.WF.draw_single(ind=ind) if not j else do_nothing()
-                self.draw_horizontal_line(thresh, 0, 2000, name='thresh', color=4)
+                self.draw_horizontal_line(th, 0, 2000, name='thresh', color=4)
                 self.draw_vertical_line(tl, -1000, 1000, name='l{}'.format(j), color=2)
                 self.draw_vertical_line(tr, -1000, 1000, name='r{}'.format(j), color=2)
         return tot
@@ -508,28 +556,26 @@ class PeakAnalysis(Analysis):
             g = self.make_tgrapherrors('gsm', 'Model Scale', x=heights, y=c)
             fit = g.Fit('pol1', 'qs0')
             return fit.Parameter(1)
-        return do_pickle(self.make_simple_pickle_path('ModelScale'), f, redo=redo)
-
-    @staticmethod
-    def _signal(x, height, peak_time, rise_time, rise_fac):
-        x0, y0 = peak_time, height
-        x1, x2 = x0 - rise_time, x0 + rise_fac * rise_time
-        p1 = get_p1(x0, x1 if x < x0 else x2, y0, 0)
-        return p1 * x + get_p0(x0, y0, p1) if x1 <= x <= x2 else 0
+        return self.do_pickle(self.make_simple_pickle_path('ModelScale'), f, redo=redo)
+
+    def get_signal_shape(self, model=1, scale=None, landau_width=3, rise_time=None, rise_fac=3):
+        """ :returns the sample times relative to the peak time and the model signal for a height of one,
+            model 1: Landau with [scale] and [landau_width], model 0: triangle with [rise_time] and a fall time of [rise_fac] * [rise_time] """
+        if model:
+            x = arange(*increased_range([-2 * landau_width, 4 * landau_width], .5, .5) + [self.BinWidth])
+            return x, (self.find_scale() if scale is None else scale) * landau(x, 0, landau_width)
+        rise_time = self.WF.get_average_rise_time() if rise_time is None else rise_time
+        x = arange(*increased_range([-rise_time, rise_time * rise_fac], .5, .5) + [self.BinWidth])
+        return x, clip(where(x < 0, 1 + x / rise_time, 1 - x / (rise_fac * rise_time)), 0, None)
 
     def signal1(self, height, peak_time, scale, landau_width=3, noise=4):
-        x0, x1 = increased_range([peak_time - 2 * landau_width, peak_time + 4 * landau_width], .5, .5)
-        x = arange(x0, x1, self.BinWidth, dtype='d')
-        y = array([height * scale * TMath.Landau(ix, peak_time, landau_width) for ix in x])
-        return x, y + normal(scale=noise, size=x.size)
+        x, y = self.get_signal_shape(1, scale, landau_width)
+        return x + peak_time, height * y + normal(scale=noise, size=x.size)
 
     def signal0(self, height, peak_time, rise_time=None, rise_fac=3, noise=None):
         noise = self.Ana.Pedestal.get_raw_noise().n if noise is None else noise
-        rise_time = self.WF.get_average_rise_time() if rise_time is None else rise_time
-        x0, x1 = increased_range([peak_time - rise_time, peak_time + rise_time * rise_fac], .5, .5)
-        x = arange(x0, x1, self.BinWidth, dtype='d')
-        y = array([self._signal(ix, height, peak_time, rise_time, rise_fac) for ix in x])
-        return x, y + normal(scale=noise, size=x.size)
+        x, y = self.get_signal_shape(0, rise_time=rise_time, rise_fac=rise_fac)
+        return x + peak_time, height * y + normal(scale=noise, size=x.size)
 
     def get_signal(self, n, *args, **kwargs):
         return self.signal0(*args, **kwargs) if not n else self.signal1(*args, **kwargs)
@@ -546,54 +592,54 @@ class PeakAnalysis(Analysis):
         peak_time = self.get_mean_sigma()[0] if peak_time is None else peak_time
         self.draw_model_signal(1, height, peak_time, scale, landau_width, self.Ana.Pedestal.get_raw_noise().n)
 
-    def draw_raw_model(self, n=1e6, model=1, show=True, *args, **kwargs):
-        times = []
-        self.PBar.start(n)
-        for _ in range(int(n)):
-            x, y = self.get_signal(model, *args, **kwargs)
-            times.append(x[argmax(y)])
-            self.PBar.update()
-        times = array(times)
+    def simulate(self, peak_times, heights, model=1, noise=None, cfd=False, random=None, n_max=10000, **kwargs):
+        """ simulates the model waveforms with the [peak_times] and [heights] with gaussian [noise] in blocks of [n_max] waveforms.
+            :returns the times of the maxima (constant fraction times at half maximum for [cfd]) and the heights of the maxima """
+        noise = self.Ana.Pedestal.get_raw_noise().n if noise is None else noise
+        random = RandomState() if random is None else random
+        x, shape = self.get_signal_shape(model, **kwargs)
+        times, values = [], []
+        self.PBar.start(peak_times.size)
+        for i in xrange(0, peak_times.size, n_max):
+            t, h = peak_times[i:i + n_max], heights[i:i + n_max]
+            y = h.reshape(-1, 1) * shape + random.normal(scale=noise, size=(t.size, x.size))
+            ev, j = arange(t.size), argmax(y, axis=1)
+            values.append(y[ev, j])
+            times.append(find_left_crossings(t.reshape(-1, 1) + x, y, ev, j, values[-1].reshape(-1, 1) * .5)[:, 0] if cfd else t + x[j])
+            self.PBar.update(min(i + n_max, peak_times.size) - 1)
+        return concatenate(times), concatenate(values)
+
+    def draw_raw_model(self, n=1e6, model=1, height=None, peak_time=None, noise=None, seed=None, show=True, **kwargs):
+        """ shows the peak times of [n] model waveforms with fixed [height] and [peak_time], only the noise changes. """
+        height = self.get_mpv_sigma_heights()[0] if height is None else height
+        peak_time = self.get_mean_sigma()[0] if peak_time is None else peak_time
+        times = self.simulate(full(int(n), peak_time, 'd'), full(int(n), height, 'd'), model, noise, random=RandomState(seed), **kwargs)[0]
         h = TH1F('hrm', 'Raw Model Peak Times', *self.Ana.get_t_bins())
         h.FillN(times.size, times, ones(times.size))
         format_histo(h, x_tit='Signal Peak Time [ns]', y_tit='Number of Entries', y_off=1.8, fill_color=self.FillColor)
         self.format_statbox(entries=1)
         self.draw_histo(h, lm=.13, show=show)
 
-    def model1(self, n=1e6, redo=False, scale=None, landau_width=3, cfd=False):
+    def model1(self, n=1e6, redo=False, scale=None, landau_width=3, cfd=False, seed=None):
         scale = self.find_scale() if scale is None else scale
-        return self.model(n, model=1, cfd=cfd, redo=redo, scale=scale, landau_width=landau_width)
+        return self.model(n, model=1, cfd=cfd, redo=redo, seed=seed, scale=scale, landau_width=landau_width)
 
-    def model0(self, n=1e6, redo=False, rise_time=None, rise_fac=3, sigma=None):
-        return self.model(n, 0, redo, )
+    def model0(self, n=1e6, redo=False, rise_time=None, rise_fac=3, sigma=None, seed=None):
+        return self.model(n, 0, noise=sigma, redo=redo, seed=seed, rise_time=rise_time, rise_fac=rise_fac)
 
-    def model(self, n=1e6, model=1, noise=None, cfd=False, redo=False, *args, **kwargs):
+    def model(self, n=1e6, model=1, noise=None, cfd=False, redo=False, seed=None, **kwargs):
+        """ simulates [n] waveforms with the measured distributions of the peak times and the heights (Landau), the random numbers are reproducible with [seed]. """
         n = int(n)
-        hdf5_path = self.make_simple_hdf5_path('M', '{}_{}_{}'.format(n, model, int(cfd)))
+        hdf5_path = self.make_cut_hdf5_path(self.Cut, 'M', '{}_{}_{}{}'.format(n, model, int(cfd), '' if seed is None else '_{}'.format(seed)))
         if file_exists(hdf5_path) and not redo:
-            f = h5py.File(hdf5_path, 'r')
-            return f['times'], f['heights']
-        if redo and file_exists(hdf5_path):
-            remove_file(hdf5_path)
-        Landau(5, 2)  # first value is always crap
-        noise = self.Ana.Pedestal.get_raw_noise().n if noise is None else noise
-        m, s = self.get_mean_sigma()
-        mpv, sl = self.get_mpv_sigma_heights()
-        t, v = [], []
-        self.PBar.start(n)
-        peak_times = normal(scale=s, size=n) + m
-        for i in range(int(n)):
-            x, y = self.get_signal(model, min(500, Landau(mpv, sl)), peak_times[i], noise=noise, *args, **kwargs)
-            peak_time = x[argmax(y)]
-            peak_height = max(y)
-            t.append(peak_time if not cfd else self.find_cfd(y, x, [peak_height], [peak_time]))
-            v.append(peak_height)
-            self.PBar.update()
-        t, v = array(t), array(v)
-        f = h5py.File(hdf5_path, 'w')
-        f.create_dataset('times', data=array(t).astype('f2'))
-        f.create_dataset('heights', data=array(v).astype('f4'))
-        return f['times'], f['heights']
+            return self.HDF5.load(hdf5_path, 'times', 'heights')
+        random = RandomState(seed)
+        (m, s), (mpv, sl) = self.get_mean_sigma(), self.get_mpv_sigma_heights()
+        peak_times = random.normal(m, s, n)
+        heights = minimum(500, random_landau(mpv, sl, n, random))
+        t, v = self.simulate(peak_times, heights, model, noise, cfd, random, **kwargs)
+        self.HDF5.save(hdf5_path, times=t.astype('f2'), heights=v.astype('f4'))
+        return self.HDF5.load(hdf5_path, 'times', 'heights')
 
     def draw_model(self, n=1e6, model=1, cfd=False, draw_ph=False, show=True):
         x, y = self.model1(n, cfd=cfd) if model == 1 else self.model0(n)
@@ -4,8 +4,10 @@
 # created on February 13th 2017 by M. Reichmann (remichae@phys.ethz.ch)
 # --------------------------------------------------------
 
+from itertools import takewhile
+
 from ROOT import TH1F
-from numpy import linspace, split, cumsum
+from numpy import linspace, in1d
 
 from Correlation import Correlation
 from event_alignment import EventAligment
@@ -33,15 +35,19 @@ class PixAlignment(EventAligment):
     def update_variables(self):
         """Find all events with have both hits in the two checked planes"""
         t = self.Run.info('Loading pixel information from tree ... ', next_line=False)
-        for i, ev in enumerate(self.Variables):
-            plane, row = ev[0], ev[2]
-            if count_nonzero(plane == self.TelPlane) == 1:
-                self.TelRow[i] = row[where(plane == self.TelPlane)][0]
-            if count_nonzero(plane == self.DUTPlane) == 1:
-                self.DUTRow[i] = row[where(plane == self.DUTPlane)][0]
+        for plane_nr, rows in [(self.TelPlane, self.TelRow), (self.DUTPlane, self.DUTRow)]:
+            rows.update(zip(*self.get_single_rows(self.Variables[0], self.Variables[2], self.NHits, plane_nr)))
         self.BinSize = self.find_bucket_size(show=False)
         self.Run.add_to_info(t)
 
+    @staticmethod
+    def get_single_rows(planes, rows, n_hits, plane_nr):
+        """ :returns the events with exactly one hit in the plane [plane_nr] and the rows of these hits """
+        events = repeat(arange(n_hits.size), n_hits)
+        selected = planes == plane_nr
+        single = selected & (bincount(events[selected], minlength=n_hits.size)[events] == 1)
+        return events[single], rows[single]
+
     def check_alignment_fast(self):
         """ only check alignment for subsets of 10k events """
         t = self.Run.info('Fast check for event alignment ... ', next_line=False)
@@ -51,9 +57,10 @@ class PixAlignment(EventAligment):
             n = self.InTree.Draw('plane:row', '', 'goff', 10000, start_event)
             planes, rows = get_root_vecs(self.InTree, n, 2, dtype='u1')
             n_hits = self.load_n_hits(10000, start_event)
-            for i, (plane, row) in enumerate(split(array([planes, rows]), cumsum(n_hits), axis=1)):
-                if count_nonzero(plane == self.TelPlane) == 1 and count_nonzero(plane == self.DUTPlane) == 1:  # if both planes have exactly one hit
-                    correlation.fill(i, tel_row=row[where(plane == self.TelPlane)][0], dia_row=row[where(plane == self.DUTPlane)][0])
+            tel_events, tel_rows = self.get_single_rows(planes, rows, n_hits, self.TelPlane)
+            dut_events, dut_rows = self.get_single_rows(planes, rows, n_hits, self.DUTPlane)
+            # only the events where both planes have exactly one hit
+            correlation.fill_n(tel_events[in1d(tel_events, dut_events)], tel_row=tel_rows[in1d(tel_events, dut_events)], dia_row=dut_rows[in1d(dut_events, tel_events)])
             corrs.append(correlation(debug=False))
         is_aligned = all(corr > self.Threshold for corr in corrs)
         self.Run.add_to_info(t)
@@ -63,8 +70,7 @@ class PixAlignment(EventAligment):
     def check_alignment(self):
         t = self.Run.info('Checking aligment ... ', next_line=False)
         correlation = Correlation(self)
-        for ev, row in self.TelRow.iteritems():
-            correlation.fill(ev)
+        correlation.fill_n(self.TelRow.keys())
         correlations = correlation.get_all_zero()
         h = TH1F('h_ee', 'Event Alignment', int(sqrt(len(correlations))), 0, 1)
         for cor in correlations:
@@ -95,7 +101,7 @@ class PixAlignment(EventAligment):
     def find_lose_corr_event(self, correlation, last_off_event, debug=False):
         # if all correlations are below threshold return the very first event
         if all(corr < self.Threshold for corr in correlation.get_all_zero()):
-            return correlation.Events[0][0]
+            return correlation.get_event_numbers()[0]
         correlations = correlation.get_sliding()
         if debug:
             self.draw_sliding(correlation)
@@ -239,10 +245,7 @@ class PixAlignment(EventAligment):
         """ take first 10000 events and find a suitable bucket size to build the correlation """
         correlation = Correlation(self, bucket_size=10)
         max_ev = 10000
-        for ev in self.TelRow.iterkeys():
-            if ev > max_ev:
-                break
-            correlation.fill(ev)
+        correlation.fill_n(list(takewhile(lambda ev: ev <= max_ev, self.TelRow.iterkeys())))
         sigmas = OrderedDict()
         size = 50
         while True:
@@ -260,22 +263,15 @@ class PixAlignment(EventAligment):
                 size = next(n for sig, n in sigmas.iteritems() if sig < .09)
                 break
             except StopIteration:
-                correlation.delete_events(len(correlation.TelRow[0]) / 2, max_ev)
+                correlation.delete_events(correlation.get_events() / 2, max_ev)
         return round_up_to(size, 5)
 
-    def fill_branches(self, offset):
-        if not offset:
-            event = self.Variables[self.AtEntry]
-        else:
-            tel_offset = abs(offset) if offset < 0 else 0
-            dut_offset = offset if offset > 0 else 0
-            # select the according events
-            tel_event, dut_event = self.Variables[self.AtEntry + tel_offset], self.Variables[self.AtEntry + dut_offset]
-            # merge the right parts of the events
-            event = concatenate((tel_event[:, tel_event[0] < self.NDutPlanes], dut_event[:, dut_event[0] >= self.NDutPlanes]), axis=1)
-        for i, name in enumerate(self.Branches.iterkeys()):
-            for value in event[i]:
-                self.Branches[name].push_back(value)
+    def get_hit_sources(self, events, offsets):
+        """ shift the telescope planes for negative and the DUT planes for positive offsets """
+        shifted = offsets != 0
+        return [(where(shifted, -1, events), None),
+                (where(shifted, events + where(offsets < 0, -offsets, 0), -1), lambda plane: plane < self.NDutPlanes),
+                (where(shifted, events + where(offsets > 0, offsets, 0), -1), lambda plane: plane >= self.NDutPlanes)]
 
 
 if __name__ == '__main__':
@@ -9,8 +9,9 @@ from __future__ import print_function
 from collections import Counter
 
 from ROOT import TFormula, THStack, TProfile2D, TPie, gRandom, TH3F, TMultiGraph
-from numpy import corrcoef, ceil
+from numpy import corrcoef, ceil, isfinite, meshgrid
 
+from calibration import Calibration
 from dut_analysis import *
 from pix_cut import CutPix
 
@@ -31,6 +32,7 @@ class PixAnalysis(DUTAnalysis):
             # Pulse Height Calibrations
             self.Fit = TF1('ErFit', '[3] * (TMath::Erf((x - [0]) / [1]) + [2])', -500, 255 * 7)
             if self.check_calibration_files():
+                self.Calibration = Calibration(self.load_calibration_files(fits=True), self.Bins.NCols, self.Bins.NRows, ensure_dir(join(self.PickleDir, 'Calibration')))
                 self.Parameters = self.load_calibration_fitpars()
                 self.Vcals = self.load_vcals()
                 self.Points = self.load_calibration_points()
@@ -61,22 +63,19 @@ class PixAnalysis(DUTAnalysis):
         return True
 
     def load_calibration_fitpars(self, redo=False):
-        def f():
-            self.check_calibration_files()
-            split_at = arange(self.Bins.NRows, self.Bins.NCols * self.Bins.NRows, self.Bins.NRows)  # split at every new column (after n_rows)
-            return array([split(genfromtxt(filename, skip_header=3, usecols=arange(4)), split_at) for filename in self.load_calibration_files(fits=True)])
-        return do_pickle(self.make_pickle_path('Calibration', 'Pars', run=self.Run.Converter.TelescopeID), f, redo=redo)
+        """ :returns the fit parameters [roc, col, row] of the calibration, they are reloaded if the calibration files change """
+        return array([self.Calibration.get_parameters(roc, redo) for roc in xrange(len(self.Calibration.Files))])
 
     def load_vcals(self, redo=False):
         def func():
             return array([concatenate([genfromtxt(f, 'i2', skip_header=1, max_rows=1)[2:], 7 * genfromtxt(f, 'i2', skip_header=2, max_rows=1)[2:]]) for f in self.load_calibration_files()])
-        return do_pickle(self.make_pickle_path('Calibration', 'Vcal', run=self.Run.Converter.TelescopeID), func, redo=redo)
+        return self.do_pickle(self.make_pickle_path('Calibration', 'Vcal', run=self.Run.Converter.TelescopeID), func, redo=redo)
 
     def load_calibration_points(self, redo=False):
         def func():
             split_at = arange(self.Bins.NRows, self.Bins.NCols * self.Bins.NRows, self.Bins.NRows)
             return [array(split(genfromtxt(f, 'i2', skip_header=4, usecols=arange(self.Vcals[i].size)), split_at)) for i, f in enumerate(self.load_calibration_files())]
-        return do_pickle(self.make_pickle_path('Calibration', 'Points', run=self.Run.Converter.TelescopeID), func, redo=redo)
+        return self.do_pickle(self.make_pickle_path('Calibration', 'Points', run=self.Run.Converter.TelescopeID), func, redo=redo)
     # endregion INIT
     # ----------------------------------------
 
@@ -93,18 +92,14 @@ class PixAnalysis(DUTAnalysis):
             p, fit_pars = self.draw_pulse_height(bin_size=bin_size, cut=self.Cut(cut), show=False)
             return fit_pars
 
-        return make_ufloat(do_pickle(picklepath, f, redo=redo), par=0)
+        return make_ufloat(self.do_pickle(picklepath, f, redo=redo), par=0)
 
     def get_thresholds(self, cols=None, pix=None, vcal=True):
         columns, rows = split(array(self.Cut.CutConfig['local_fiducial']), 2) if self.Cut.CutConfig['local_fiducial'] is not None else [0, self.Bins.NCols - 1], [0, self.Bins.NRows - 1]
         columns = array([cols]).flatten() if cols is not None else columns
         columns, rows = (full(2, pix[0]), full(2, pix[1])) if pix is not None else (columns, rows)
-        dic = {}
-        for col in xrange(columns[0], columns[1] + 1):
-            for row in xrange(rows[0], rows[1] + 1):
-                self.Fit.SetParameters(*self.Parameters[self.Dut][col][row])
-                dic[(col, row)] = self.Fit.GetX(0) * (self.Bins.VcalToEl if not vcal else 1)
-        return dic
+        thresholds = self.Calibration.get_thresholds(self.Dut) * (self.Bins.VcalToEl if not vcal else 1)
+        return {(col, row): thresholds[col, row] for col in xrange(columns[0], columns[1] + 1) for row in xrange(rows[0], rows[1] + 1)}
 
     def get_vcal(self, redo=False):
         h = self.draw_vcal_distribution(show=False, redo=redo)
@@ -170,11 +165,10 @@ class PixAnalysis(DUTAnalysis):
             cut_string = self.Cut(cut) + self.Cut.generate_masks(col=mcol, pixels=mpix, exclude=False)() + TCut('n_hits[{}] == 1'.format(self.Dut))
             n = self.Tree.Draw('col:row:adc', cut_string, 'goff')
             cols, rows, adcs = self.Run.get_root_vecs(n, 3, dtype=int)
-            for i, (col, row, adc) in enumerate(zip(cols, rows, adcs)):
-                self.Fit.SetParameters(*self.Parameters[self.Dut][col][row])
-                h1.Fill(self.Fit.GetX(adc) * (self.Bins.VcalToEl if not vcal else 1))
+            values = self.Calibration.get_vcal(self.Dut, cols, rows, adcs) * (self.Bins.VcalToEl if not vcal else 1)
+            fill_hist(h1, values[isfinite(values)])  # pixels without calibration are nan
             return h1
-        h = do_pickle(self.make_simple_pickle_path(sub_dir='VCAL'), f, redo=redo)
+        h = self.do_pickle(self.make_simple_pickle_path(sub_dir='VCAL'), f, redo=redo)
         if show:
             self.format_statbox(all_stat=True)
             format_histo(h, x_tit='Pulse Height [{u}]'.format(u='vcal' if vcal else 'e'), y_tit='Number of Entries', y_off=1.4, fill_color=self.FillColor)
@@ -192,7 +186,7 @@ class PixAnalysis(DUTAnalysis):
             self.Tree.Draw('cluster_charge[{d}]{v}>>h_phd'.format(d=self.Dut, v='/{}'.format(self.Bins.VcalToEl) if vcal else ''), cut_string, 'goff')
             return h1
 
-        h = do_pickle(pickle_path, f, redo=redo)
+        h = self.do_pickle(pickle_path, f, redo=redo)
         x_range = [h.GetXaxis().GetXmin(), h.GetBinCenter(h.FindLastBinAbove(2)) * 1.2]
         self.format_statbox(all_stat=True, x=.92, w=.25)
         format_histo(h, x_tit='Pulse Height [{u}]'.format(u='vcal' if vcal else 'e'), y_tit='Number of Entries', y_off=1.8, fill_color=self.FillColor, x_range=x_range)
@@ -275,10 +269,8 @@ class PixAnalysis(DUTAnalysis):
         roc = self.Dut if roc is None else roc
         h = TProfile2D('p_pm', 'ADC Map for Vcal {v}'.format(v=vcal), *self.Bins.get_pixel())
         cols, rows = split(array(self.Cut.CutConfig['local_fiducial']), 2) if self.Cut.CutConfig['local_fiducial'] is not None else [0, self.Bins.NCols - 1], [0, self.Bins.NRows - 1]
-        for col in xrange(cols[0], cols[1] + 1):
-            for row in xrange(rows[0], rows[1] + 1):
-                self.Fit.SetParameters(*self.Parameters[roc][col][row])
-                h.Fill(col, row, self.Fit(vcal))
+        cols, rows = [v.flatten() for v in meshgrid(arange(cols[0], cols[1] + 1), arange(rows[0], rows[1] + 1))]
+        fill_hist(h, cols, rows, self.Calibration.get_adc(roc, vcal)[cols, rows])
         format_histo(h, x_tit='col', y_tit='row', z_tit='Pulse Height [adc]', y_off=1.3, z_off=1.5, stats=0)
         self.save_histo(h, 'ADCMap{v}'.format(v=vcal), show, rm=.17, lm=.13, draw_opt='colz')
 
@@ -545,7 +537,7 @@ class PixAnalysis(DUTAnalysis):
             self.add_to_info(start)
             return g
 
-        gr = do_pickle(picklepath, func, redo=redo)
+        gr = self.do_pickle(picklepath, func, redo=redo)
         self.save_histo(gr, 'PixelAligment', show, draw_opt='alp', lm=.13, prnt=show)
         return gr
 
@@ -557,7 +549,7 @@ class PixAnalysis(DUTAnalysis):
             x, y = get_graph_vecs(g)
             return mean_sigma(y)
 
-        m, s = do_pickle(pickle_path, f)
+        m, s = self.do_pickle(pickle_path, f)
         if m < .4:
             log_warning('Planes are not correlated!')
         elif s > .05:
@@ -99,7 +99,7 @@ class CutPix(Cut):
             self.Analysis.add_to_info(t)
             return get_quantiles(values, linspace(0, .2, 2001))
 
-        rhits = do_pickle(pickle_path, func, redo=redo)
+        rhits = self.do_pickle(pickle_path, func, redo=redo)
         cut_value = rhits[value]
         return cut_value
 
@@ -108,7 +108,7 @@ class CutPix(Cut):
 
         def f():
             return where(get_root_vec(self.Analysis.Tree, var='aligned[{}]'.format(self.DUTPlane + 3), dtype=bool) == 0)[0].size
-        return do_pickle(pickle_path, f)
+        return self.do_pickle(pickle_path, f)
 
     def find_n_masked(self):
         cols, rows = [sum(v[1] - v[0] + 1 if type(v) is list else 1 for v in make_list(self.CutConfig['{}_mask'.format(var)])) for var in ['col', 'row']]
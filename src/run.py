@@ -10,6 +10,9 @@ from analysis import Analysis, join, basename
 from utils import *
 from glob import glob
 from dut import DUT
+from event_store import EventStore
+from time_index import TimeIndex
+from histo_booking import HistoBooking
 
 
 class Run:
@@ -45,6 +48,7 @@ class Run:
         self.RunInfo = self.load_run_info()
         self.RootFile = None
         self.Tree = None
+        self.Columns = None
         self.TreeName = self.Config.get('BASIC', 'treename')
         self.DUTs = [DUT(i + 1, self.RunInfo) for i in xrange(self.get_n_diamonds())] if self.RunNumber is not None else None
 
@@ -67,6 +71,7 @@ class Run:
             # tree info
             self.TimeOffset = None
             self.Time = self.load_time_vec(t_vec)
+            self.TimeIndex = TimeIndex(self.Time, self.get_mask)
             self.StartEvent = 0
             self.NEntries = int(self.Tree.GetEntries())
             self.EndEvent = self.NEntries - 1
@@ -77,6 +82,8 @@ class Run:
             self.Duration = timedelta(seconds=self.TotalTime)
             self.LogEnd = self.LogStart + self.Duration  # overwrite if we know exact duration
             self.NPlanes = self.load_n_planes()
+            self.Columns = self.load_event_store()
+            self.Booking = HistoBooking(self)
 
     def set_run(self, run_number, root_tree):
         if run_number is None:
@@ -135,6 +142,10 @@ class Run:
             parser.read(join(get_base_dir(), 'Configuration', self.TCString, 'RunConfig{nr}.ini'.format(nr=config_nr)))  # add the content of the split config
         return parser
 
+    def load_event_store(self):
+        enabled = self.MainConfig.getboolean('SAVE', 'event store') if self.MainConfig.has_option('SAVE', 'event store') else True
+        return EventStore(self) if enabled and file_exists(self.RootFilePath) else None
+
     def load_rootfile_path(self):
         return join(self.RootFileDir, 'TrackedRun{run:03d}.root'.format(run=self.RunNumber)) if self.RunNumber is not None else None
 
@@ -330,9 +341,18 @@ class Run:
         return make_ufloat((flux, .1 * flux))
 
     def find_n_events(self, n, cut, start):
-        total_events = self.Tree.Draw('event_number', cut, 'goff', self.NEntries, start)
-        evt_numbers = [self.Tree.GetV1()[i] for i in xrange(total_events)]
-        return int(evt_numbers[:n][-1] + 1 - start)
+        return self.TimeIndex.find_n_events(n, cut, start)
+
+    def get_mask(self, cut):
+        """ :returns a boolean mask of the events passing [cut] """
+        if self.Columns is not None:
+            return self.Columns.get_mask(cut)
+        mask = zeros(self.NEntries, '?')
+        estimate = self.Tree.GetEstimate()
+        self.Tree.SetEstimate(self.NEntries)
+        mask[get_root_vec(self.Tree, var='Entry$', cut=cut, dtype='i4')] = True
+        self.Tree.SetEstimate(estimate)
+        return mask
 
     # ----------------------------------------
     # endregion
@@ -350,18 +370,21 @@ class Run:
         return self.Tree.sensor_name[channel]
 
     def get_time_at_event(self, event):
-        """ For negative event numbers it will return the time stamp at the startevent. """
-        return self.Time[min(event, self.EndEvent)] / 1000.
+        """ For negative event numbers it will return the time stamp at the startevent. Works also for arrays of events. """
+        return self.TimeIndex.get_time(event)
 
     def get_event_at_time(self, seconds, rel=False):
-        """ Returns the event nunmber at time dt from beginning of the run. Accuracy: +- 1 Event """
+        """ Returns the event nunmber at time dt from beginning of the run (also for arrays of times). Accuracy: +- 1 Event """
+        seconds = array(seconds, 'd')
+        events = self.TimeIndex.get_event(seconds + (0 if rel else self.StartTime))
         # return time of last event if input is too large
-        if seconds - (self.StartTime if rel else 0) >= self.TotalTime or seconds == -1:
-            return self.NEntries
-        return where(self.Time <= (seconds + (0 if rel else self.StartTime)) * 1000)[0][-1]
+        events = where((seconds - (self.StartTime if rel else 0) >= self.TotalTime) | (seconds == -1), self.NEntries, events)
+        return events if events.ndim else int(events)
 
     def get_root_vec(self, n=0, ind=0, dtype=None, var=None, cut=None):
-        return get_root_vec(self.Tree, n, ind, dtype, var, cut)
+        """ reads [var] from the columnar event store if possible, otherwise from the tree """
+        values = self.Columns.get(var, cut) if var is not None and self.Columns is not None else None
+        return get_root_vec(self.Tree, n, ind, dtype, var, '' if cut is None else cut) if values is None else array(values, dtype=dtype)
 
     def get_root_vecs(self, n, n_ind, dtype=None):
         return get_root_vecs(self.Tree, n, n_ind, dtype)
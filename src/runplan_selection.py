@@ -138,10 +138,10 @@ class DiaScans(Analysis):
         ana = collection_selector(sel.RunPlan, sel.DUTNr, sel.TCString, load_tree)
         try:
             pf = partial(f, ana, redo=redo, *args, **kwargs)
-            return do_pickle(pickle_path, pf, redo=redo) if pickle_info else pf()
+            return ana.do_pickle(pickle_path, pf, redo=redo) if pickle_info else pf()
         except TypeError:
             pf = partial(f, ana, *args, **kwargs)
-            return do_pickle(pickle_path, pf, redo=redo) if pickle_info else pf()
+            return ana.do_pickle(pickle_path, pf, redo=redo) if pickle_info else pf()
 
     def get_values(self, f, pickle_info=None, redo=False, load_tree=True, *args, **kwargs):
         return [self.get_rp_values(sel, f, pickle_info, redo, load_tree, *args, **kwargs) for sel in self.Info]
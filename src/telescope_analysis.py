@@ -111,7 +111,7 @@ class TelecopeAnalysis(Analysis):
         def f():
             h = self.draw_angle_distribution(mode=mode, show=False, prnt=False)
             return ufloat(h.GetMean(), h.GetMeanError()), ufloat(h.GetStdDev(), h.GetStdDevError())
-        return do_pickle(picklepath, f)
+        return self.do_pickle(picklepath, f)
 
     def draw_angle_cut(self, mode):
         xmin, xmax = self.Cut.calc_angle(mode=mode)[mode]
@@ -165,7 +165,7 @@ class TelecopeAnalysis(Analysis):
             values = [self.Tree.GetV1()[i] for i in xrange(n)]
             return mean_sigma(values)[1]
 
-        return do_pickle(pickle_path, f, redo=redo)
+        return self.do_pickle(pickle_path, f, redo=redo)
 
     def get_residuals(self, roc, chi2s, mode='x'):
         return [self.get_residual(roc, chi2, mode) for chi2 in chi2s]
@@ -495,7 +495,7 @@ class TelecopeAnalysis(Analysis):
             m, s = (m, s) if s < m / 2. and fit.Ndf() and fit.Chi2() / fit.Ndf() < 10 else mean_sigma(values)
             return make_ufloat((m, s + .05 * m))
 
-        return do_pickle(pickle_path, f, redo=show)
+        return self.do_pickle(pickle_path, f, redo=show)
     # endregion RATE
     # ----------------------------------------
 
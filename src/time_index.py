@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# --------------------------------------------------------
+#       lookups between the times and the events of a run
+# --------------------------------------------------------
+
+from numpy import array, minimum, maximum, searchsorted, cumsum
+
+
+class TimeIndex(object):
+    """ Maps events to their time stamps and back with binary searches in the corrected time vector [ms] of a run. For every cut the cumulative number
+        of passing events is kept, so the number of events which contain n passing events is found with a binary search as well. """
+
+    def __init__(self, times, get_mask):
+        self.Time = times
+        self.NEntries = times.size
+        self.Sorted = times if (times[1:] >= times[:-1]).all() else maximum.accumulate(times)  # correct_time only removes the first jump back in time
+        self.GetMask = get_mask  # cut -> boolean mask of the events
+        self.Counts = {}  # cut -> cumulative number of the passing events
+
+    def get_time(self, events):
+        """ :returns the time stamps [s] of the [events] (scalar or array), events beyond the end of the run return the time of the last event """
+        return self.Time[minimum(events, self.NEntries - 1)] / 1000.
+
+    def get_event(self, seconds):
+        """ :returns the last events before the time stamps [seconds] (scalar or array) """
+        return searchsorted(self.Sorted, array(seconds, 'd') * 1000, 'right') - 1
+
+    def get_counts(self, cut):
+        cut = cut.GetTitle() if hasattr(cut, 'GetTitle') else str(cut)
+        if cut not in self.Counts:
+            self.Counts[cut] = cumsum(self.GetMask(cut), dtype='i8')
+        return self.Counts[cut]
+
+    def find_n_events(self, n, cut, start):
+        """ :returns the number of events starting at [start] which contain [n] events passing [cut] (all passing events if there are less) """
+        counts = self.get_counts(cut)
+        n_before = counts[start - 1] if start else 0
+        return int(searchsorted(counts, min(n_before + n, counts[-1])) + 1 - start)  # index of the nth passing event
@@ -19,7 +19,8 @@ from threading import Thread
 from time import time, sleep
 
 from gtts import gTTS
-from numpy import sqrt, array, average, mean, arange, log10, concatenate, where, any, count_nonzero, full, ndarray, histogram, searchsorted, cumsum, exp, sin, cos, arctan
+from numpy import sqrt, array, average, mean, arange, log10, concatenate, where, any, count_nonzero, full, ndarray, histogram, searchsorted, cumsum, exp, sin, cos, arctan, diff, minimum, maximum, \
+    bincount, zeros, repeat, inf, argsort, ceil, argmax
 from os import makedirs, _exit, remove, devnull
 from os import path as pth
 from os.path import dirname, realpath
@@ -33,6 +34,7 @@ from ConfigParser import ConfigParser
 from scipy.optimize import curve_fit
 from scipy import constants
 import h5py
+from hdf5_store import get_hdf5_store
 from functools import partial
 from Queue import Queue
 from json import load
@@ -323,6 +325,11 @@ def make_list(value):
     return array([value]).flatten()
 
 
+def make_byte_string(v):
+    n = int(log10(v) // 3) if v > 0 else 0
+    return '{:1.1f} {}'.format(v / 1000. ** n, ['B', 'kB', 'MB', 'GB', 'TB'][min(n, 4)])
+
+
 def file_exists(path, warn=False):
     if not pth.isfile(path):
         warning('File "{}" does not exist!'.format(path)) if warn else do_nothing()
@@ -537,15 +544,13 @@ def do_pickle(path, func, value=None, redo=False, *args, **kwargs):
 
 
 def do_hdf5(path, func, redo=False, *args, **kwargs):
+    store = get_hdf5_store()
     if file_exists(path) and redo:
+        store.close(path)
         remove_file(path)
-    if file_exists(path) and not redo:
-        return h5py.File(path, 'r')['data']
-    else:
-        data = func(*args, **kwargs)
-        f = h5py.File(path, 'w')
-        f.create_dataset('data', data=data)
-        return f['data']
+    if not file_exists(path):
+        store.save(path, data=func(*args, **kwargs))
+    return store.load(path)
 
 
 def fit_poissoni(h, p0=5000, p1=1, name='f_poiss', show=True):
@@ -679,21 +684,133 @@ def get_quantiles(values, bins):
     return (bins + bin_width)[searchsorted(cumsum(entries), arange(0, 100, .01) * sum(entries))]
 
 
-def load_root_files(sel, init=True):
-    threads = {}
-    for run in sel.get_selected_runs():
-        thread = MyThread(sel, run, init)
-        thread.start()
-        threads[run] = thread
-    while any([thread.isAlive() for thread in threads.itervalues()]) and init:
+def find_maxima_2d(values):
+    """ :returns event and sample indices of all local maxima along the last axis (same definition as scipy.signal.find_peaks, flat peaks return their middle). """
+    d = diff(values, axis=1)
+    n = d.shape[1]
+    next_step = minimum.accumulate(where(d != 0, arange(n), n)[:, ::-1], axis=1)[:, ::-1]  # first index >= i where the values change
+    rising, right = d[:, :-1] > 0, next_step[:, 1:]
+    falling = d[arange(d.shape[0]).reshape(-1, 1), minimum(right, n - 1)] < 0
+    ev, i = where(rising & (right < n) & falling)
+    return ev, (i + 1 + right[ev, i]) // 2
+
+
+def select_by_distance(ev, peaks, heights, distance):
+    """ :returns mask of the peaks with the highest [heights] with at least [distance] to each other for every event. """
+    n_peaks = bincount(ev)
+    if not n_peaks.size:
+        return zeros(0, '?')
+    col = arange(ev.size) - repeat(cumsum(n_peaks) - n_peaks, n_peaks)
+    pos, h = full((n_peaks.size, n_peaks.max()), -2 * distance), full((n_peaks.size, n_peaks.max()), -inf)
+    pos[ev, col], h[ev, col] = peaks, heights
+    order = argsort(h, axis=1, kind='mergesort')[:, ::-1]  # same priority as scipy: highest first, stable for equal heights
+    rows = arange(n_peaks.size).reshape(-1, 1)
+    pos, keep = pos[rows, order], (h > -inf)[rows, order]
+    for i in xrange(order.shape[1]):
+        close = (abs(pos - pos[:, [i]]) < distance) & keep[:, [i]]
+        close[:, i] = False
+        keep &= ~close
+    mask = zeros(order.shape, '?')
+    mask[rows, order] = keep
+    return mask[ev, col]
+
+
+def calc_prominences(values, ev, peaks, n_max=500):
+    """ :returns the prominences of the [peaks] in the 2D array [values] (same definition as scipy.signal.peak_prominences with wlen=None). """
+    prominences, ind = zeros(peaks.size), arange(values.shape[1], dtype='i2')
+    for i in xrange(0, peaks.size, n_max):
+        x, p = values[ev[i:i + n_max]].astype('f4'), peaks[i:i + n_max].reshape(-1, 1)
+        h = x[arange(p.size), p.ravel()].reshape(-1, 1)
+        higher, left, right = x > h, ind < p, ind > p
+        left_base = where(higher & left, ind, -1).max(axis=1).reshape(-1, 1)  # first higher value on the left
+        right_base = where(higher & right, ind, ind.size).min(axis=1).reshape(-1, 1)
+        left_min = where((ind > left_base) & ~right, x, inf).min(axis=1)
+        right_min = where((ind < right_base) & ~left, x, inf).min(axis=1)
+        prominences[i:i + n_max] = h.ravel() - maximum(left_min, right_min)
+    return prominences
+
+
+def find_peaks_2d(values, height=None, distance=None, prominence=None):
+    """ vectorised version of scipy.signal.find_peaks for all rows of the 2D array [values].
+        :returns event indices, sample indices and heights of all peaks, ordered by event and time. """
+    values = array(values, dtype='d')
+    ev, peaks = find_maxima_2d(values)
+    heights = values[ev, peaks]
+    if height is not None:
+        mask = heights >= height
+        ev, peaks, heights = ev[mask], peaks[mask], heights[mask]
+    if distance is not None:
+        mask = select_by_distance(ev, peaks, heights, ceil(distance))
+        ev, peaks, heights = ev[mask], peaks[mask], heights[mask]
+    if prominence is not None:
+        mask = calc_prominences(values, ev, peaks) >= prominence
+        ev, peaks, heights = ev[mask], peaks[mask], heights[mask]
+    return ev, peaks, heights
+
+
+def find_left_crossings(x, y, ev, i, thresholds, w=20):
+    """ vectorised threshold crossings on the rising edge within [w] samples before the peaks.
+        :param x: time axes of the events, y: waveforms of the events, ev: event of every peak, i: sample index of every peak, thresholds: [n_peaks x n_thresholds] """
+    n, rows, i = x.shape[1], ev.reshape(-1, 1), i.reshape(-1, 1)
+    start = maximum(i - w, 0)
+    ind = i + arange(-w, 0)
+    above = where(ind >= 0, y[rows, ind.clip(0)], -inf)[:, None, :] > thresholds.astype(y.dtype)[:, :, None]  # compare with the precision of the waveforms
+    j = where(above.any(axis=2), argmax(above, axis=2) - (w - i + start), 0)  # index of the first value above threshold in y[start:i]
+    y1 = where(j > 0, y[rows, start + j - 1], y[rows, i - 1])
+    return interpolate_x(x[rows, (i + j - w - 1) % n], x[rows, (i + j - w) % n], y1, y[rows, start + j], thresholds)
+
+
+def find_right_crossings(x, y, ev, i, thresholds, w=40):
+    """ vectorised threshold crossings on the falling edge within [w] samples after the peaks (see find_left_crossings). """
+    n, rows, i = x.shape[1], ev.reshape(-1, 1), i.reshape(-1, 1)
+    ind = i + arange(w)
+    j = argmax(where(ind < n, y[rows, ind.clip(max=n - 1)], inf)[:, None, :] < thresholds.astype(y.dtype)[:, :, None], axis=2)  # first value below threshold in y[i:i + w]
+    y1 = where(j > 0, y[rows, i + j - 1], y[rows, minimum(i + w, n) - 1])
+    return interpolate_x(x[rows, i + j - 1], x[rows, i + j], y1, y[rows, i + j], thresholds)
+
+
+def get_n_workers(n_workers=None, n_tasks=None):
+    """ :returns the number of parallel workers, [n_workers] <= 0 or None means one per cpu core, but never more than there are tasks """
+    n = cpu_count() if n_workers is None or n_workers <= 0 else n_workers
+    return max(1, n if n_tasks is None else min(n, n_tasks))
+
+
+def load_root_files(sel, init=True, n_workers=None, timeout=60 * 10):
+    """ loads the trees of the selected runs with at most [n_workers] threads and the time vectors with a pool of the same size.
+        Runs which fail to load are reported and left out of the returned dict. """
+    threads = OrderedDict((run, MyThread(sel, run, init)) for run in sel.get_selected_runs())
+    if not init:
+        for thread in threads.itervalues():
+            thread.load_tree()
+        return threads
+    n_workers = get_n_workers(n_workers, len(threads))
+    t = info('Loading {} runs with {} workers ...'.format(len(threads), n_workers))
+    pbar = PBar()
+    pbar.start(2 * len(threads))
+    waiting, running = threads.values(), []
+    while waiting or running:
+        finished = [thread for thread in running if not thread.isAlive()]
+        for _ in finished:
+            pbar.update()
+        running = [thread for thread in running if thread.isAlive()]
+        while waiting and len(running) < n_workers:
+            running.append(waiting.pop(0))
+            running[-1].start()
         sleep(.1)
-    if init:
-        pool = Pool(len(threads))
-        results = [pool.apply_async(get_time_vec, (thread.Selection, thread.Run)) for thread in threads.itervalues()]
-        times = [result.get(60) for result in results]
-        for thread, t in zip(threads.itervalues(), times):
-            thread.Time = t
-        pool.close()
+    pool = Pool(n_workers)
+    results = OrderedDict((run, pool.apply_async(get_time_vec, (thread.Selection, run))) for run, thread in threads.iteritems() if thread.Tuple is not None)
+    for run, thread in threads.iteritems():
+        try:
+            thread.Time = results[run].get(timeout) if run in results else None
+        except Exception as err:
+            thread.Error = '{}: {}'.format(err.__class__.__name__, err)
+        pbar.update()
+    pool.close()
+    for run, thread in threads.items():
+        if thread.Tuple is None or thread.Time is None:
+            warning('Could not load run {}{}'.format(run, '' if thread.Error is None else ' ({})'.format(thread.Error)))
+            threads.pop(run)
+    add_to_info(t)
     return threads
 
 
@@ -707,20 +824,26 @@ class MyThread(Thread):
         self.Tree = None
         self.Tuple = None
         self.Time = None
+        self.Error = None
 
     def run(self):
-        self.load_tree()
+        try:
+            self.load_tree()
+        except Exception as err:
+            self.Error = '{}: {}'.format(err.__class__.__name__, err)
 
     def load_tree(self):
         if not self.Load:
             self.Tuple = False
             return
-        info('Loading run {r}'.format(r=self.Run), next_line=False)
         file_path = self.Selection.get_final_file_path(self.Run)
         if file_exists(file_path):
             self.File = TFile(file_path)
             self.Tree = self.File.Get('tree')
-            self.Tuple = (self.File, self.Tree)
+        if not self.Tree:
+            self.Error = 'no tree in {}'.format(file_path)
+            return
+        self.Tuple = (self.File, self.Tree)
         self.Tree.SetEstimate(-1)
         return self.Tree
 
@@ -987,14 +1110,19 @@ def parallelise(f, args_list, timeout=60 * 60):
     return results
 
 
-def parallelise_instance(instances, method, args, timeout=60 * 60):
-    t = info('Run parallelisation on {} tasks ... '.format(len(args)), next_line=False)
-    pool = Pool(cpu_count())
-    # tasks = [partial(call_it, make_list(instances)[0], method.__name__, *make_list(arg)) for arg in args]
-    tasks = [partial(call_it, instance, method.__name__, *make_list(arg)) for instance, arg in zip(instances, args)]
-    workers = [pool.apply_async(task) for task in tasks]
-    results = [worker.get(timeout) for worker in workers]
-    add_to_info(t)
+def parallelise_instance(builders, method, args=None, kwargs=None, n_workers=None, timeout=60 * 60, pbar=None):
+    """ calls [method] for instances which can not be pickled (e.g. because they hold ROOT trees). Each instance is rebuilt in the worker process
+        from its builder (function, args, kwargs), so only the builders and the results have to be picklable. The order of the results is kept.
+        :param pbar: optional PBar which gets updated after every finished task """
+    pool = Pool(get_n_workers(n_workers, len(builders)))
+    workers = [pool.apply_async(build_and_call, (builder, method.__name__, [] if args is None else list(args), {} if kwargs is None else kwargs)) for builder in builders]
+    results = []
+    try:
+        for worker in workers:
+            results.append(worker.get(timeout))
+            pbar.update() if pbar is not None else do_nothing()
+    finally:
+        pool.terminate() if len(results) < len(workers) else pool.close()
     return results
 
 
@@ -1003,5 +1131,11 @@ def call_it(instance, name, *args, **kwargs):
     return getattr(instance, name)(*args, **kwargs)
 
 
+def build_and_call(builder, name, args, kwargs):
+    """indirect caller for instance methods of instances which have to be rebuilt in the worker process"""
+    f, f_args, f_kwargs = builder
+    return call_it(f(*f_args, **f_kwargs), name, *args, **kwargs)
+
+
 def do_nothing():
     pass
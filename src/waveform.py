@@ -80,10 +80,13 @@ class Waveform(Analysis):
             c.cd(i + 1)
             wf.Draw('aclp')
 
-    def fit_average(self, fit_range=None, n=3, ind=None, show=True):
+    def get_average_fit_range(self):
         max_x = self.Ana.Timing.draw_peaks(show=0).GetListOfFunctions()[1].GetParameter(1)
+        return [max_x - 15, max_x + 4]
+
+    def fit_average(self, fit_range=None, n=3, ind=None, show=True):
         h = self.draw_all_average(show=show, ind=ind)
-        fit_range = [max_x - 15, max_x + 4] if fit_range is None else fit_range
+        fit_range = self.get_average_fit_range() if fit_range is None else fit_range
         from fit import ErfLand
         c = ErfLand(h, fit_range=fit_range)
         c.fit(n, show)
@@ -104,7 +107,7 @@ class Waveform(Analysis):
                 f1.Draw('same')
                 f2.Draw('same')
             return f1.GetX((1 - p) * maxval) - f2.GetX(p * maxval)
-        return do_pickle(self.make_simple_pickle_path('RT'), f, redo=redo)
+        return self.do_pickle(self.make_simple_pickle_path('RT'), f, redo=redo)
 
     def draw_all_average(self, corr=True, n=-1, ind=None, prof=True, x_range=None, y_range=None, show=True, show_noise=False, redo=False):
         def f():
@@ -112,7 +115,7 @@ class Waveform(Analysis):
             values = self.get_values(ind)[:n]
             p1.FillN(values.size, self.get_times(corr, ind).astype('d')[:n], values.astype('d'), ones(values.size))
             return p1
-        p = do_pickle(self.make_simple_pickle_path('AWF', '{}_{}'.format(len(ind) if ind is not None else '', int(prof))), f, redo=redo)
+        p = self.do_pickle(self.make_simple_pickle_path('AWF', '{}_{}'.format(len(ind) if ind is not None else '', int(prof))), f, redo=redo)
         x_range = increased_range(self.Ana.SignalRegion * self.BinWidth, 0, .3) if x_range is None else x_range
         format_histo(p, x_tit='Time [ns]', y_tit='Pulse Height [mV]', y_off=1.2, stats=0, markersize=.5, x_range=x_range, y_range=y_range)
         self.draw_histo(p, show=show, draw_opt='' if prof else 'col')
@@ -134,40 +137,57 @@ class Waveform(Analysis):
         g1.Draw('c')
 
     def get_trigger_cells(self, redo=False):
-        return do_hdf5(self.make_simple_hdf5_path('TC'), self.Run.get_root_vec, redo=redo, var='trigger_cell', cut=self.Cut, dtype='i2')
+        return self.do_hdf5(self.make_simple_hdf5_path('TC'), self.Run.get_root_vec, redo=redo, var='trigger_cell', cut=self.Cut, dtype='i2')
 
     def get_all(self, channel=None, redo=False):
         """ extracts all dut waveforms after all cuts from the root tree and saves it as an hdf5 file """
-        def f():
-            waveforms = []
-            events = self.Ana.get_events(cut=self.Cut)
-            self.Ana.PBar.start(events.size)
-            for ev in events:
-                n = self.Tree.Draw('wf{}'.format(self.Channel if channel is None else channel), '', 'goff', 1, ev)
-                waveforms.append(self.Ana.Polarity * self.Run.get_root_vec(n, dtype='f2'))
-                self.Ana.PBar.update()
-            return array(waveforms)
-        return do_hdf5(self.make_simple_hdf5_path(dut=self.Channel if channel is None else channel), f, redo=redo)
+        channel = self.Channel if channel is None else channel
+        hdf5_path = self.make_cut_hdf5_path(self.Cut, dut=channel)
+        if file_exists(hdf5_path) and not redo:
+            data = self.HDF5.load(hdf5_path)
+            if data.attrs.get('complete', True):
+                return data
+        return self.extract_all(hdf5_path, channel, redo)
+
+    def extract_all(self, hdf5_path, channel, redo=False, n_max=10000):
+        """ streams the waveforms of the selected events in blocks of [n_max] tree entries into a resizable hdf5 dataset.
+            An interrupted extraction is resumed at the last written event. """
+        self.HDF5.remove(hdf5_path) if redo else self.HDF5.close(hdf5_path)
+        events = array(self.Ana.get_events(cut=self.Cut))
+        f = h5py.File(hdf5_path, 'a')
+        if 'data' not in f:
+            f.create_dataset('data', (0, self.Run.NSamples), dtype='f2', maxshape=(None, self.Run.NSamples), chunks=(64, self.Run.NSamples), compression='lzf')
+            f['data'].attrs['complete'] = False
+        data = f['data']
+        if data.shape[0]:
+            self.info('resuming waveform extraction at event {} of {}'.format(data.shape[0], events.size))
+        estimate = self.Tree.GetEstimate()
+        self.Tree.SetEstimate(n_max * self.Run.NSamples)
+        self.PBar.start(events.size)
+        for first in xrange(events[data.shape[0]] if data.shape[0] < events.size else self.Run.NEntries, self.Run.NEntries, n_max):
+            block = events[searchsorted(events, first):searchsorted(events, first + n_max)]
+            if not block.size:
+                continue
+            n = self.Tree.Draw('wf{}'.format(channel), '', 'goff', block[-1] + 1 - first, first)
+            data.resize(data.shape[0] + block.size, axis=0)
+            data[-block.size:] = self.Polarity * self.Run.get_root_vec(n, dtype='f2').reshape(-1, self.Run.NSamples)[block - first]
+            f.flush()
+            self.PBar.update(data.shape[0] - 1)
+        self.Tree.SetEstimate(estimate)
+        data.attrs['complete'] = True
+        f.close()
+        return self.HDF5.load(hdf5_path)
 
     def get_values(self, ind=None, channel=None):
         return array(self.get_all(channel=channel))[ind].flatten()
 
     def get_times(self, corr=True, ind=None):
-        return array(self.get_all_times(corr))[ind].flatten()
+        return array(self.get_all_times(corr)[slice(None) if ind is None else ind]).flatten()
 
-    def get_all_times(self, corr=False, redo=False):
-        def f():
-            self.PBar.start(self.get_trigger_cells().size)
-            times = []
-            for i, tc in enumerate(self.get_trigger_cells()):
-                times.append(self.get_calibrated_times(tc).astype('f2'))
-                if not i % 100:
-                    self.PBar.update(i)
-            self.PBar.finish()
-            return array(times)
-        t = do_hdf5(self.make_simple_hdf5_path('Times'), f, redo=redo)
-        peaks = self.Ana.Peaks.get_from_tree() if corr else []
-        return array(t) - (peaks - peaks[0]).reshape(peaks.size, 1) if corr else t
+    def get_all_times(self, corr=False):
+        """ :returns lazy view of the calibrated time axes of all events, optionally corrected by the signal peak times. """
+        peaks = array(self.Ana.Peaks.get_from_tree()) if corr else None
+        return CalibratedTimes(self.Run.get_tcal_table().astype('f2'), self.get_trigger_cells(), None if peaks is None else peaks - peaks[0])
 
     def draw_average(self, n=100, cut=None, align_peaks=True, show=True, show_noise=False):
         p = TProfile('pawf', 'Averaged Waveform', 2000, 0, 500)
@@ -212,13 +232,13 @@ class Waveform(Analysis):
         values = self.Run.get_root_vec(n_entries)
         times = arange(self.Run.NSamples, dtype='u2') * (1 if raw else self.BinWidth)
         if t_corr:
-            times = [v for lst in [self.get_calibrated_times(int(self.Tree.GetV2()[1024 * i])) for i in xrange(n)] for v in lst]
+            times = self.Run.get_tcal_table()[self.Run.get_root_vec(n_entries, 1, dtype='i2')[::self.Run.NSamples][:n]].flatten()
         self.Tree.SetEstimate()
         self.Count += n_events
         return values, times
 
     def get_calibrated_times(self, trigger_cell):
-        return self.Run.TCalSum[trigger_cell:trigger_cell + self.Run.NSamples] - self.Run.TCalSum[trigger_cell]
+        return self.Run.get_tcal_table()[trigger_cell]
 
     def get_calibrated_time_old(self, trigger_cell, bin_nr):
         return sum(self.Run.TCal[trigger_cell+1:trigger_cell + bin_nr]) + (sum(self.Run.TCal[:bin_nr - (1024 - trigger_cell) + 1]) if trigger_cell + bin_nr > 1024 else 0)
@@ -272,3 +292,29 @@ class Waveform(Analysis):
         self.draw_histo(p, show=show, draw_opt='colz', rm=.14)
         self.Ana.draw_fiducial_cut()
         self.save_plots('RiseTimeMap')
+
+
+class CalibratedTimes(object):
+    """ Index-backed view of the calibrated time axes of all events. Rows are looked up in the time calibration table by the trigger cell
+        of the event and shifted by the peak time correction on access, so the full [n_events x n_samples] matrix is never stored. """
+
+    def __init__(self, table, trigger_cells, offsets=None):
+        self.Table = table
+        self.TriggerCells = array(trigger_cells, dtype='i2')
+        self.Offsets = offsets
+        self.shape = (self.TriggerCells.size, self.Table.shape[1])
+        self.dtype = self.Table.dtype
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, item):
+        events, samples = (item[0], item[1:]) if type(item) is tuple else (item, ())
+        times = self.Table[self.TriggerCells[events]]
+        if self.Offsets is not None:
+            offsets = self.Offsets[events]
+            times = times - (offsets.reshape(-1, 1) if times.ndim == 2 else offsets)
+        return times[(Ellipsis,) + samples] if samples else times
+
+    def __array__(self, dtype=None):
+        return self[:] if dtype is None else self[:].astype(dtype)